@@ -11,7 +11,8 @@ qui sont automatiquement convertis en objets JavaScript par pywebview.
 =============================================================================
 """
 
-from database import DatabaseManager 
+from database import DatabaseManager, OutOfStockError
+from storage import ConflictError
 
 
 class Api:
@@ -112,8 +113,22 @@ class Api:
     # PRODUITS
     # =========================================================================
     
-    def get_products(self, category: str = None, search: str = None) -> dict:
-        """Récupère les produits avec filtres optionnels."""
+    def get_products(self, category: str = None, search: str = None,
+                     cursor: str = None, limit: int = None) -> dict:
+        """
+        Récupère les produits avec filtres optionnels.
+        Avec limit (et cursor), retourne une page et next_cursor.
+        """
+        if limit is not None or cursor is not None:
+            try:
+                if search:
+                    page = self.db.search_products_page(search, cursor, limit)
+                else:
+                    page = self.db.get_products_page(cursor, limit, category=category)
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}
+            return {'success': True, 'products': page['items'], 'next_cursor': page['next_cursor']}
+        
         if search:
             products = self.db.search_products(search)
         elif category:
@@ -273,34 +288,54 @@ class Api:
         if not self.current_user:
             return {'success': False, 'message': 'Veuillez vous connecter'}
         
-        order = self.db.create_order(self.current_user['id'], shipping_address)
+        try:
+            order = self.db.create_order(self.current_user['id'], shipping_address)
+        except OutOfStockError as e:
+            return {'success': False, 'message': str(e)}
+        except ConflictError:
+            return {'success': False, 'message': 'Stocks modifiés pendant la commande, veuillez réessayer'}
         
         if order:
             return {'success': True, 'order': order, 'message': 'Commande créée'}
         else:
             return {'success': False, 'message': 'Panier vide'}
     
-    def get_my_orders(self) -> dict:
-        """Récupère les commandes de l'utilisateur connecté."""
+    def get_my_orders(self, cursor: str = None, limit: int = None) -> dict:
+        """
+        Récupère les commandes de l'utilisateur connecté.
+        Avec limit (et cursor), retourne une page et next_cursor.
+        """
         if not self.current_user:
             return {'success': False, 'orders': []}
         
+        if limit is not None or cursor is not None:
+            try:
+                page = self.db.get_orders_page(cursor, limit, user_id=self.current_user['id'])
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}
+            return {'success': True, 'orders': page['items'], 'next_cursor': page['next_cursor']}
+        
         orders = self.db.get_orders_by_user(self.current_user['id'])
         return {'success': True, 'orders': orders}
     
-    def get_all_orders(self) -> dict:
-        """Récupère toutes les commandes (admin/vendeur)."""
+    def get_all_orders(self, cursor: str = None, limit: int = None) -> dict:
+        """
+        Récupère toutes les commandes (admin/vendeur).
+        Avec limit (et cursor), retourne une page et next_cursor.
+        """
         if not self.current_user or self.current_user['role'] not in ['seller', 'admin']:
             return {'success': False, 'message': 'Non autorisé'}
         
-        orders = self.db.get_all_orders()
+        if limit is not None or cursor is not None:
+            try:
+                page = self.db.get_orders_page(cursor, limit)
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}
+            orders = self.db.enrich_orders_with_users(page['items'])
+            return {'success': True, 'orders': orders, 'next_cursor': page['next_cursor']}
         
-        # Enrichit avec les infos utilisateur
-        for order in orders:
-            user = self.db.get_user_by_id(order['user_id'])
-            if user:
-                order['user_name'] = f"{user['firstname']} {user['lastname']}"
-                order['user_email'] = user['email']
+        # Enrichit avec les infos utilisateur (une seule lecture des utilisateurs)
+        orders = self.db.enrich_orders_with_users(self.db.get_all_orders())
         
         return {'success': True, 'orders': orders}
     
@@ -316,11 +351,21 @@ class Api:
     # ADMINISTRATION
     # =========================================================================
     
-    def get_all_users(self) -> dict:
-        """Récupère tous les utilisateurs (admin uniquement)."""
+    def get_all_users(self, cursor: str = None, limit: int = None) -> dict:
+        """
+        Récupère tous les utilisateurs (admin uniquement).
+        Avec limit (et cursor), retourne une page et next_cursor.
+        """
         if not self.current_user or self.current_user['role'] != 'admin':
             return {'success': False, 'message': 'Non autorisé'}
         
+        if limit is not None or cursor is not None:
+            try:
+                page = self.db.get_users_page(cursor, limit)
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}
+            return {'success': True, 'users': page['items'], 'next_cursor': page['next_cursor']}
+        
         users = self.db.get_all_users()
         return {'success': True, 'users': users}
     
@@ -0,0 +1,220 @@
+"""
+=============================================================================
+TOKENS D'AUTHENTIFICATION SIGNÉS (SANS ÉTAT)
+=============================================================================
+Alternative aux sessions (voir session_store): le token porte lui-même
+l'identité de l'utilisateur et se vérifie sans aucun accès au stockage,
+par n'importe quel worker de l'API qui connaît la clé secrète.
+
+Format: <données>.<signature>, en base64 URL sans remplissage
+- données: JSON {"sub": ID utilisateur, "role": rôle, "exp": échéance
+  (timestamp), "jti": identifiant aléatoire du token},
+- signature: HMAC-SHA256 des données avec la clé des tokens (voir token_key).
+
+Un token ne peut pas être modifié (la signature ne correspondrait plus)
+mais reste valide jusqu'à son échéance: la déconnexion l'ajoute à une
+liste de révocation (son jti, jusqu'à son échéance). Cette liste est
+partagée entre workers par un fichier en ajout seul, relu quand il change.
+
+Clé des tokens: MARKETFLOW_TOKEN_SECRET, sinon dérivée de SECRET_KEY (HMAC
+avec un libellé propre aux tokens, distincte de la clé Flask). Le mode
+'stateless' est refusé au démarrage sans clé secrète configurée: la clé de
+développement par défaut est publique, n'importe qui pourrait signer un
+token administrateur.
+
+Configuration (variables d'environnement):
+- MARKETFLOW_AUTH_TOKENS: 'session' (défaut, tokens opaques et sessions)
+  ou 'stateless' (tokens signés).
+- MARKETFLOW_TOKEN_SECRET: clé de signature des tokens (optionnelle).
+- MARKETFLOW_TOKEN_TTL: durée de vie d'un token signé en secondes (86400).
+- MARKETFLOW_REVOCATION_PATH: fichier de la liste de révocation
+  (défaut: data/revoked_tokens.txt).
+=============================================================================
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+from typing import Dict, Optional
+
+from table_lock import TableLock
+
+# Clé Flask de développement (publique): jamais utilisée pour signer des tokens
+DEV_SECRET_KEY = 'marketflow-secret-key-dev-2025'
+
+# Libellé de dérivation de la clé des tokens à partir de SECRET_KEY
+TOKEN_KEY_LABEL = b'marketflow-auth-tokens-v1'
+
+
+def _encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def _decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def token_key(secret_key: Optional[str], token_secret: Optional[str] = None) -> bytes:
+    """
+    Clé de signature des tokens: token_secret, sinon dérivée de secret_key.
+    Lève ValueError si aucune clé secrète n'est configurée (absente ou
+    égale à la clé de développement).
+    """
+    if token_secret:
+        if token_secret == DEV_SECRET_KEY:
+            raise ValueError("MARKETFLOW_TOKEN_SECRET ne peut pas être la clé de développement")
+        return token_secret.encode('utf-8')
+    if not secret_key or secret_key == DEV_SECRET_KEY:
+        raise ValueError("Tokens signés refusés: définissez SECRET_KEY (ou "
+                         "MARKETFLOW_TOKEN_SECRET) avec une clé secrète")
+    return hmac.new(secret_key.encode('utf-8'), TOKEN_KEY_LABEL, hashlib.sha256).digest()
+
+
+def is_signed_token(token: str) -> bool:
+    """Distingue un token signé d'un token de session opaque (hexadécimal)."""
+    return '.' in token
+
+
+class RevocationList:
+    """Tokens révoqués (jti -> échéance), partagés par un fichier en ajout seul."""
+
+    def __init__(self, path: Optional[str] = None):
+        """path: fichier partagé (None: liste propre au processus)."""
+        self.path = path
+        self._revoked: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        # Ajouts et compactions du fichier sérialisés entre processus
+        self._file_lock = TableLock(path) if path else None
+        self._identity = None
+        self._offset = 0
+
+    def _refresh(self):
+        """Lit les révocations ajoutées au fichier par les autres processus."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if identity == self._identity:
+            return
+        if self._identity is None or stat.st_ino != self._identity[0] or stat.st_size < self._offset:
+            # Fichier remplacé (compaction): relecture complète
+            self._offset = 0
+            self._revoked.clear()
+        with open(self.path, 'r', encoding='ascii') as f:
+            f.seek(self._offset)
+            data = f.read()
+        # Une ligne incomplète (écriture en cours) sera relue au prochain passage
+        complete = data.rfind('\n') + 1
+        for line in data[:complete].splitlines():
+            parts = line.split(' ')
+            if len(parts) == 2:
+                try:
+                    self._revoked[parts[0]] = float(parts[1])
+                except ValueError:
+                    continue
+        self._offset += complete
+        self._identity = identity
+
+    def revoke(self, jti: str, expires: float):
+        """Révoque un token jusqu'à son échéance."""
+        with self._lock:
+            self._revoked[jti] = expires
+            if not self.path:
+                self._prune()
+                return
+            with self._file_lock:
+                with open(self.path, 'a', encoding='ascii') as f:
+                    f.write(f"{jti} {expires}\n")
+                self._refresh()
+                self._prune()
+
+    def is_revoked(self, jti: str) -> bool:
+        with self._lock:
+            if self.path:
+                self._refresh()
+            return jti in self._revoked
+
+    def _prune(self):
+        """
+        Oublie les tokens expirés (de toute façon refusés) et compacte le
+        fichier (appelé sous le verrou du fichier).
+        """
+        now = time.time()
+        expired = [jti for jti, expires in self._revoked.items() if expires < now]
+        if not expired:
+            return
+        for jti in expired:
+            del self._revoked[jti]
+        if self.path:
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='ascii') as f:
+                for jti, expires in self._revoked.items():
+                    f.write(f"{jti} {expires}\n")
+            os.replace(tmp_path, self.path)
+            self._identity = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._revoked)
+
+
+class TokenSigner:
+    """Émission et vérification des tokens signés (HMAC-SHA256)."""
+
+    def __init__(self, key: bytes, ttl: float = None,
+                 revocations: Optional[RevocationList] = None):
+        """key: clé de signature (voir token_key)."""
+        self.ttl = ttl if ttl is not None else float(
+            os.environ.get('MARKETFLOW_TOKEN_TTL', '86400'))
+        self.revocations = revocations if revocations is not None else RevocationList()
+        # État HMAC initialisé une fois avec la clé, copié pour chaque signature
+        self._hmac = hmac.new(key, digestmod=hashlib.sha256)
+
+    def _sign(self, payload: str) -> str:
+        mac = self._hmac.copy()
+        mac.update(payload.encode('ascii'))
+        return _encode(mac.digest())
+
+    def issue(self, user: Dict) -> str:
+        """Émet un token signé pour un utilisateur."""
+        claims = {
+            'sub': user['id'],
+            'role': user.get('role', ''),
+            'exp': int(time.time() + self.ttl),
+            'jti': secrets.token_hex(8)
+        }
+        payload = _encode(json.dumps(claims, separators=(',', ':')).encode('utf-8'))
+        return f"{payload}.{self._sign(payload)}"
+
+    def verify(self, token: str) -> Optional[Dict]:
+        """
+        Vérifie un token signé.
+        Retourne ses données ({'sub', 'role', 'exp', 'jti'}) ou None
+        (signature invalide, token expiré ou révoqué).
+        """
+        payload, _, signature = token.partition('.')
+        try:
+            if not hmac.compare_digest(self._sign(payload), signature):
+                return None
+            claims = json.loads(_decode(payload))
+        except (ValueError, TypeError):
+            return None
+        if not isinstance(claims, dict) or claims.get('exp', 0) < time.time():
+            return None
+        if self.revocations.is_revoked(claims.get('jti', '')):
+            return None
+        return claims
+
+    def revoke(self, token: str) -> bool:
+        """Révoque un token valide (déconnexion); retourne False s'il ne l'est pas."""
+        claims = self.verify(token)
+        if claims is None:
+            return False
+        self.revocations.revoke(claims['jti'], claims['exp'])
+        return True
@@ -0,0 +1,197 @@
+"""
+=============================================================================
+FILTRE DE BLOOM DES MOTS DE PASSE COMPROMIS
+=============================================================================
+Préfiltre de DatabaseManager.check_password_compromised(): la plupart des
+mots de passe vérifiés ne figurent dans aucune fuite. Un filtre de Bloom
+répond "absent" avec certitude, ou "peut-être présent" avec un taux de
+faux positifs choisi à la construction; seul ce second cas nécessite la
+recherche exacte (base locale, cache des plages ou API).
+
+- Construit à partir d'une liste locale de hashes SHA-1 (fichier trié
+  "SHA1:COUNT" ou dossier de plages "<PREFIXE>.txt", voir pwned_store).
+- Stocké dans un fichier (défaut: data/pwned.bloom) projeté en mémoire
+  (mmap): seules les pages consultées sont chargées.
+- Les positions des bits sont tirées du hash SHA-1 lui-même (hachage
+  double), déjà uniformément distribué: aucun hachage supplémentaire.
+
+Construction:
+  python bloom_filter.py data/pwned-passwords-sha1-ordered-by-hash.txt
+  python bloom_filter.py data/pwned --fp-rate 0.0001 --output data/pwned.bloom
+=============================================================================
+"""
+
+import math
+import mmap
+import os
+import struct
+import sys
+import threading
+from typing import Iterable, Iterator
+
+# En-tête: signature, taille en bits, nombre de fonctions de hachage, éléments
+MAGIC = b'MFBLOOM1'
+HEADER = struct.Struct('<8sQIQ')
+
+# Taux de faux positifs par défaut
+DEFAULT_FP_RATE = 0.001
+
+
+def optimal_parameters(count: int, fp_rate: float) -> tuple:
+    """Taille (bits) et nombre de fonctions de hachage pour count éléments."""
+    count = max(1, count)
+    bits = max(8, int(math.ceil(-count * math.log(fp_rate) / (math.log(2) ** 2))))
+    hashes = max(1, int(round(bits / count * math.log(2))))
+    return bits, hashes
+
+
+def _positions(sha1_hash: str, bits: int, hashes: int) -> Iterator[int]:
+    """Positions des bits d'un hash SHA-1 hexadécimal (hachage double)."""
+    h1 = int(sha1_hash[:16], 16)
+    h2 = int(sha1_hash[16:32], 16) | 1
+    for i in range(hashes):
+        yield (h1 + i * h2) % bits
+
+
+def iter_hashes(source: str) -> Iterator[str]:
+    """Hashes SHA-1 d'une liste locale (fichier "SHA1[:COUNT]" ou dossier de plages)."""
+    if os.path.isdir(source):
+        for name in sorted(os.listdir(source)):
+            prefix = os.path.splitext(name)[0].upper()
+            if len(prefix) != 5:
+                continue
+            with open(os.path.join(source, name), 'r', encoding='ascii', errors='ignore') as f:
+                for line in f:
+                    suffix = line.split(':', 1)[0].strip()
+                    if len(suffix) == 35:
+                        yield prefix + suffix.upper()
+    else:
+        with open(source, 'r', encoding='ascii', errors='ignore') as f:
+            for line in f:
+                sha1_hash = line.split(':', 1)[0].strip()
+                if len(sha1_hash) == 40:
+                    yield sha1_hash.upper()
+
+
+class BloomFilter:
+    """Filtre de Bloom en lecture seule, projeté en mémoire depuis un fichier."""
+
+    def __init__(self, path: str):
+        """path: fichier produit par build()."""
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._data = None
+        self._identity = None
+        self.bits = 0
+        self.hashes = 0
+        self.count = 0
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _open(self):
+        """(Re)projette le fichier s'il a été remplacé depuis la dernière ouverture."""
+        stat = os.stat(self.path)
+        identity = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if identity == self._identity:
+            return
+        self.close()
+        f = open(self.path, 'rb')
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, bits, hashes, count = HEADER.unpack_from(data, 0)
+            if magic != MAGIC or len(data) < HEADER.size + (bits + 7) // 8:
+                data.close()
+                raise ValueError(f"Filtre de Bloom invalide: {self.path}")
+        except BaseException:
+            f.close()
+            raise
+        self._file, self._data, self._identity = f, data, identity
+        self.bits, self.hashes, self.count = bits, hashes, count
+
+    def might_contain(self, sha1_hash: str) -> bool:
+        """False si le hash n'est certainement pas dans la liste, True sinon."""
+        with self._lock:
+            self._open()
+            data = self._data
+            for position in _positions(sha1_hash, self.bits, self.hashes):
+                if not data[HEADER.size + (position >> 3)] & (1 << (position & 7)):
+                    return False
+            return True
+
+    def close(self):
+        if self._data is not None:
+            self._data.close()
+            self._file.close()
+        self._file = self._data = self._identity = None
+
+    def stats(self) -> dict:
+        """Paramètres du filtre et taux de faux positifs attendu."""
+        with self._lock:
+            self._open()
+            rate = (1 - math.exp(-self.hashes * self.count / self.bits)) ** self.hashes
+            return {'bits': self.bits, 'hashes': self.hashes, 'count': self.count,
+                    'size_bytes': HEADER.size + (self.bits + 7) // 8,
+                    'expected_fp_rate': rate}
+
+
+def build(hashes: Iterable[str], count: int, path: str,
+          fp_rate: float = DEFAULT_FP_RATE) -> 'BloomFilter':
+    """
+    Construit le filtre de count hashes SHA-1 et l'enregistre dans path
+    (fichier temporaire puis renommage atomique).
+    """
+    bits, k = optimal_parameters(count, fp_rate)
+    array = bytearray((bits + 7) // 8)
+    added = 0
+    for sha1_hash in hashes:
+        for position in _positions(sha1_hash, bits, k):
+            array[position >> 3] |= 1 << (position & 7)
+        added += 1
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, bits, k, added))
+        f.write(array)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return BloomFilter(path)
+
+
+def main():
+    """Point d'entrée principal: construction du filtre depuis une liste locale."""
+    import argparse
+
+    data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    parser = argparse.ArgumentParser(
+        description='Construction du filtre de Bloom des mots de passe compromis')
+    parser.add_argument('source',
+                       help='Fichier "SHA1:COUNT" trié ou dossier de plages <PREFIXE>.txt')
+    parser.add_argument('--output', '-o', default=os.environ.get(
+                           'MARKETFLOW_PWNED_BLOOM', os.path.join(data_dir, 'pwned.bloom')),
+                       help='Fichier du filtre (défaut: MARKETFLOW_PWNED_BLOOM ou data/pwned.bloom)')
+    parser.add_argument('--fp-rate', type=float, default=DEFAULT_FP_RATE,
+                       help=f'Taux de faux positifs visé (défaut: {DEFAULT_FP_RATE})')
+
+    args = parser.parse_args()
+    if not 0 < args.fp_rate < 1:
+        parser.error('--fp-rate doit être compris entre 0 et 1')
+
+    # Premier passage: nombre de hashes, pour dimensionner le filtre
+    count = sum(1 for _ in iter_hashes(args.source))
+    print(f"[BLOOM] {count} hashes dans {args.source}")
+
+    bloom = build(iter_hashes(args.source), count, args.output, args.fp_rate)
+    stats = bloom.stats()
+    bloom.close()
+    print(f"[BLOOM] Filtre enregistré: {args.output} ({stats['size_bytes']} octets, "
+          f"{stats['hashes']} fonctions, faux positifs ~{stats['expected_fp_rate']:.2e})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
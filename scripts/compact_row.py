@@ -0,0 +1,175 @@
+"""
+=============================================================================
+LIGNES COMPACTES DES TABLES EN MÉMOIRE
+=============================================================================
+Représentation des lignes conservées par le cache des tables CSV.
+
+Un dictionnaire par ligne (csv.DictReader) répète ses clés et sa table de
+hachage pour chaque ligne: plusieurs centaines d'octets avant même les
+valeurs. Ici chaque ligne est un objet à __slots__ (une classe créée par
+jeu de colonnes), soit un pointeur par colonne.
+
+- Colonnes numériques (prix, stock, total, quantité): stockées en int ou
+  float quand la conversion redonne exactement le texte d'origine.
+- Colonnes catégorielles (rôle, statut, catégorie, IDs de référence):
+  chaînes internées, une seule copie par valeur distincte.
+
+Les lignes se lisent comme des dictionnaires en lecture seule (Mapping):
+row['price'], row.get('stock'), row.items(), dict(row)... et retournent
+toujours des chaînes, comme le CSV. row.copy() (comme dict.copy()) est la
+façon rapide d'obtenir un dictionnaire modifiable.
+=============================================================================
+"""
+
+import sys
+from collections.abc import Mapping
+from operator import attrgetter
+from typing import Callable, Dict, Iterator, Tuple
+
+# Colonnes stockées sous forme numérique
+NUMERIC_COLUMNS = frozenset({'price', 'stock', 'total', 'quantity'})
+
+# Colonnes à faible cardinalité dont les valeurs sont internées
+INTERNED_COLUMNS = frozenset({'role', 'status', 'category', 'active',
+                              'seller_id', 'user_id', 'product_id'})
+
+
+def _number(value: str):
+    """
+    Convertit un texte numérique sans perte (sinon le texte est conservé).
+    Chiffres ASCII uniquement: isdigit() accepte aussi '²' ou '١٢', que
+    int() refuse ou réécrit ('12').
+    """
+    if value.isascii() and value.isdigit() and (value[0] != '0' or value == '0'):
+        try:
+            return int(value)
+        except ValueError:
+            return value
+    try:
+        number = float(value)
+    except ValueError:
+        return value
+    return number if repr(number) == value else value
+
+
+def _text(value) -> str:
+    return '' if value is None else str(value)
+
+
+class CompactRow(Mapping):
+    """
+    Ligne en lecture seule, à __slots__.
+    Les sous-classes (une par jeu de colonnes) sont créées par row_class().
+    """
+
+    __slots__ = ()
+    _columns: Tuple[str, ...] = ()
+    _slots: Dict[str, str] = {}
+    # (colonne, attribut, conversion à l'enregistrement) de chaque colonne
+    _fields: Tuple[Tuple[str, str, Callable], ...] = ()
+    _getter: Callable = staticmethod(lambda row: ())
+    # Positions des colonnes numériques
+    _numeric: Tuple[int, ...] = ()
+
+    def __init__(self, row: Mapping):
+        get = row.get
+        for column, slot, convert in self._fields:
+            setattr(self, slot, convert(get(column)))
+
+    def __getitem__(self, column: str) -> str:
+        try:
+            value = getattr(self, self._slots[column])
+        except KeyError:
+            raise KeyError(column) from None
+        return value if value.__class__ is str else str(value)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._columns)
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    def __contains__(self, column) -> bool:
+        return column in self._slots
+
+    def copy(self) -> Dict[str, str]:
+        """Copie modifiable (dictionnaire), valeurs en texte."""
+        values = self._getter(self)
+        if not self._numeric:
+            return dict(zip(self._columns, values))
+        values = list(values)
+        # Seules les colonnes numériques peuvent contenir autre chose que du texte
+        for position in self._numeric:
+            value = values[position]
+            if value.__class__ is not str:
+                values[position] = str(value)
+        return dict(zip(self._columns, values))
+
+    def items(self):
+        return self.copy().items()
+
+    def values(self):
+        return self.copy().values()
+
+    def __repr__(self) -> str:
+        return repr(self.copy())
+
+    def __reduce__(self):
+        return (compact, (self.copy(),))
+
+
+_CLASSES: Dict[Tuple[str, ...], type] = {}
+
+
+def _stored_number(value) -> object:
+    return _number(_text(value))
+
+
+def _stored_interned(value) -> str:
+    return sys.intern(_text(value))
+
+
+def row_class(columns: Tuple[str, ...]) -> type:
+    """Retourne (et crée au premier appel) la classe de ligne d'un jeu de colonnes."""
+    cls = _CLASSES.get(columns)
+    if cls is not None:
+        return cls
+
+    # Attributs préfixés: une colonne ne masque jamais une méthode (keys, items...)
+    slots = {column: f'_c{position}' for position, column in enumerate(columns)}
+
+    # Conversion de chaque colonne à l'enregistrement
+    fields = tuple(
+        (column, slot, _stored_number if column in NUMERIC_COLUMNS
+         else _stored_interned if column in INTERNED_COLUMNS else _text)
+        for column, slot in slots.items()
+    )
+
+    # Lecture de toutes les colonnes en un appel (attrgetter retourne un
+    # tuple à partir de deux attributs)
+    if len(slots) > 1:
+        getter = attrgetter(*slots.values())
+    elif slots:
+        single = attrgetter(*slots.values())
+        getter = lambda row: (single(row),)
+    else:
+        getter = lambda row: ()
+
+    cls = type('Row', (CompactRow,), {
+        '__slots__': tuple(slots.values()),
+        '_columns': columns,
+        '_slots': slots,
+        '_fields': fields,
+        '_getter': staticmethod(getter),
+        '_numeric': tuple(position for position, column in enumerate(columns)
+                          if column in NUMERIC_COLUMNS),
+    })
+    _CLASSES[columns] = cls
+    return cls
+
+
+def compact(row: Mapping) -> CompactRow:
+    """Convertit une ligne (dictionnaire) en ligne compacte."""
+    if isinstance(row, CompactRow):
+        return row
+    return row_class(tuple(row))(row)
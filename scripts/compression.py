@@ -0,0 +1,98 @@
+"""
+=============================================================================
+COMPRESSION DES RÉPONSES DE L'API REST
+=============================================================================
+Compression HTTP négociée avec le client (en-tête Accept-Encoding):
+
+- gzip (module standard zlib), toujours disponible;
+- brotli (br), plus compact, si le module brotli est installé.
+
+Trois usages dans l'API (voir flask_api):
+- corps complets: compressés à la volée au-delà de MIN_SIZE octets;
+- réponses en cache: variante compressée une seule fois (niveau maximal)
+  et conservée avec le corps (voir response_cache);
+- réponses en streaming: compression au fil de l'eau, paquet par paquet,
+  sans construire le corps complet.
+
+Configuration: MARKETFLOW_COMPRESS_MIN_BYTES (défaut: 1024, 0: tout compresser).
+=============================================================================
+"""
+
+import os
+import zlib
+from typing import Iterable, Iterator, Optional
+
+# Brotli optionnel: gzip seul si le module n'est pas installé
+try:
+    import brotli
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
+# Taille minimale d'un corps compressé (en dessous, le gain ne couvre pas le coût)
+MIN_SIZE = int(os.environ.get('MARKETFLOW_COMPRESS_MIN_BYTES', '1024'))
+
+# Types de contenu compressés (les images PNG/JPEG le sont déjà)
+COMPRESSIBLE_MIMETYPES = frozenset({'application/json', 'text/html', 'text/plain',
+                                    'text/css', 'application/javascript'})
+
+# Niveaux: rapides pour la compression à la volée, maximaux pour le cache
+LEVELS = {
+    'gzip': {'dynamic': 6, 'static': 9},
+    'br': {'dynamic': 5, 'static': 11},
+}
+
+
+def supported_encodings() -> tuple:
+    """Encodages disponibles, par ordre de préférence."""
+    return ('br', 'gzip') if BROTLI_AVAILABLE else ('gzip',)
+
+
+def choose_encoding(quality) -> Optional[str]:
+    """
+    Encodage à utiliser pour un client.
+    quality(encoding) retourne la qualité (q) acceptée par le client, 0 si refusé.
+    """
+    best, best_quality = None, 0
+    for encoding in supported_encodings():
+        value = quality(encoding)
+        if value > best_quality:
+            best, best_quality = encoding, value
+    return best
+
+
+def _gzip_compressor(level: int):
+    # wbits=31: format gzip (en-tête et CRC) plutôt que zlib brut
+    return zlib.compressobj(level, zlib.DEFLATED, 31)
+
+
+def compress(data: bytes, encoding: str, static: bool = False) -> bytes:
+    """Compresse un corps complet (static=True: niveau maximal, pour le cache)."""
+    level = LEVELS[encoding]['static' if static else 'dynamic']
+    if encoding == 'br':
+        return brotli.compress(data, quality=level)
+    compressor = _gzip_compressor(level)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """
+    Compresse un flux paquet par paquet. Chaque paquet est vidé (flush)
+    aussitôt: le client reçoit les données au rythme où elles sont produites.
+    """
+    level = LEVELS[encoding]['dynamic']
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        for chunk in chunks:
+            data = compressor.process(chunk) + compressor.flush()
+            if data:
+                yield data
+        yield compressor.finish()
+        return
+
+    compressor = _gzip_compressor(level)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
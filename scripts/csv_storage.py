@@ -0,0 +1,442 @@
+"""
+=============================================================================
+MOTEUR DE STOCKAGE CSV
+=============================================================================
+Implémentation historique du stockage: une table = un fichier data/*.csv.
+
+- Lecture via TableCache (lignes parsées en mémoire, index primaire et
+  secondaires, invalidation sur mtime/taille).
+- Écriture en mode 'rewrite' (réécriture complète du CSV) ou 'log'
+  (journal en ajout seul + compaction en arrière-plan, voir write_log).
+- IDs attribués par des séquences persistantes (voir id_sequence).
+- Écritures multi-tables atomiques (write_batch) via un journal de
+  transaction rejoué au démarrage après un arrêt brutal.
+- Accès concurrents: verrou lecteurs/écrivain par table, partagé entre
+  threads et entre processus (voir table_lock). transaction(*tables)
+  réserve plusieurs tables pour une séquence lecture-modification-écriture.
+- Lecture d'une ligne par ID sans charger la table (OFFSET_INDEXED_TABLES):
+  index des positions des lignes et mmap (voir offset_index), complété par
+  le journal d'écriture en mode 'log'.
+=============================================================================
+"""
+
+import csv
+import glob
+import hashlib
+import os
+import threading
+from contextlib import ExitStack, contextmanager
+from typing import Callable, Dict, List, Optional
+
+from storage import StorageEngine, TABLES, INDEXES
+from table_cache import TableCache, normalize_row
+from write_log import WriteLog, TransactionJournal, apply_records, find_record, read_rows
+from id_sequence import IdSequence
+from table_lock import TableLock
+from offset_index import OffsetIndex
+
+# Tables volumineuses lues ligne à ligne (index des positions) tant que le
+# cache ne les a pas chargées en entier
+OFFSET_INDEXED_TABLES = ('orders',)
+
+
+def _index_key(column: str, lower: bool) -> Callable[[Dict], str]:
+    """Construit la fonction de clé d'un index à partir de sa déclaration."""
+    if lower:
+        return lambda row: row[column].lower()
+    return lambda row: row[column]
+
+
+class CsvStorage(StorageEngine):
+    """Stockage dans des fichiers CSV avec cache et index en mémoire."""
+
+    name = 'csv'
+
+    def __init__(self, data_dir: str, write_mode: str = None):
+        """
+        write_mode: 'rewrite' (réécriture complète du CSV à chaque mutation)
+                    ou 'log' (journal en ajout seul + compaction en arrière-plan).
+                    Par défaut: variable d'environnement MARKETFLOW_WRITE_MODE.
+        """
+        self.data_dir = data_dir
+        self.paths = {table: os.path.join(data_dir, f'{table}.csv') for table in TABLES}
+
+        # Verrou lecteurs/écrivain de chaque table (threads et processus)
+        self.locks = {path: TableLock(path) for path in self.paths.values()}
+
+        # Mode d'écriture et seuil de compaction du journal
+        self.write_mode = write_mode or os.environ.get('MARKETFLOW_WRITE_MODE', 'rewrite')
+        self.compact_threshold = int(os.environ.get('MARKETFLOW_LOG_COMPACT_THRESHOLD', '500'))
+        self.write_logs: Dict[str, WriteLog] = {}
+
+        # Séquences d'IDs persistantes (blocs pré-alloués par processus;
+        # 1: IDs dans l'ordre d'attribution entre workers, voir id_sequence)
+        self.id_block_size = int(os.environ.get('MARKETFLOW_ID_BLOCK_SIZE', '32'))
+        self.sequences: Dict[str, IdSequence] = {}
+        self._sequences_lock = threading.Lock()
+
+        # Cache des tables parsées (invalidé sur mtime/taille ou écriture)
+        self.cache = TableCache()
+
+        # Index des positions des lignes des grosses tables
+        self.offset_indexes = {self.paths[table]: OffsetIndex(self.paths[table])
+                               for table in OFFSET_INDEXED_TABLES}
+
+        # Index secondaires maintenus par le cache
+        for table, indexes in INDEXES.items():
+            for name, (column, lower, unique) in indexes.items():
+                self.cache.declare_index(self.paths[table], name,
+                                         _index_key(column, lower), unique=unique)
+
+        # Journaux des écritures multi-tables (rejoués si une transaction a été interrompue)
+        self._recover()
+
+    # =========================================================================
+    # TABLES
+    # =========================================================================
+
+    def table_exists(self, table: str) -> bool:
+        return os.path.exists(self.paths[table])
+
+    def create_table(self, table: str):
+        self._write_csv(self.paths[table], TABLES[table], [])
+
+    def upgrade_table(self, table: str):
+        """Réécrit le CSV avec l'en-tête courant si des colonnes lui manquent."""
+        filepath = self.paths[table]
+        with self.transaction(table):
+            with open(filepath, newline='', encoding='utf-8') as f:
+                headers = next(csv.reader(f), [])
+            if headers == TABLES[table]:
+                return
+            rows = [normalize_row(row, TABLES[table]) for row in self.all_rows(table)]
+            self._write_csv(filepath, TABLES[table], rows)
+        print(f"[DB] Table {table}: colonnes mises à jour")
+
+    # =========================================================================
+    # LECTURE
+    # =========================================================================
+
+    def _shared(self, table: str):
+        """Verrou de lecture d'une table."""
+        return self.locks[self.paths[table]].shared()
+
+    def all_rows(self, table: str) -> List[Dict]:
+        with self._shared(table):
+            return self.cache.get_rows(self.paths[table])
+
+    def get(self, table: str, row_id: str) -> Optional[Dict]:
+        filepath = self.paths[table]
+        with self._shared(table):
+            index = self.offset_indexes.get(filepath)
+            if index is not None and not self.cache.is_fresh(filepath):
+                return self._read_row(table, index, str(row_id))
+            return self.cache.get_by_id(filepath, str(row_id))
+
+    def _read_row(self, table: str, index: OffsetIndex, row_id: str) -> Optional[Dict]:
+        """Lit une seule ligne: journal d'écriture d'abord, puis CSV de base par mmap."""
+        record = find_record(self.paths[table], row_id)
+        if record is not None:
+            return normalize_row(record['row'], TABLES[table]) if record['op'] == 'put' else None
+        row = index.get(row_id)
+        return normalize_row(row, TABLES[table]) if row is not None else None
+
+    def get_many(self, table: str, row_ids: List[str]) -> Dict[str, Dict]:
+        with self._shared(table):
+            return self.cache.get_many(self.paths[table], [str(row_id) for row_id in row_ids])
+
+    def lookup(self, table: str, index: str, key: str) -> List[Dict]:
+        with self._shared(table):
+            return self.cache.lookup(self.paths[table], index, key)
+
+    def page(self, table: str, after_id: Optional[int], limit: int,
+             predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        with self._shared(table):
+            return self.cache.page(self.paths[table], after_id, limit, predicate)
+
+    def lookup_page(self, table: str, index: str, key: str, after_id: Optional[int],
+                    limit: int, predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        with self._shared(table):
+            return self.cache.lookup_page(self.paths[table], index, key, after_id, limit, predicate)
+
+    def version(self, table: str) -> int:
+        with self._shared(table):
+            return self.cache.version(self.paths[table])
+
+    def version_tag(self, table: str) -> str:
+        """
+        Empreinte de la signature des fichiers (CSV et journal): les numéros
+        de version du cache sont propres à chaque processus.
+        """
+        with self._shared(table):
+            signature = self.cache.signature(self.paths[table])
+        return hashlib.blake2b(repr(signature).encode('ascii'), digest_size=8).hexdigest()
+
+    def modified(self, table: str) -> Optional[float]:
+        with self._shared(table):
+            signature = self.cache.signature(self.paths[table])
+        mtimes = [part[0] for part in signature or () if part is not None]
+        return max(mtimes) / 1e9 if mtimes else None
+
+    # =========================================================================
+    # ÉCRITURE
+    # =========================================================================
+
+    @contextmanager
+    def transaction(self, *tables: str):
+        """
+        Réserve des tables en écriture pour toute la durée du bloc, afin
+        qu'une lecture suivie d'une écriture ne soit pas entrecoupée par un
+        autre thread ou processus. Verrous pris dans un ordre fixe.
+        """
+        with ExitStack() as stack:
+            for table in sorted(set(tables)):
+                stack.enter_context(self.locks[self.paths[table]])
+            yield
+
+    def _commit(self, filepath: str, write_disk, write_log, update_cache):
+        """
+        Exécute une mutation: écriture disque (réécriture ou journal selon
+        write_mode) puis mise à jour du cache, sous le verrou de la table
+        pour qu'une compaction ne s'intercale jamais entre les deux.
+        """
+        table_log = self._write_log(filepath)
+        with table_log.lock:
+            was_fresh = self.cache.is_fresh(filepath)
+            if self.write_mode == 'log':
+                write_log(table_log)
+            else:
+                write_disk()
+            update_cache(was_fresh)
+
+        if self.write_mode == 'log':
+            self._maybe_compact(filepath)
+
+    def insert(self, table: str, row: Dict):
+        """Ajoute une ligne en fin de table."""
+        filepath = self.paths[table]
+
+        def write_disk():
+            with open(filepath, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=TABLES[table])
+                writer.writerow(row)
+
+        self._commit(
+            filepath, write_disk,
+            lambda table_log: table_log.put([normalize_row(row, TABLES[table])]),
+            lambda was_fresh: self.cache.append(filepath, row, was_fresh)
+        )
+
+    def update(self, table: str, row_id: str, changes: Dict) -> Optional[Dict]:
+        """
+        Met à jour une seule ligne repérée par son ID.
+        Retourne la ligne mise à jour, ou None si l'ID est inconnu.
+        """
+        filepath = self.paths[table]
+        headers = TABLES[table]
+        # Lecture et écriture sous le même verrou: pas de mise à jour perdue
+        with self.transaction(table):
+            # Ligne partagée avec le cache: remplacée par identité ci-dessous
+            current = self.cache.get_by_id(filepath, str(row_id))
+            if current is None:
+                return None
+
+            updated = normalize_row(dict(current, **changes), headers)
+
+            def write_disk():
+                rows = self.cache.get_rows(filepath)
+                self._write_file(filepath, headers, [updated if row is current else row for row in rows])
+
+            self._commit(
+                filepath, write_disk,
+                lambda table_log: table_log.put([updated]),
+                lambda was_fresh: self.cache.replace(filepath, headers, current, updated, was_fresh)
+            )
+            return updated
+
+    def delete(self, table: str, row_ids: List[str]) -> int:
+        """Supprime des lignes par ID et retourne leur nombre."""
+        filepath = self.paths[table]
+        headers = TABLES[table]
+        with self.transaction(table):
+            to_delete = [row for row in (self.cache.get_by_id(filepath, str(row_id)) for row_id in row_ids)
+                         if row]
+            if not to_delete:
+                return 0
+
+            def write_disk():
+                deleted_ids = {id(row) for row in to_delete}
+                rows = self.cache.get_rows(filepath)
+                self._write_file(filepath, headers, [row for row in rows if id(row) not in deleted_ids])
+
+            self._commit(
+                filepath, write_disk,
+                lambda table_log: table_log.delete([row['id'] for row in to_delete]),
+                lambda was_fresh: self.cache.remove(filepath, to_delete, was_fresh)
+            )
+            return len(to_delete)
+
+    def write_batch(self, puts: Dict[str, List[Dict]] = None,
+                    deletes: Dict[str, List[str]] = None,
+                    expect: Dict[str, Dict[str, Dict]] = None):
+        """
+        Écrit atomiquement plusieurs tables: une seule écriture par table,
+        précédée d'un journal de transaction synchronisé sur disque.
+        expect: valeurs attendues, vérifiées sous verrou (voir StorageEngine.write_batch).
+        """
+        records: Dict[str, List[Dict]] = {}
+        for table, rows in (puts or {}).items():
+            records.setdefault(table, []).extend(
+                {'op': 'put', 'row': normalize_row(row, TABLES[table])} for row in rows)
+        for table, row_ids in (deletes or {}).items():
+            records.setdefault(table, []).extend(
+                {'op': 'del', 'id': str(row_id)} for row_id in row_ids)
+        records = {table: table_records for table, table_records in records.items() if table_records}
+        if not records:
+            return
+
+        tables = sorted(records)
+        journal = TransactionJournal(os.path.join(
+            self.data_dir, f'transaction-{os.getpid()}-{threading.get_ident()}.journal'))
+        with self.transaction(*tables, *(expect or {})):
+            self.check_expected(expect)
+            journal.write(records)
+            for table in tables:
+                self._write_records(table, records[table])
+            journal.clear()
+
+        if self.write_mode == 'log':
+            for table in tables:
+                self._maybe_compact(self.paths[table])
+
+    def _write_records(self, table: str, records: List[Dict]):
+        """Écrit des enregistrements put/del sur une table (verrou déjà pris)."""
+        filepath = self.paths[table]
+        headers = TABLES[table]
+
+        if self.write_mode == 'log':
+            was_fresh = self.cache.is_fresh(filepath)
+            self._write_log(filepath).append(records)
+        else:
+            # Table chargée d'abord: le cache reste à jour après la réécriture
+            rows = apply_records(list(self.cache.get_rows(filepath)), records)
+            was_fresh = self.cache.is_fresh(filepath)
+            self._write_file(filepath, headers, rows)
+
+        self.cache.apply_records(filepath, headers, records, was_fresh)
+
+    def _recover(self):
+        """
+        Rejoue les transactions validées mais interrompues avant leur fin.
+
+        Sous le verrou de toutes les tables: une écriture en cours garde les
+        verrous de ses tables jusqu'à l'effacement de son journal, elle n'est
+        donc jamais prise pour une transaction interrompue.
+        """
+        pattern = os.path.join(self.data_dir, 'transaction*.journal')
+        if not glob.glob(pattern) and not glob.glob(pattern + '.tmp'):
+            return
+
+        with self.transaction(*TABLES):
+            for path in glob.glob(pattern):
+                journal = TransactionJournal(path)
+                pending = journal.pending()
+                if pending is not None:
+                    for table, records in pending.items():
+                        filepath = self.paths[table]
+                        self._write_file(filepath, TABLES[table],
+                                         apply_records(read_rows(filepath), records))
+                    print("[DB] Transaction interrompue rejouée depuis le journal")
+                journal.clear()
+
+            # Journaux jamais validés (arrêt avant leur renommage)
+            for tmp_path in glob.glob(pattern + '.tmp'):
+                os.remove(tmp_path)
+
+    def _write_file(self, filepath: str, headers: List[str], data: List[Dict]):
+        """
+        Réécrit physiquement un fichier CSV, sans toucher au cache.
+        Écriture dans un fichier temporaire puis renommage atomique: un arrêt
+        brutal laisse l'ancienne ou la nouvelle version, jamais un fichier tronqué.
+        Le fichier contient alors l'état complet: son journal est supprimé.
+        """
+        tmp_path = filepath + '.tmp'
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.DictWriter(f, fieldnames=headers)
+            writer.writeheader()
+            writer.writerows(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+        self._write_log(filepath).discard()
+
+    def _write_csv(self, filepath: str, headers: List[str], data: List[Dict]):
+        """Écrit des données dans un fichier CSV."""
+        with self._write_log(filepath).lock:
+            self._write_file(filepath, headers, data)
+            self.cache.store(filepath, headers, data)
+
+    # =========================================================================
+    # SÉQUENCES D'IDS
+    # =========================================================================
+
+    def _max_id_plus_one(self, table: str) -> int:
+        """Premier ID libre calculé sur la table (initialisation des séquences)."""
+        data = self.all_rows(table)
+        if not data:
+            return 1
+        return max(int(row['id']) for row in data) + 1
+
+    def next_id(self, table: str) -> int:
+        """Génère le prochain ID disponible pour une table."""
+        with self._sequences_lock:
+            sequence = self.sequences.get(table)
+            if sequence is None:
+                sequence = IdSequence(self.paths[table], lambda: self._max_id_plus_one(table),
+                                      self.id_block_size)
+                self.sequences[table] = sequence
+
+        # Garde-fou si des lignes ont été ajoutées hors séquence (édition
+        # manuelle), vérifié dans le cache: la table est de toute façon
+        # chargée par l'écriture qui suit, sans passer par l'index des positions
+        filepath = self.paths[table]
+        next_id = sequence.next_id()
+        with self._shared(table):
+            while self.cache.get_by_id(filepath, str(next_id)) is not None:
+                next_id = sequence.next_id()
+        return next_id
+
+    # =========================================================================
+    # JOURNAL D'ÉCRITURE (MODE 'log')
+    # =========================================================================
+
+    def _write_log(self, filepath: str) -> WriteLog:
+        """Retourne le journal d'écriture d'une table (créé à la demande)."""
+        if filepath not in self.write_logs:
+            self.write_logs.setdefault(filepath, WriteLog(filepath, lock=self.locks[filepath]))
+        return self.write_logs[filepath]
+
+    def _maybe_compact(self, filepath: str):
+        """Déclenche une compaction en arrière-plan si le journal est trop long."""
+        table_log = self._write_log(filepath)
+        if table_log.pending >= self.compact_threshold:
+            table_log.compact_in_background(lambda: list(self.cache.get_rows(filepath)), self.cache)
+
+    def compact_logs(self):
+        """Intègre immédiatement tous les journaux dans les CSV de base."""
+        for filepath in self.paths.values():
+            table_log = self._write_log(filepath)
+            if table_log.pending:
+                table_log.compact(lambda: list(self.cache.get_rows(filepath)), self.cache)
+
+    # =========================================================================
+    # STATISTIQUES
+    # =========================================================================
+
+    def stats(self) -> Dict:
+        stats = self.cache.stats()
+        stats['engine'] = self.name
+        stats['write_mode'] = self.write_mode
+        stats['offset_indexes'] = {os.path.basename(path): index.stats()
+                                   for path, index in self.offset_indexes.items()}
+        return stats
@@ -1,41 +1,81 @@
 """
 =============================================================================
-GESTIONNAIRE DE BASE DE DONNÉES CSV
+GESTIONNAIRE DE BASE DE DONNÉES
 =============================================================================
-Ce module gère toutes les opérations CRUD sur les fichiers CSV.
-Les données sont persistantes et stockées dans le dossier 'data'.
-
-Tables CSV:
-- users.csv : Utilisateurs (clients, vendeurs, admins)
-- products.csv : Catalogue des produits
-- orders.csv : Commandes passées
-- cart.csv : Paniers des utilisateurs
+Ce module gère toutes les opérations CRUD de l'application.
+Les données sont persistantes et stockées dans le dossier 'data', via un
+moteur de stockage configurable (voir storage.py):
+- 'csv'    : fichiers CSV (moteur par défaut)
+- 'sqlite' : base SQLite data/marketflow.db
+
+Tables:
+- users : Utilisateurs (clients, vendeurs, admins)
+- products : Catalogue des produits
+- orders : Commandes passées
+- order_items : Lignes des commandes (produit, prix, quantité, vendeur)
+- cart : Paniers des utilisateurs
 =============================================================================
 """
 
-import csv
 import os
 import hashlib
+import random
 import secrets
 import json
-from datetime import datetime
-from typing import List, Dict, Optional
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterator, List, Optional
 import urllib.request
 import urllib.error
 
+from storage import StorageEngine, ConflictError, TABLES, create_storage
+from search_index import SearchIndex
+from pwned_store import RangeCache, OfflineRangeStore, parse_range
+from bloom_filter import BloomFilter
+
+# Pagination par curseur (keyset sur l'ID). Un parcours n'est pas un
+# instantané: une ligne insérée derrière le curseur en cours (ID d'un bloc
+# plus ancien, voir id_sequence) est absente des pages suivantes.
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+# Taille des lots lus par les itérateurs d'export (réponses en streaming)
+STREAM_BATCH_SIZE = 500
+
+# Durée de réservation du stock par une ligne de panier (minutes)
+RESERVATION_MINUTES = int(os.environ.get('MARKETFLOW_RESERVATION_MINUTES', '15'))
+
+# Tentatives d'une commande en cas de conflit sur les stocks
+CHECKOUT_ATTEMPTS = 5
+
+
+class OutOfStockError(Exception):
+    """Stock insuffisant pour un produit du panier au moment de la commande."""
+
+    def __init__(self, product: Dict, available: int):
+        super().__init__(f"Stock insuffisant pour {product['name']} ({available} disponible(s))")
+        self.product_id = product['id']
+        self.available = available
+
 
 class DatabaseManager:
     """
-    Classe principale pour la gestion de la base de données CSV.
+    Classe principale pour la gestion de la base de données.
     Gère les utilisateurs, produits, panier et commandes.
     """
 
-    def __init__(self):
+    def __init__(self, storage: str = None, write_mode: str = None, data_dir: str = None):
         """
-        Initialise le gestionnaire avec les chemins vers les fichiers CSV.
+        Initialise le gestionnaire et son moteur de stockage.
+
+        storage: 'csv' ou 'sqlite' (défaut: variable MARKETFLOW_STORAGE, sinon 'csv').
+        write_mode: pour le moteur CSV, 'rewrite' (réécriture complète à chaque
+                    mutation) ou 'log' (journal + compaction en arrière-plan).
+                    Par défaut: variable d'environnement MARKETFLOW_WRITE_MODE.
+        data_dir: répertoire des données (défaut: data/ à côté de ce module).
         """
         # Répertoire de stockage des données
-        self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
+        self.data_dir = data_dir or os.path.join(os.path.dirname(__file__), 'data')
 
         # Chemins vers les différents fichiers CSV
         self.users_file = os.path.join(self.data_dir, 'users.csv')
@@ -43,22 +83,48 @@ class DatabaseManager:
         self.orders_file = os.path.join(self.data_dir, 'orders.csv')
         self.cart_file = os.path.join(self.data_dir, 'cart.csv')
 
-    def initialize_database(self):
-        """
-        Crée le répertoire data et initialise tous les fichiers CSV
-        avec leurs en-têtes si ils n'existent pas.
-        """
         # Création du répertoire data s'il n'existe pas
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
             print(f"[DB] Répertoire créé: {self.data_dir}")
 
-        # Initialisation de chaque table CSV
+        # Moteur de stockage (CSV ou SQLite)
+        self.storage: StorageEngine = create_storage(self.data_dir, storage, write_mode)
+
+        # Index plein texte des produits (construit à la première recherche)
+        self.search_index = SearchIndex()
+
+        # Vérification des mots de passe compromis: cache des plages de l'API
+        # et base locale optionnelle (voir pwned_store)
+        self.pwned_mode = os.environ.get('MARKETFLOW_PWNED_MODE', 'auto')
+        self.pwned_cache = RangeCache()
+        self.pwned_store = OfflineRangeStore(
+            os.environ.get('MARKETFLOW_PWNED_PATH', os.path.join(self.data_dir, 'pwned')))
+        # Préfiltre optionnel: filtre de Bloom de la base locale (voir bloom_filter)
+        self.pwned_filter = BloomFilter(
+            os.environ.get('MARKETFLOW_PWNED_BLOOM', os.path.join(self.data_dir, 'pwned.bloom')))
+
+    def initialize_database(self):
+        """
+        Initialise toutes les tables (fichiers CSV avec leurs en-têtes ou
+        tables SQLite) si elles n'existent pas.
+        """
+        # Données CSV existantes non importées dans la base SQLite
+        if (self.storage.name == 'sqlite' and not self.storage.table_exists('users')
+                and os.path.exists(self.users_file)):
+            print("[DB] Fichiers CSV détectés: lancez migrate_to_sqlite.py pour les importer")
+
+        # Initialisation de chaque table
         self._init_users_table()
         self._init_products_table()
         self._init_orders_table()
+        self._init_order_items_table()
         self._init_cart_table()
 
+        # Colonnes ajoutées au schéma depuis la création des tables
+        for table in TABLES:
+            self.storage.upgrade_table(table)
+
         print("[DB] Base de données initialisée avec succès")
 
     # =========================================================================
@@ -70,10 +136,8 @@ class DatabaseManager:
         Initialise la table des utilisateurs.
         Crée des comptes vendeur pré-configurés si la table est vide.
         """
-        if not os.path.exists(self.users_file):
-            headers = ['id', 'email', 'password_hash', 'salt', 'firstname',
-                      'lastname', 'role', 'created_at', 'last_login']
-            self._write_csv(self.users_file, headers, [])
+        if not self.storage.table_exists('users'):
+            self.storage.create_table('users')
 
             # Admin système
             self.create_user('admin@marketflow.com', 'Admin2024!', 'Admin', 'Système', 'admin')
@@ -88,10 +152,8 @@ class DatabaseManager:
         """
         Initialise la table des produits avec des produits de démonstration.
         """
-        if not os.path.exists(self.products_file):
-            headers = ['id', 'name', 'description', 'price', 'stock',
-                      'category', 'image_url', 'seller_id', 'created_at', 'active']
-            self._write_csv(self.products_file, headers, [])
+        if not self.storage.table_exists('products'):
+            self.storage.create_table('products')
 
             # Produits de démonstration
             demo_products = [
@@ -112,7 +174,7 @@ class DatabaseManager:
                 '2'),
 
                 ('Sony WH-1000XM5',
-                'Casque audio sans fil avec réduction de bruit active premium, autonomie 30h.'
+                'Casque audio sans fil avec réduction de bruit active premium, autonomie 30h.',
                 '379.99',
                 '30',
                 'Audio',
@@ -185,53 +247,118 @@ class DatabaseManager:
 
     def _init_orders_table(self):
         """Initialise la table des commandes."""
-        if not os.path.exists(self.orders_file):
-            headers = ['id', 'user_id', 'products', 'total', 'status',
-                      'shipping_address', 'created_at', 'updated_at']
-            self._write_csv(self.orders_file, headers, [])
+        if not self.storage.table_exists('orders'):
+            self.storage.create_table('orders')
             print("[DB] Table orders créée")
 
 
+    def _init_order_items_table(self):
+        """Initialise la table des lignes de commande."""
+        if not self.storage.table_exists('order_items'):
+            self.storage.create_table('order_items')
+            print("[DB] Table order_items créée")
+            if self.storage.all_rows('orders'):
+                print("[DB] Commandes existantes: lancez migrate_order_items.py pour créer leurs lignes")
+
     def _init_cart_table(self):
         """Initialise la table des paniers."""
-        if not os.path.exists(self.cart_file):
-            headers = ['id', 'user_id', 'product_id', 'quantity', 'added_at']
-            self._write_csv(self.cart_file, headers, [])
+        if not self.storage.table_exists('cart'):
+            self.storage.create_table('cart')
             print("[DB] Table cart créée")
 
     # =========================================================================
-    # UTILITAIRES CSV
+    # UTILITAIRES
     # =========================================================================
 
-    def _read_csv(self, filepath: str) -> List[Dict]:
-        """Lit un fichier CSV et retourne une liste de dictionnaires."""
-        if not os.path.exists(filepath):
-            return []
-        with open(filepath, 'r', newline='', encoding='utf-8') as f:
-            return list(csv.DictReader(f))
-
+    def _read_table(self, table: str) -> List[Dict]:
+        """
+        Retourne toutes les lignes d'une table.
+        Les lignes sont copiées: l'appelant peut les modifier librement.
+        """
+        return [row.copy() for row in self.storage.all_rows(table)]
 
-    def _write_csv(self, filepath: str, headers: List[str], data: List[Dict]):
-        """Écrit des données dans un fichier CSV."""
-        with open(filepath, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            writer.writeheader()
-            writer.writerows(data)
+    def data_version(self, *tables: str) -> str:
+        """
+        Version combinée de tables, modifiée par toute écriture dans l'une
+        d'elles et identique dans tous les processus (validateur ETag).
+        """
+        return '|'.join(f"{table}:{self.storage.version_tag(table)}" for table in tables)
 
+    def data_modified(self, *tables: str) -> Optional[float]:
+        """Date (timestamp) de la dernière modification de tables, si connue."""
+        dates = [date for date in map(self.storage.modified, tables) if date is not None]
+        return max(dates) if dates else None
 
-    def _append_csv(self, filepath: str, row: Dict):
-        """Ajoute une ligne à un fichier CSV existant."""
-        with open(filepath, 'a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=row.keys())
-            writer.writerow(row)
 
+    @staticmethod
+    def _parse_cursor(cursor) -> Optional[int]:
+        """Convertit un curseur de pagination (dernier ID vu) en entier."""
+        if cursor is None or cursor == '':
+            return None
+        try:
+            return int(cursor)
+        except (TypeError, ValueError):
+            raise ValueError(f"Curseur de pagination invalide: {cursor}")
+
+    @staticmethod
+    def _page_size(limit) -> int:
+        """Borne la taille de page demandée."""
+        if limit is None or limit == '':
+            return DEFAULT_PAGE_SIZE
+        try:
+            return max(1, min(int(limit), MAX_PAGE_SIZE))
+        except (TypeError, ValueError):
+            raise ValueError(f"Taille de page invalide: {limit}")
 
-    def _get_next_id(self, filepath: str) -> int:
-        """Génère le prochain ID disponible pour une table."""
-        data = self._read_csv(filepath)
-        if not data:
-            return 1
-        return max(int(row['id']) for row in data) + 1
+    @staticmethod
+    def _page_result(rows: List[Dict], limit: int) -> Dict:
+        """
+        Construit une page à partir de limit + 1 lignes lues:
+        la ligne supplémentaire indique seulement qu'une page suivante existe.
+        """
+        items = [row.copy() for row in rows[:limit]]
+        next_cursor = items[-1]['id'] if len(rows) > limit else None
+        return {'items': items, 'next_cursor': next_cursor}
+
+    def _page(self, table: str, cursor=None, limit=None, predicate=None) -> Dict:
+        """Page d'une table complète, via l'index ordonné du moteur de stockage."""
+        after_id = self._parse_cursor(cursor)
+        limit = self._page_size(limit)
+        return self._page_result(self.storage.page(table, after_id, limit + 1, predicate), limit)
+
+    def _page_index(self, table: str, index: str, key: str, cursor=None, limit=None,
+                    predicate=None) -> Dict:
+        """Page des lignes d'une clé d'index secondaire, sans tri par requête."""
+        after_id = self._parse_cursor(cursor)
+        limit = self._page_size(limit)
+        return self._page_result(
+            self.storage.lookup_page(table, index, key, after_id, limit + 1, predicate), limit)
+
+    def _iter_batches(self, table: str, predicate=None) -> Iterator[List[Dict]]:
+        """
+        Parcourt une table par lots de STREAM_BATCH_SIZE lignes copiées, par ID
+        croissant. Chaque lot est relu via le curseur: la mémoire reste bornée
+        et aucun verrou n'est conservé entre deux lots.
+        """
+        after_id = None
+        while True:
+            rows = self.storage.page(table, after_id, STREAM_BATCH_SIZE, predicate)
+            if not rows:
+                return
+            yield [row.copy() for row in rows]
+            if len(rows) < STREAM_BATCH_SIZE:
+                return
+            after_id = int(rows[-1]['id'])
+
+    def get_cache_stats(self) -> Dict:
+        """Retourne l'état du moteur de stockage (compteurs du cache pour le CSV)."""
+        return self.storage.stats()
+
+
+    def compact_logs(self):
+        """Intègre les journaux d'écriture dans les CSV de base (mode 'log')."""
+        if hasattr(self.storage, 'compact_logs'):
+            self.storage.compact_logs()
 
     # =========================================================================
     # GESTION DES UTILISATEURS
@@ -251,6 +378,8 @@ class DatabaseManager:
         """
         Vérifie si un mot de passe est compromis en utilisant l'API HaveIBeenPwned.
         Utilise le protocole k-Anonymity pour ne pas envoyer le mot de passe complet.
+        Le filtre de Bloom, la base locale (si présents) puis le cache des
+        plages sont consultés avant l'API (voir _pwned_count).
         
         Retourne:
             dict: {
@@ -263,39 +392,14 @@ class DatabaseManager:
             # Hash SHA-1 du mot de passe (requis par l'API)
             sha1_hash = hashlib.sha1(password.encode('utf-8')).hexdigest().upper()
             
-            # Préfixe (5 premiers caractères) et suffixe
-            prefix = sha1_hash[:5]
-            suffix = sha1_hash[5:]
-            
-            # Appel à l'API HaveIBeenPwned avec k-Anonymity
-            url = f"https://api.pwnedpasswords.com/range/{prefix}"
-            
-            # Configuration de la requête avec User-Agent
-            request = urllib.request.Request(
-                url,
-                headers={
-                    'User-Agent': 'MarketFlow-PasswordChecker/1.0',
-                    'Add-Padding': 'true'
+            count_int = self._pwned_count(sha1_hash)
+            if count_int > 0:
+                print(f"[SECURITY] Mot de passe compromis détecté! Trouvé {count_int} fois dans les fuites.")
+                return {
+                    'compromised': True,
+                    'count': count_int,
+                    'error': None
                 }
-            )
-            
-            # Exécution de la requête avec timeout
-            with urllib.request.urlopen(request, timeout=5) as response:
-                data = response.read().decode('utf-8')
-            
-            # Parcours des résultats pour trouver le suffixe
-            for line in data.splitlines():
-                parts = line.split(':')
-                if len(parts) == 2:
-                    hash_suffix, count = parts
-                    if hash_suffix.upper() == suffix:
-                        count_int = int(count)
-                        print(f"[SECURITY] Mot de passe compromis détecté! Trouvé {count_int} fois dans les fuites.")
-                        return {
-                            'compromised': True,
-                            'count': count_int,
-                            'error': None
-                        }
             
             print("[SECURITY] Mot de passe non compromis.")
             return {
@@ -319,14 +423,60 @@ class DatabaseManager:
                 'error': f"Erreur lors de la vérification: {str(e)}"
             }
 
+    def _pwned_count(self, sha1_hash: str) -> int:
+        """
+        Nombre d'apparitions d'un hash SHA-1 dans les fuites:
+        filtre de Bloom, base locale, puis plage en cache, puis appel à
+        l'API (mis en cache).
+
+        Le filtre écarte sans recherche les hashes absents de la liste dont
+        il a été construit; il n'est pas consulté en mode 'online', l'API
+        pouvant connaître des fuites plus récentes que cette liste.
+        """
+        if self.pwned_mode != 'online' and self.pwned_filter.available:
+            if not self.pwned_filter.might_contain(sha1_hash):
+                return 0
+        if self.pwned_mode != 'online' and self.pwned_store.available:
+            count = self.pwned_store.count(sha1_hash)
+            if count is not None:
+                return count
+        if self.pwned_mode == 'offline':
+            raise LookupError(f"Base locale indisponible: {self.pwned_store.path}")
+
+        # Préfixe (5 premiers caractères) et suffixe
+        prefix = sha1_hash[:5]
+        suffix = sha1_hash[5:]
+
+        counts = self.pwned_cache.get(prefix)
+        if counts is None:
+            counts = parse_range(self._fetch_pwned_range(prefix))
+            self.pwned_cache.put(prefix, counts)
+        return counts.get(suffix, 0)
+
+    @staticmethod
+    def _fetch_pwned_range(prefix: str) -> str:
+        """Appel à l'API HaveIBeenPwned avec k-Anonymity (plage d'un préfixe)."""
+        url = f"https://api.pwnedpasswords.com/range/{prefix}"
+        
+        # Configuration de la requête avec User-Agent
+        request = urllib.request.Request(
+            url,
+            headers={
+                'User-Agent': 'MarketFlow-PasswordChecker/1.0',
+                'Add-Padding': 'true'
+            }
+        )
+        
+        # Exécution de la requête avec timeout
+        with urllib.request.urlopen(request, timeout=5) as response:
+            return response.read().decode('utf-8')
+
     def create_user(self, email: str, password: str, firstname: str,
                    lastname: str, role: str = 'client') -> Optional[Dict]:
         """Crée un nouvel utilisateur."""
         # Vérifie si l'email existe déjà
-        users = self._read_csv(self.users_file)
-        for user in users:
-            if user['email'].lower() == email.lower():
-                return None
+        if self.storage.lookup('users', 'email', email.lower()):
+            return None
 
         # Vérifie si le mot de passe est compromis
         password_check = self.check_password_compromised(password)
@@ -336,19 +486,24 @@ class DatabaseManager:
 
         password_hash, salt = self._hash_password(password)
 
-        user = {
-            'id': str(self._get_next_id(self.users_file)),
-            'email': email.lower(),
-            'password_hash': password_hash,
-            'salt': salt,
-            'firstname': firstname,
-            'lastname': lastname,
-            'role': role,
-            'created_at': datetime.now().isoformat(),
-            'last_login': ''
-        }
+        # Nouvelle vérification de l'email sous verrou, juste avant l'insertion
+        with self.storage.transaction('users'):
+            if self.storage.lookup('users', 'email', email.lower()):
+                return None
+
+            user = {
+                'id': str(self.storage.next_id('users')),
+                'email': email.lower(),
+                'password_hash': password_hash,
+                'salt': salt,
+                'firstname': firstname,
+                'lastname': lastname,
+                'role': role,
+                'created_at': datetime.now().isoformat(),
+                'last_login': ''
+            }
 
-        self._append_csv(self.users_file, user)
+            self.storage.insert('users', user)
         print(f"[DB] Utilisateur créé: {email} ({role})")
 
         # Retourne sans les données sensibles
@@ -357,7 +512,7 @@ class DatabaseManager:
 
     def authenticate_user(self, email: str, password: str) -> Optional[Dict]:
         """Authentifie un utilisateur avec son email et mot de passe."""
-        users = self._read_csv(self.users_file)
+        users = self.storage.lookup('users', 'email', email.lower())
 
         for user in users:
             if user['email'].lower() == email.lower():
@@ -373,58 +528,65 @@ class DatabaseManager:
 
     def _update_user_login(self, user_id: str):
         """Met à jour la date de dernière connexion."""
-        users = self._read_csv(self.users_file)
-        headers = ['id', 'email', 'password_hash', 'salt', 'firstname',
-                  'lastname', 'role', 'created_at', 'last_login']
-
-        for user in users:
-            if user['id'] == user_id:
-                user['last_login'] = datetime.now().isoformat()
-                break
 
-        self._write_csv(self.users_file, headers, users)
+        self.storage.update('users', user_id,
+                         {'last_login': datetime.now().isoformat()})
 
 
     def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Récupère un utilisateur par son ID."""
-        users = self._read_csv(self.users_file)
-        for user in users:
-            if user['id'] == user_id:
-                return {k: v for k, v in user.items() if k not in ['password_hash', 'salt']}
+        user = self.storage.get('users', user_id)
+        if user:
+            return {k: v for k, v in user.items() if k not in ['password_hash', 'salt']}
         return None
 
 
     def get_all_users(self) -> List[Dict]:
         """Récupère tous les utilisateurs (pour l'admin)."""
-        users = self._read_csv(self.users_file)
+        users = self.storage.all_rows('users')
         return [{k: v for k, v in user.items() if k not in ['password_hash', 'salt']} for user in users]
 
+    def iter_users(self) -> Iterator[Dict]:
+        """Itère sur tous les utilisateurs, sans les données sensibles."""
+        for batch in self._iter_batches('users'):
+            for user in batch:
+                yield {k: v for k, v in user.items() if k not in ['password_hash', 'salt']}
+
+    def get_users_page(self, cursor: str = None, limit: int = None) -> Dict:
+        """Page d'utilisateurs par ID croissant: {'items', 'next_cursor'}."""
+        page = self._page('users', cursor, limit)
+        page['items'] = [{k: v for k, v in user.items() if k not in ['password_hash', 'salt']}
+                         for user in page['items']]
+        return page
+
 
     def update_user(self, user_id: str, **kwargs) -> bool:
         """Met à jour les informations d'un utilisateur."""
-        users = self._read_csv(self.users_file)
-        headers = ['id', 'email', 'password_hash', 'salt', 'firstname',
-                  'lastname', 'role', 'created_at', 'last_login']
-
-        for user in users:
-            if user['id'] == user_id:
-                for key, value in kwargs.items():
-                    if key in user and key not in ['id', 'password_hash', 'salt']:
-                        user[key] = value
-                self._write_csv(self.users_file, headers, users)
-                return True
-        return False
+        with self.storage.transaction('users'):
+            user = self.storage.get('users', user_id)
+            if not user:
+                return False
+
+            changes = {key: value for key, value in kwargs.items()
+                       if key in user and key not in ['id', 'password_hash', 'salt']}
+
+            # L'email reste unique (index 'email')
+            if 'email' in changes:
+                changes['email'] = changes['email'].lower()
+                owners = self.storage.lookup('users', 'email', changes['email'])
+                if any(owner['id'] != user_id for owner in owners):
+                    return False
+
+            self.storage.update('users', user_id, changes)
+            return True
 
 
     def delete_user(self, user_id: str) -> bool:
         """Supprime un utilisateur."""
-        users = self._read_csv(self.users_file)
-        headers = ['id', 'email', 'password_hash', 'salt', 'firstname',
-                  'lastname', 'role', 'created_at', 'last_login']
 
-        new_users = [u for u in users if u['id'] != user_id]
-        if len(new_users) < len(users):
-            self._write_csv(self.users_file, headers, new_users)
+        user = self.storage.get('users', user_id)
+        if user:
+            self.storage.delete('users', [user_id])
             # Supprime aussi le panier de l'utilisateur
             self.clear_cart(user_id)
             return True
@@ -439,7 +601,7 @@ class DatabaseManager:
                       seller_id: str) -> Dict:
         """Crée un nouveau produit."""
         product = {
-            'id': str(self._get_next_id(self.products_file)),
+            'id': str(self.storage.next_id('products')),
             'name': name,
             'description': description,
             'price': price,
@@ -448,72 +610,160 @@ class DatabaseManager:
             'image_url': image_url,
             'seller_id': seller_id,
             'created_at': datetime.now().isoformat(),
-            'active': 'true'
+            'active': 'true',
+            'version': '0'
         }
 
-        self._append_csv(self.products_file, product)
+        with self.storage.transaction('products'):
+            version_before = self.storage.version('products')
+            self.storage.insert('products', product)
+            self._index_product(product, version_before)
         print(f"[DB] Produit créé: {name}")
         return product
 
 
     def get_all_products(self, active_only: bool = True) -> List[Dict]:
         """Récupère tous les produits."""
-        products = self._read_csv(self.products_file)
+        products = self._read_table('products')
         if active_only:
             return [p for p in products if p.get('active', 'true') == 'true']
         return products
 
 
+    def iter_products(self, active_only: bool = True) -> Iterator[Dict]:
+        """Itère sur les produits par lots (exports et réponses en streaming)."""
+        predicate = (lambda p: p.get('active', 'true') == 'true') if active_only else None
+        for batch in self._iter_batches('products', predicate):
+            yield from batch
+
+    def get_products_page(self, cursor: str = None, limit: int = None,
+                          active_only: bool = True, category: str = None) -> Dict:
+        """
+        Page de produits par ID croissant: {'items', 'next_cursor'}.
+        Passer next_cursor comme cursor pour obtenir la page suivante.
+        """
+        def active(product: Dict) -> bool:
+            return product.get('active', 'true') == 'true'
+
+        if category:
+            # Comme get_products_by_category: produits actifs uniquement
+            return self._page_index('products', 'category', category.lower(), cursor, limit,
+                                    active)
+        return self._page('products', cursor, limit, active if active_only else None)
+
     def get_product_by_id(self, product_id: str) -> Optional[Dict]:
         """Récupère un produit par son ID."""
-        products = self._read_csv(self.products_file)
-        for product in products:
-            if product['id'] == product_id:
-                return product
-        return None
+        product = self.storage.get('products', product_id)
+        return product.copy() if product else None
+
+    def get_product_version(self, product_id: str) -> Optional[str]:
+        """Version d'un produit (incrémentée à chaque modification), None s'il n'existe pas."""
+        product = self.storage.get('products', product_id)
+        return (product.get('version') or '0') if product else None
 
 
+    def get_products_by_ids(self, product_ids: List[str]) -> Dict[str, Dict]:
+        """Récupère plusieurs produits en une seule lecture: {id: produit}."""
+        products = self.storage.get_many('products', product_ids)
+        return {product_id: p.copy() for product_id, p in products.items()}
+
     def get_products_by_seller(self, seller_id: str) -> List[Dict]:
         """Récupère tous les produits d'un vendeur."""
-        products = self._read_csv(self.products_file)
-        return [p for p in products if p['seller_id'] == seller_id]
+        products = self.storage.lookup('products', 'seller_id', seller_id)
+        return [p.copy() for p in products]
 
 
     def get_products_by_category(self, category: str) -> List[Dict]:
         """Récupère les produits d'une catégorie."""
-        products = self._read_csv(self.products_file)
-        return [p for p in products if p['category'].lower() == category.lower() and p.get('active', 'true') == 'true']
+        products = self.storage.lookup('products', 'category', category.lower())
+        return [p.copy() for p in products if p.get('active', 'true') == 'true']
 
 
     def get_categories(self) -> List[str]:
         """Récupère toutes les catégories uniques."""
-        products = self._read_csv(self.products_file)
+        products = self.storage.all_rows('products')
         categories = set(p['category'] for p in products if p.get('active', 'true') == 'true')
         return sorted(list(categories))
 
 
     def search_products(self, query: str) -> List[Dict]:
-        """Recherche des produits par nom ou description."""
-        products = self.get_all_products(active_only=True)
-        query_lower = query.lower()
-        return [p for p in products if query_lower in p['name'].lower() or query_lower in p['description'].lower()]
+        """
+        Recherche des produits par nom ou description via l'index plein texte.
+        Résultats triés par pertinence (nom avant description).
+        """
+        results = []
+        for product_id in self._search_index().search(query):
+            product = self.storage.get('products', product_id)
+            if product and product.get('active', 'true') == 'true':
+                results.append(product.copy())
+        return results
+
+    def search_products_page(self, query: str, cursor: str = None, limit: int = None) -> Dict:
+        """
+        Page de résultats de recherche. Les résultats étant triés par
+        pertinence et non par ID, le curseur est ici la position dans le classement.
+        """
+        position = self._parse_cursor(cursor) or 0
+        limit = self._page_size(limit)
+        ranked = self._search_index().search(query)
+
+        # Seuls les produits de la page sont lus
+        items = []
+        while position < len(ranked) and len(items) < limit:
+            product = self.storage.get('products', ranked[position])
+            position += 1
+            if product and product.get('active', 'true') == 'true':
+                items.append(product.copy())
+
+        return {
+            'items': items,
+            'next_cursor': str(position) if position < len(ranked) else None
+        }
+
+    def _search_index(self) -> SearchIndex:
+        """Retourne l'index de recherche, reconstruit si la table a changé ailleurs."""
+        version = self.storage.version('products')
+        if self.search_index.version != version:
+            self.search_index.build(self.storage.all_rows('products'), version)
+        return self.search_index
+
+    def _index_product(self, product: Dict, version_before: int):
+        """Met à jour l'index de recherche après l'écriture d'un produit."""
+        self._index_products([product], version_before)
+
+    def _index_products(self, products: List[Dict], version_before: int):
+        """
+        Met à jour l'index de recherche après une écriture de produits.
+        Si l'index n'était pas à jour avant l'écriture, il sera reconstruit
+        à la prochaine recherche.
+        """
+        version = self.storage.version('products')
+        if self.search_index.version == version_before and version == version_before + 1:
+            for product in products:
+                self.search_index.put(product)
+            self.search_index.version = version
+        else:
+            # Écriture concurrente: reconstruction à la prochaine recherche
+            self.search_index.version = None
 
 
     def update_product(self, product_id: str, **kwargs) -> bool:
         """Met à jour un produit."""
-        products = self._read_csv(self.products_file)
-        headers = ['id', 'name', 'description', 'price', 'stock',
-                  'category', 'image_url', 'seller_id', 'created_at', 'active']
-
-        for product in products:
-            if product['id'] == product_id:
-                for key, value in kwargs.items():
-                    if key in product and key != 'id':
-                        product[key] = str(value)
-                self._write_csv(self.products_file, headers, products)
-                print(f"[DB] Produit mis à jour: {product_id}")
-                return True
-        return False
+        with self.storage.transaction('products'):
+            product = self.storage.get('products', product_id)
+            if not product:
+                return False
+
+            changes = {key: str(value) for key, value in kwargs.items()
+                       if key in product and key not in ('id', 'version')}
+            # Nouvelle version: les commandes en cours sur l'ancienne seront rejouées
+            changes['version'] = str(int(product.get('version') or 0) + 1)
+            version_before = self.storage.version('products')
+            updated = self.storage.update('products', product_id, changes)
+            if updated:
+                self._index_product(updated, version_before)
+        print(f"[DB] Produit mis à jour: {product_id}")
+        return True
 
     def delete_product(self, product_id: str) -> bool:
         """Désactive un produit (soft delete)."""
@@ -524,41 +774,69 @@ class DatabaseManager:
     # =========================================================================
 
     def add_to_cart(self, user_id: str, product_id: str, quantity: int = 1) -> bool:
-        """Ajoute un produit au panier."""
-        product = self.get_product_by_id(product_id)
-        if not product or int(product['stock']) < quantity:
-            return False
-
-        cart_items = self._read_csv(self.cart_file)
-        headers = ['id', 'user_id', 'product_id', 'quantity', 'added_at']
-
-        # Vérifie si le produit est déjà dans le panier
-        for item in cart_items:
-            if item['user_id'] == user_id and item['product_id'] == product_id:
-                item['quantity'] = str(int(item['quantity']) + quantity)
-                self._write_csv(self.cart_file, headers, cart_items)
+        """
+        Ajoute un produit au panier.
+        La ligne réserve sa quantité pendant RESERVATION_MINUTES: les autres
+        clients ne peuvent plus l'ajouter à leur panier ni la commander.
+        """
+        with self.storage.transaction('cart'):
+            # Stock relu sous le verrou du panier: une commande (qui écrit
+            # aussi le panier) ne peut pas le modifier avant la réservation
+            product = self.get_product_by_id(product_id)
+            if not product:
+                return False
+
+            items = self._find_cart_items(user_id, product_id)
+            total = quantity + sum(int(item['quantity']) for item in items)
+            if self._available_stock(product, user_id) < total:
+                return False
+
+            # Vérifie si le produit est déjà dans le panier
+            for item in items:
+                self.storage.update('cart', item['id'], {'quantity': str(total),
+                                                         'reserved_until': self._reservation_end()})
                 return True
 
-        # Ajoute un nouvel item
-        cart_item = {
-            'id': str(self._get_next_id(self.cart_file)),
-            'user_id': user_id,
-            'product_id': product_id,
-            'quantity': str(quantity),
-            'added_at': datetime.now().isoformat()
-        }
+            # Ajoute un nouvel item
+            cart_item = {
+                'id': str(self.storage.next_id('cart')),
+                'user_id': user_id,
+                'product_id': product_id,
+                'quantity': str(quantity),
+                'added_at': datetime.now().isoformat(),
+                'reserved_until': self._reservation_end()
+            }
 
-        self._append_csv(self.cart_file, cart_item)
-        return True
+            self.storage.insert('cart', cart_item)
+            return True
+
+    @staticmethod
+    def _reservation_end() -> str:
+        """Fin de la réservation d'une ligne de panier ajoutée ou modifiée maintenant."""
+        return (datetime.now() + timedelta(minutes=RESERVATION_MINUTES)).isoformat()
+
+    def _available_stock(self, product: Dict, user_id: str) -> int:
+        """Stock d'un produit moins les réservations encore valides des autres clients."""
+        now = datetime.now().isoformat()
+        reserved = sum(int(item['quantity'])
+                       for item in self.storage.lookup('cart', 'product_id', product['id'])
+                       if item['user_id'] != user_id and item.get('reserved_until', '') > now)
+        return int(product['stock']) - reserved
+
+    def _find_cart_items(self, user_id: str, product_id: str) -> List[Dict]:
+        """Retourne les lignes du panier d'un utilisateur pour un produit."""
+        return [item for item in self.storage.lookup('cart', 'user_id', user_id)
+                if item['product_id'] == product_id]
 
     def get_cart(self, user_id: str) -> List[Dict]:
         """Récupère le panier d'un utilisateur avec les détails des produits."""
-        cart_items = self._read_csv(self.cart_file)
-        user_cart = [item for item in cart_items if item['user_id'] == user_id]
+        user_cart = self.storage.lookup('cart', 'user_id', user_id)
+        # Une seule lecture des produits pour toutes les lignes du panier
+        products = self.get_products_by_ids([item['product_id'] for item in user_cart])
 
         result = []
         for item in user_cart:
-            product = self.get_product_by_id(item['product_id'])
+            product = products.get(item['product_id'])
             if product:
                 result.append({
                     'cart_id': item['id'],
@@ -573,103 +851,240 @@ class DatabaseManager:
         if quantity <= 0:
             return self.remove_from_cart(user_id, product_id)
 
-        cart_items = self._read_csv(self.cart_file)
-        headers = ['id', 'user_id', 'product_id', 'quantity', 'added_at']
-
-        for item in cart_items:
-            if item['user_id'] == user_id and item['product_id'] == product_id:
-                item['quantity'] = str(quantity)
-                self._write_csv(self.cart_file, headers, cart_items)
+        with self.storage.transaction('cart'):
+            product = self.get_product_by_id(product_id)
+            if not product:
+                return False
+            if self._available_stock(product, user_id) < quantity:
+                return False
+            for item in self._find_cart_items(user_id, product_id):
+                self.storage.update('cart', item['id'], {'quantity': str(quantity),
+                                                         'reserved_until': self._reservation_end()})
                 return True
         return False
 
     def remove_from_cart(self, user_id: str, product_id: str) -> bool:
         """Supprime un produit du panier."""
-        cart_items = self._read_csv(self.cart_file)
-        headers = ['id', 'user_id', 'product_id', 'quantity', 'added_at']
 
-        new_cart = [item for item in cart_items
-                   if not (item['user_id'] == user_id and item['product_id'] == product_id)]
-
-        if len(new_cart) < len(cart_items):
-            self._write_csv(self.cart_file, headers, new_cart)
-            return True
-        return False
+        items = self._find_cart_items(user_id, product_id)
+        return self.storage.delete('cart', [row['id'] for row in items]) > 0
 
     def clear_cart(self, user_id: str):
         """Vide le panier d'un utilisateur."""
-        cart_items = self._read_csv(self.cart_file)
-        headers = ['id', 'user_id', 'product_id', 'quantity', 'added_at']
-        new_cart = [item for item in cart_items if item['user_id'] != user_id]
-        self._write_csv(self.cart_file, headers, new_cart)
+        items = self.storage.lookup('cart', 'user_id', user_id)
+        self.storage.delete('cart', [row['id'] for row in items])
 
     # =========================================================================
     # GESTION DES COMMANDES
     # =========================================================================
 
     def create_order(self, user_id: str, shipping_address: str) -> Optional[Dict]:
-        """Crée une commande à partir du panier."""
+        """
+        Crée une commande à partir du panier.
+        Décrément des stocks, création de la commande et vidage du panier
+        sont écrits ensemble, en une seule transaction (storage.write_batch).
 
-        cart = self.get_cart(user_id)
-        if not cart:
-            return None
+        Contrôle optimiste: panier et produits sont lus sans verrou, puis
+        l'écriture n'est acceptée que si la version de chaque produit et les
+        lignes du panier n'ont pas changé (compare-and-swap). Sinon la
+        commande est recalculée, jusqu'à CHECKOUT_ATTEMPTS fois.
 
-        total = sum(float(item['product']['price']) * item['quantity'] for item in cart)
+        Les réservations des autres clients sont relues sous le verrou du
+        panier, tenu jusqu'à la fin de l'écriture: add_to_cart réserve sous
+        ce même verrou, sans changer la version des produits.
 
-        # Prépare les données des produits pour la commande
-        products_data = []
-        for item in cart:
-            products_data.append({
-                'id': item['product_id'],
-                'name': item['product']['name'],
-                'price': item['product']['price'],
-                'quantity': item['quantity']
-            })
-            # Décrémente le stock
-            new_stock = int(item['product']['stock']) - item['quantity']
-            self.update_product(item['product_id'], stock=max(0, new_stock))
-
-        order = {
-            'id': str(self._get_next_id(self.orders_file)),
-            'user_id': user_id,
-            'products': json.dumps(products_data),
-            'total': f"{total:.2f}",
-            'status': 'pending',
-            'shipping_address': shipping_address,
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat()
-        }
+        Les lignes de la commande sont aussi écrites dans order_items (une
+        ligne par article, avec le vendeur) pour les statistiques de ventes.
 
-        self._append_csv(self.orders_file, order)
+        Lève OutOfStockError si un produit n'a plus assez de stock, et
+        ConflictError si les conflits persistent.
+        """
+        order_id = None
+        item_ids: List[str] = []
+        for attempt in range(CHECKOUT_ATTEMPTS):
+            cart = self.get_cart(user_id)
+            if not cart:
+                return None
 
-        # Vide le panier
-        self.clear_cart(user_id)
+            total = sum(float(item['product']['price']) * item['quantity'] for item in cart)
+            # ID attribué une seule fois, conservé d'une tentative à l'autre
+            order_id = order_id or str(self.storage.next_id('orders'))
+
+            # Prépare les données des produits et les nouveaux stocks
+            products_data = []
+            updated_products: Dict[str, Dict] = {}
+            ordered: Dict[str, int] = {}
+            expect: Dict[str, Dict[str, Dict]] = {'products': {}, 'cart': {}}
+            for item in cart:
+                products_data.append({
+                    'id': item['product_id'],
+                    'name': item['product']['name'],
+                    'price': item['product']['price'],
+                    'quantity': item['quantity']
+                })
+                expect['cart'][item['cart_id']] = {'user_id': user_id,
+                                                   'quantity': item['quantity']}
+
+                product = updated_products.get(item['product_id'])
+                if product is None:
+                    product = updated_products[item['product_id']] = dict(item['product'])
+                    version = product.get('version', '')
+                    expect['products'][product['id']] = {'version': version}
+                    product['version'] = str(int(version or 0) + 1)
+                    ordered[product['id']] = 0
+                ordered[product['id']] += item['quantity']
+
+            # IDs des lignes attribués une fois, complétés si le panier a grandi
+            while len(item_ids) < len(cart):
+                item_ids.append(str(self.storage.next_id('order_items')))
+            order_items = [{
+                'id': item_id,
+                'order_id': order_id,
+                'product_id': item['product_id'],
+                'price': item['product']['price'],
+                'quantity': str(item['quantity']),
+                'seller_id': item['product'].get('seller_id', '')
+            } for item_id, item in zip(item_ids, cart)]
+
+            order = {
+                'id': order_id,
+                'user_id': user_id,
+                'products': json.dumps(products_data),
+                'total': f"{total:.2f}",
+                'status': 'pending',
+                'shipping_address': shipping_address,
+                'created_at': datetime.now().isoformat(),
+                'updated_at': datetime.now().isoformat()
+            }
 
-        print(f"[DB] Commande créée: #{order['id']}")
-        return order
+            # Stocks, commande et panier vidé: une seule écriture atomique,
+            # refusée si un produit ou le panier a changé depuis la lecture
+            version_before = self.storage.version('products')
+            try:
+                with self.storage.transaction('cart'):
+                    # Les réservations valides des autres clients restent intouchables
+                    for product in updated_products.values():
+                        available = self._available_stock(product, user_id)
+                        if available < ordered[product['id']]:
+                            raise OutOfStockError(product, max(0, available))
+                        # Décrémente le stock (jamais en dessous de zéro)
+                        product['stock'] = str(int(product['stock']) - ordered[product['id']])
+
+                    self.storage.write_batch(
+                        puts={'products': list(updated_products.values()), 'orders': [order],
+                              'order_items': order_items},
+                        deletes={'cart': [item['cart_id'] for item in cart]},
+                        expect=expect
+                    )
+            except ConflictError:
+                if attempt == CHECKOUT_ATTEMPTS - 1:
+                    raise
+                # Attente aléatoire croissante pour désynchroniser les concurrents
+                time.sleep(random.uniform(0, 0.005 * (attempt + 1)))
+                continue
+
+            self._index_products(list(updated_products.values()), version_before)
+            print(f"[DB] Commande créée: #{order['id']}")
+            return order
+
+    def get_order_by_id(self, order_id: str) -> Optional[Dict]:
+        """
+        Récupère une commande par son ID.
+        Avec le moteur CSV, seule la ligne demandée est lue (index des positions).
+        """
+        order = self.storage.get('orders', order_id)
+        return order.copy() if order else None
 
     def get_orders_by_user(self, user_id: str) -> List[Dict]:
         """Récupère les commandes d'un utilisateur."""
-        orders = self._read_csv(self.orders_file)
-        return [o for o in orders if o['user_id'] == user_id]
+        orders = self.storage.lookup('orders', 'user_id', user_id)
+        return [o.copy() for o in orders]
 
     def get_all_orders(self) -> List[Dict]:
         """Récupère toutes les commandes."""
-        return self._read_csv(self.orders_file)
+        return self._read_table('orders')
+
+    def iter_orders(self, with_users: bool = False) -> Iterator[Dict]:
+        """
+        Itère sur toutes les commandes par lots.
+        with_users: ajoute user_name/user_email (une lecture des clients par lot).
+        """
+        for batch in self._iter_batches('orders'):
+            if with_users:
+                self.enrich_orders_with_users(batch)
+            yield from batch
+
+    def get_orders_page(self, cursor: str = None, limit: int = None,
+                        user_id: str = None) -> Dict:
+        """Page de commandes (toutes, ou celles d'un utilisateur) par ID croissant."""
+        if user_id is not None:
+            return self._page_index('orders', 'user_id', user_id, cursor, limit)
+        return self._page('orders', cursor, limit)
+
+    def enrich_orders_with_users(self, orders: List[Dict]) -> List[Dict]:
+        """
+        Ajoute user_name et user_email à chaque commande.
+        Les clients sont lus en une seule fois puis joints par user_id.
+        """
+        users = self.storage.get_many('users', {order['user_id'] for order in orders})
+        for order in orders:
+            order_user = users.get(order['user_id'])
+            if order_user:
+                order['user_name'] = f"{order_user['firstname']} {order_user['lastname']}"
+                order['user_email'] = order_user['email']
+        return orders
+
+    def get_order_items(self, order_id: str) -> List[Dict]:
+        """Récupère les lignes d'une commande."""
+        items = self.storage.lookup('order_items', 'order_id', order_id)
+        return sorted((item.copy() for item in items), key=lambda item: int(item['id']))
+
+    def get_product_sales(self, seller_id: str = None, product_id: str = None) -> List[Dict]:
+        """
+        Ventes par produit, lues dans order_items (sans décoder les commandes):
+        [{'product_id', 'quantity', 'revenue', 'orders'}], par chiffre d'affaires décroissant.
+        Filtrées par vendeur et/ou par produit; les commandes annulées sont exclues.
+        """
+        if product_id is not None:
+            items = self.storage.lookup('order_items', 'product_id', product_id)
+            if seller_id is not None:
+                items = [item for item in items if item['seller_id'] == seller_id]
+        elif seller_id is not None:
+            items = self.storage.lookup('order_items', 'seller_id', seller_id)
+        else:
+            items = self.storage.all_rows('order_items')
+
+        # Statut des seules commandes concernées, en une lecture
+        orders = self.storage.get_many('orders', list({item['order_id'] for item in items}))
+
+        sales: Dict[str, Dict] = {}
+        for item in items:
+            order = orders.get(item['order_id'])
+            if order is None or order['status'] == 'cancelled':
+                continue
+            entry = sales.setdefault(item['product_id'], {
+                'product_id': item['product_id'], 'quantity': 0, 'revenue': 0.0, 'orders': set()
+            })
+            quantity = int(item['quantity'])
+            entry['quantity'] += quantity
+            entry['revenue'] += float(item['price']) * quantity
+            entry['orders'].add(item['order_id'])
+
+        result = []
+        for entry in sales.values():
+            entry['orders'] = len(entry['orders'])
+            entry['revenue'] = round(entry['revenue'], 2)
+            result.append(entry)
+        return sorted(result, key=lambda entry: -entry['revenue'])
 
     def update_order_status(self, order_id: str, status: str) -> bool:
         """Met à jour le statut d'une commande."""
-        orders = self._read_csv(self.orders_file)
-        headers = ['id', 'user_id', 'products', 'total', 'status',
-                  'shipping_address', 'created_at', 'updated_at']
 
-        for order in orders:
-            if order['id'] == order_id:
-                order['status'] = status
-                order['updated_at'] = datetime.now().isoformat()
-                self._write_csv(self.orders_file, headers, orders)
-                return True
-        return False
+        updated = self.storage.update('orders', order_id, {
+            'status': status,
+            'updated_at': datetime.now().isoformat()
+        })
+        return updated is not None
 
     # =========================================================================
     # STATISTIQUES
@@ -677,9 +1092,9 @@ class DatabaseManager:
 
     def get_statistics(self) -> Dict:
         """Récupère les statistiques globales."""
-        users = self._read_csv(self.users_file)
-        products = self._read_csv(self.products_file)
-        orders = self._read_csv(self.orders_file)
+        users = self.storage.all_rows('users')
+        products = self.storage.all_rows('products')
+        orders = self.storage.all_rows('orders')
 
         return {
             'users': {
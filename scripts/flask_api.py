@@ -23,6 +23,7 @@ Endpoints disponibles:
 - /api/orders/<id>/status  PUT    - Modifier statut (vendeur/admin)
 - /api/statistics          GET    - Statistiques (admin)
 - /api/statistics/charts   GET    - Graphiques (admin)
+- /api/statistics/sales    GET    - Ventes par produit (vendeur/admin)
 
 Auteur: MarketFlow Team
 Date: 2025
@@ -31,24 +32,48 @@ Date: 2025
 
 import os
 import sys
+import json
+import time
+import hashlib
 from functools import wraps
 
 # Ajout du répertoire courant au path pour les imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, request, jsonify, make_response
-from database import DatabaseManager
+from flask import Flask, request, jsonify, make_response, Response, g
+from database import DatabaseManager, OutOfStockError
+from storage import ConflictError
+from session_store import create_session_store
+from auth_token import TokenSigner, RevocationList, is_signed_token, token_key, DEV_SECRET_KEY
+from response_cache import ResponseCache, CachedResponse
+import compression
 
 # Initialisation de Flask
 app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'marketflow-secret-key-dev-2025')
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', DEV_SECRET_KEY)
 
-# Initialisation de la base de données
-db = DatabaseManager()
+# Initialisation de la base de données (MARKETFLOW_DATA_DIR: autre répertoire des données)
+db = DatabaseManager(data_dir=os.environ.get('MARKETFLOW_DATA_DIR'))
 db.initialize_database()
 
-# Stockage des sessions utilisateurs (en production, utiliser Redis ou JWT)
-sessions = {}
+# Stockage des sessions utilisateurs: mémoire du processus, ou base SQLite
+# partagée entre workers (MARKETFLOW_SESSION_STORE, voir session_store)
+sessions = create_session_store(db.data_dir)
+
+# Tokens signés sans état (MARKETFLOW_AUTH_TOKENS=stateless, voir auth_token):
+# vérifiés par n'importe quel worker sans accès au stockage des sessions.
+# Hors de ce mode, aucun token signé n'est accepté.
+STATELESS_TOKENS = os.environ.get('MARKETFLOW_AUTH_TOKENS', 'session') == 'stateless'
+token_signer = None
+if STATELESS_TOKENS:
+    # Refus de démarrer sans clé secrète (ValueError)
+    token_signer = TokenSigner(
+        token_key(os.environ.get('SECRET_KEY'), os.environ.get('MARKETFLOW_TOKEN_SECRET')),
+        revocations=RevocationList(os.environ.get(
+            'MARKETFLOW_REVOCATION_PATH', os.path.join(db.data_dir, 'revoked_tokens.txt'))))
+
+# Corps sérialisés des routes GET les plus demandées (voir response_cache)
+response_cache = ResponseCache()
 
 
 # =========================================================================
@@ -56,15 +81,27 @@ sessions = {}
 # =========================================================================
 
 def get_current_user():
-    """Récupère l'utilisateur connecté via le token d'authentification."""
+    """
+    Récupère l'utilisateur connecté (ID et rôle) via le token d'authentification.
+    La session n'est lue qu'une fois par requête (mémorisée dans flask.g).
+    """
+    if 'current_user' in g:
+        return g.current_user
+
+    user = None
     auth_header = request.headers.get('Authorization', '')
     
     if auth_header.startswith('Bearer '):
         token = auth_header[7:]
-        if token in sessions:
-            return sessions[token]
+        if is_signed_token(token):
+            claims = token_signer.verify(token) if token_signer else None
+            if claims:
+                user = {'id': claims['sub'], 'role': claims['role']}
+        else:
+            user = sessions.get(token)
     
-    return None
+    g.current_user = user
+    return user
 
 
 def login_required(f):
@@ -105,12 +142,203 @@ def role_required(*roles):
     return decorator
 
 
+def versioned(*tables, product_arg: str = None, cache: bool = False):
+    """
+    Réponses conditionnelles (ETag / Last-Modified) d'une route GET dont le
+    contenu ne dépend que des tables indiquées, ou d'un seul produit de la
+    table products (product_arg: nom du paramètre de route portant son ID).
+
+    Un client qui renvoie le validateur reçu (If-None-Match, ou à défaut
+    If-Modified-Since) obtient 304 Not Modified sans que la réponse soit
+    reconstruite.
+
+    cache=True: le corps sérialisé est conservé dans response_cache, par
+    route, paramètres et rôle, tant que la version des tables ne change pas.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            # Validateurs lus avant la réponse: une écriture concurrente ne
+            # peut que les rendre plus anciens que le contenu envoyé
+            if product_arg:
+                version = db.get_product_version(kwargs[product_arg])
+                if version is None:
+                    return f(*args, **kwargs)
+                data_version = f"product:{kwargs[product_arg]}:{version}"
+            else:
+                data_version = db.data_version(*tables)
+            modified = db.data_modified(*tables)
+
+            # Le contenu peut dépendre du rôle (ex: produits inactifs des admins)
+            user = get_current_user()
+            role = user.get('role') if user else 'anonymous'
+            etag = hashlib.blake2b(f"{request.path}|{data_version}|{role}".encode('utf-8'),
+                                   digest_size=12).hexdigest()
+
+            if request.if_none_match:
+                unchanged = request.if_none_match.contains_weak(etag)
+            else:
+                since = request.if_modified_since
+                unchanged = bool(modified and since and int(modified) <= since.timestamp())
+
+            if unchanged:
+                response = Response(status=304)
+            elif cache and response_cache.enabled:
+                response = cached_response(role, data_version, lambda: f(*args, **kwargs))
+            else:
+                response = make_response(f(*args, **kwargs))
+
+            if response.status_code in (200, 304):
+                response.set_etag(etag, weak=True)
+                # Date à la seconde près: omise tant que la seconde en cours
+                # peut encore voir une écriture
+                if modified and time.time() - modified >= 1:
+                    response.last_modified = int(modified)
+                response.headers['Cache-Control'] = 'no-cache'
+                response.vary.add('Authorization')
+            return response
+        return decorated
+    return decorator
+
+
+def cached_response(role: str, data_version: str, build):
+    """
+    Réponse servie depuis response_cache si son entrée correspond à la
+    version courante des données; sinon construite par build() et mise en
+    cache (réponses 200 complètes uniquement, pas les flux).
+    Le corps envoyé est la variante compressée de l'entrée si le client
+    l'accepte.
+    """
+    key = (request.path, tuple(sorted(request.args.items(multi=True))), role)
+    entry = response_cache.get(key, data_version)
+    if entry is None:
+        response = make_response(build())
+        if response.status_code != 200 or response.is_streamed:
+            return response
+        entry = CachedResponse(data_version, response.get_data(), response.mimetype)
+        response_cache.put(key, entry)
+
+    encoding = negotiated_encoding()
+    if encoding is None or len(entry.body) < compression.MIN_SIZE:
+        return Response(entry.body, mimetype=entry.mimetype)
+
+    response = Response(response_cache.variant(key, entry, encoding, compress_static),
+                        mimetype=entry.mimetype)
+    response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+def negotiated_encoding():
+    """Encodage de compression accepté par le client (Accept-Encoding), ou None."""
+    return compression.choose_encoding(lambda encoding: request.accept_encodings[encoding])
+
+
+def compress_static(data: bytes, encoding: str) -> bytes:
+    """Compression au niveau maximal, pour les variantes conservées en cache."""
+    return compression.compress(data, encoding, static=True)
+
+
+@app.after_request
+def compress_response(response):
+    """
+    Compression négociée des réponses non encore compressées: corps complets
+    au-delà de compression.MIN_SIZE, flux (streaming) paquet par paquet.
+    """
+    if (response.status_code != 200 or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in compression.COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiated_encoding()
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        response.response = compression.compress_stream(response.iter_encoded(), encoding)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < compression.MIN_SIZE:
+            return response
+        response.set_data(compression.compress(data, encoding))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def is_paginated() -> bool:
+    """Indique si la requête demande une pagination (?limit= ou ?cursor=)."""
+    return 'limit' in request.args or 'cursor' in request.args
+
+
+def paginated_response(key, fetch_page):
+    """
+    Réponse paginée par curseur.
+    fetch_page(cursor, limit) retourne {'items', 'next_cursor'}; le client
+    repasse next_cursor en paramètre ?cursor= pour obtenir la page suivante.
+
+    Les pages suivent l'ordre des IDs, pas celui des créations: un élément
+    créé pendant le parcours peut recevoir un ID déjà dépassé par le
+    curseur (plusieurs workers) et n'être vu qu'au parcours suivant.
+    """
+    try:
+        page = fetch_page(request.args.get('cursor'), request.args.get('limit'))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    return jsonify({
+        'success': True,
+        key: page['items'],
+        'total': len(page['items']),
+        'next_cursor': page['next_cursor']
+    })
+
+
+def wants_stream() -> bool:
+    """Indique si la requête demande une réponse en streaming (?stream=true)."""
+    return request.args.get('stream', 'false').lower() in ('true', '1')
+
+
+def stream_json_list(key, rows):
+    """
+    Réponse JSON produite au fil de l'eau à partir d'un itérateur de lignes:
+    {"success": true, "<key>": [...], "total": n}.
+    Ni la liste ni le corps complet ne sont construits en mémoire.
+    """
+    def generate():
+        yield f'{{"success": true, "{key}": ['
+        total = 0
+        chunk = []
+        for row in rows:
+            chunk.append(('' if total == 0 else ',') + json.dumps(row))
+            total += 1
+            # Envoi par paquets pour limiter le nombre d'écritures réseau
+            if len(chunk) >= 100:
+                yield ''.join(chunk)
+                chunk = []
+        if chunk:
+            yield ''.join(chunk)
+        yield f'], "total": {total}}}'
+
+    return Response(generate(), mimetype='application/json')
+
+
 def generate_token():
     """Génère un token d'authentification unique."""
     import secrets
     return secrets.token_hex(32)
 
 
+def issue_token(user: dict) -> str:
+    """Émet le token d'un utilisateur connecté: signé, ou opaque avec session."""
+    if STATELESS_TOKENS:
+        return token_signer.issue(user)
+    token = generate_token()
+    sessions.set(token, user)
+    return token
+
+
 # =========================================================================
 # ROUTES - AUTHENTIFICATION
 # =========================================================================
@@ -148,8 +376,7 @@ def login():
     
     if user:
         # Génération du token
-        token = generate_token()
-        sessions[token] = user
+        token = issue_token(user)
         
         return jsonify({
             'success': True,
@@ -224,8 +451,7 @@ def register():
     user = db.create_user(email, password, firstname, lastname, 'client')
     
     if user:
-        token = generate_token()
-        sessions[token] = user
+        token = issue_token(user)
         
         return jsonify({
             'success': True,
@@ -247,7 +473,11 @@ def logout():
     auth_header = request.headers.get('Authorization', '')
     if auth_header.startswith('Bearer '):
         token = auth_header[7:]
-        sessions.pop(token, None)
+        if is_signed_token(token):
+            if token_signer:
+                token_signer.revoke(token)
+        else:
+            sessions.delete(token)
     
     return jsonify({'success': True, 'message': 'Déconnexion réussie'})
 
@@ -256,7 +486,9 @@ def logout():
 @login_required
 def get_me():
     """Récupère les informations de l'utilisateur connecté."""
-    user = get_current_user()
+    user = db.get_user_by_id(get_current_user()['id'])
+    if not user:
+        return jsonify({'success': False, 'error': 'Utilisateur non trouvé'}), 404
     return jsonify({'success': True, 'user': user})
 
 
@@ -290,7 +522,18 @@ def check_password():
 @app.route('/api/users', methods=['GET'])
 @role_required('admin')
 def get_users():
-    """Liste tous les utilisateurs (admin uniquement)."""
+    """
+    Liste tous les utilisateurs (admin uniquement).
+    
+    Query params:
+        - limit, cursor: pagination par curseur (optionnelle)
+        - stream: bool - Réponse en streaming (export complet)
+    """
+    if is_paginated():
+        return paginated_response('users', db.get_users_page)
+    if wants_stream():
+        return stream_json_list('users', db.iter_users())
+    
     users = db.get_all_users()
     return jsonify({
         'success': True,
@@ -357,6 +600,7 @@ def delete_user(user_id):
 # =========================================================================
 
 @app.route('/api/products', methods=['GET'])
+@versioned('products', cache=True)
 def get_products():
     """
     Liste les produits avec filtres optionnels.
@@ -365,6 +609,8 @@ def get_products():
         - category: string - Filtrer par catégorie
         - search: string - Recherche dans nom/description
         - active: bool - Inclure les produits inactifs (admin)
+        - limit, cursor: pagination par curseur (optionnelle)
+        - stream: bool - Réponse en streaming (catalogue complet)
     """
     category = request.args.get('category')
     search = request.args.get('search')
@@ -376,6 +622,16 @@ def get_products():
     if include_inactive and user and user.get('role') == 'admin':
         active_only = False
     
+    if is_paginated():
+        if search:
+            return paginated_response('products', lambda cursor, limit:
+                                      db.search_products_page(search, cursor, limit))
+        return paginated_response('products', lambda cursor, limit:
+                                  db.get_products_page(cursor, limit, active_only, category))
+    
+    if wants_stream() and not search and not category:
+        return stream_json_list('products', db.iter_products(active_only=active_only))
+    
     if search:
         products = db.search_products(search)
     elif category:
@@ -391,6 +647,7 @@ def get_products():
 
 
 @app.route('/api/products/<product_id>', methods=['GET'])
+@versioned('products', product_arg='product_id')
 def get_product(product_id):
     """Récupère un produit par son ID."""
     product = db.get_product_by_id(product_id)
@@ -519,6 +776,7 @@ def delete_product(product_id):
 
 
 @app.route('/api/categories', methods=['GET'])
+@versioned('products', cache=True)
 def get_categories():
     """Liste toutes les catégories de produits."""
     categories = db.get_categories()
@@ -599,7 +857,7 @@ def update_cart_item(product_id):
     if success:
         return jsonify({'success': True, 'message': 'Panier mis à jour'})
     else:
-        return jsonify({'success': False, 'error': 'Erreur lors de la mise à jour'}), 400
+        return jsonify({'success': False, 'error': 'Stock insuffisant ou produit absent du panier'}), 400
 
 
 @app.route('/api/cart/<product_id>', methods=['DELETE'])
@@ -628,17 +886,29 @@ def get_orders():
     
     - Clients: leurs propres commandes
     - Vendeurs/Admins: toutes les commandes
+    
+    Query params:
+        - limit, cursor: pagination par curseur (optionnelle)
+        - stream: bool - Réponse en streaming (export complet, vendeurs/admins)
     """
     user = get_current_user()
     
+    if is_paginated():
+        if user.get('role') in ['seller', 'admin']:
+            def fetch_page(cursor, limit):
+                page = db.get_orders_page(cursor, limit)
+                db.enrich_orders_with_users(page['items'])
+                return page
+        else:
+            def fetch_page(cursor, limit):
+                return db.get_orders_page(cursor, limit, user_id=user['id'])
+        return paginated_response('orders', fetch_page)
+    
     if user.get('role') in ['seller', 'admin']:
-        orders = db.get_all_orders()
-        # Enrichir avec les infos utilisateur
-        for order in orders:
-            order_user = db.get_user_by_id(order['user_id'])
-            if order_user:
-                order['user_name'] = f"{order_user['firstname']} {order_user['lastname']}"
-                order['user_email'] = order_user['email']
+        if wants_stream():
+            return stream_json_list('orders', db.iter_orders(with_users=True))
+        # Enrichir avec les infos utilisateur (une seule lecture des utilisateurs)
+        orders = db.enrich_orders_with_users(db.get_all_orders())
     else:
         orders = db.get_orders_by_user(user['id'])
     
@@ -654,9 +924,11 @@ def get_orders():
 def get_order(order_id):
     """Récupère une commande par son ID."""
     user = get_current_user()
-    orders = db.get_all_orders() if user.get('role') in ['seller', 'admin'] else db.get_orders_by_user(user['id'])
+    order = db.get_order_by_id(order_id)
     
-    order = next((o for o in orders if o['id'] == order_id), None)
+    # Un client ne voit que ses propres commandes
+    if order and user.get('role') not in ['seller', 'admin'] and order['user_id'] != user['id']:
+        order = None
     
     if order:
         return jsonify({'success': True, 'order': order})
@@ -679,7 +951,12 @@ def create_order():
     if not data or 'shipping_address' not in data:
         return jsonify({'success': False, 'error': 'Adresse de livraison requise'}), 400
     
-    order = db.create_order(user['id'], data['shipping_address'])
+    try:
+        order = db.create_order(user['id'], data['shipping_address'])
+    except OutOfStockError as e:
+        return jsonify({'success': False, 'error': str(e), 'product_id': e.product_id}), 409
+    except ConflictError:
+        return jsonify({'success': False, 'error': 'Stocks modifiés pendant la commande, veuillez réessayer'}), 409
     
     if order:
         return jsonify({
@@ -728,6 +1005,7 @@ def update_order_status(order_id):
 
 @app.route('/api/statistics', methods=['GET'])
 @role_required('admin')
+@versioned('users', 'products', 'orders', cache=True)
 def get_statistics():
     """Récupère les statistiques globales (admin uniquement)."""
     stats = db.get_statistics()
@@ -738,8 +1016,34 @@ def get_statistics():
     })
 
 
+@app.route('/api/statistics/sales', methods=['GET'])
+@role_required('seller', 'admin')
+def get_sales():
+    """
+    Ventes par produit (quantités, chiffre d'affaires, nombre de commandes).
+    
+    - Vendeurs: leurs propres produits
+    - Admins: tous les produits, ou ceux d'un vendeur
+    
+    Query params:
+        - product_id: string - Un seul produit
+        - seller_id: string - Vendeur (admin uniquement)
+    """
+    user = get_current_user()
+    seller_id = user['id'] if user.get('role') == 'seller' else request.args.get('seller_id')
+    
+    sales = db.get_product_sales(seller_id=seller_id, product_id=request.args.get('product_id'))
+    
+    return jsonify({
+        'success': True,
+        'sales': sales,
+        'total': len(sales)
+    })
+
+
 @app.route('/api/statistics/charts', methods=['GET'])
 @role_required('admin')
+@versioned('users', 'products', 'orders', cache=True)
 def get_charts():
     """
     Génère et retourne les graphiques statistiques en base64 (admin uniquement).
@@ -749,7 +1053,7 @@ def get_charts():
     """
     try:
         from statistics import StatisticsGenerator
-        generator = StatisticsGenerator()
+        generator = StatisticsGenerator(db)
         
         chart_name = request.args.get('chart')
         
@@ -803,7 +1107,7 @@ def get_statistics_summary():
     """Récupère un résumé complet des statistiques (admin uniquement)."""
     try:
         from statistics import StatisticsGenerator
-        generator = StatisticsGenerator()
+        generator = StatisticsGenerator(db)
         
         summary = generator.get_summary_stats()
         
@@ -868,6 +1172,7 @@ def api_root():
             'statistics': {
                 'GET /api/statistics': 'Statistiques globales (admin)',
                 'GET /api/statistics/charts': 'Graphiques (admin)',
+                'GET /api/statistics/sales': 'Ventes par produit (vendeur/admin)',
                 'GET /api/statistics/summary': 'Résumé complet (admin)'
             }
         },
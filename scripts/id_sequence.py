@@ -0,0 +1,104 @@
+"""
+=============================================================================
+SÉQUENCES D'IDENTIFIANTS PERSISTANTES
+=============================================================================
+Remplace le calcul max(id) + 1 (lecture complète de la table à chaque
+insertion) par un compteur persistant par table, stocké dans un petit
+fichier voisin (ex: orders.csv -> orders.seq).
+
+Fonctionnement:
+- Chaque processus réserve un bloc d'IDs (block_size) en incrémentant le
+  compteur persistant sous verrou fichier exclusif (fcntl).
+- Les IDs du bloc sont ensuite distribués en mémoire sous verrou de thread,
+  en O(1) et sans accès disque.
+- Si le fichier n'existe pas, le compteur est initialisé une seule fois à
+  partir du plus grand ID présent dans la table. Ce calcul lit la table
+  hors de tout verrou de la séquence: un écrivain de la table qui demande
+  lui-même un ID ne peut pas l'attendre (interblocage).
+
+Les IDs restent uniques entre threads et processus; les IDs d'un bloc non
+utilisé avant l'arrêt du processus sont perdus (trous dans la numérotation).
+
+Avec plusieurs processus, les IDs ne sont croissants qu'à l'intérieur d'un
+processus: un worker peut encore insérer l'ID 40 après qu'un autre a
+inséré l'ID 70 (la pagination par curseur ne revient pas en arrière).
+MARKETFLOW_ID_BLOCK_SIZE=1 réduit cet écart à l'intervalle entre
+l'attribution d'un ID et l'écriture de sa ligne.
+=============================================================================
+"""
+
+import os
+import threading
+from typing import Callable, Optional
+
+# Verrous fichier inter-processus (indisponibles sous Windows)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+def sequence_path(filepath: str) -> str:
+    """Retourne le chemin du fichier de séquence associé à une table CSV."""
+    return os.path.splitext(filepath)[0] + '.seq'
+
+
+class IdSequence:
+    """Allocateur d'IDs croissants pour une table, avec pré-allocation par blocs."""
+
+    def __init__(self, filepath: str, seed: Callable[[], int], block_size: int = 32):
+        """
+        filepath: chemin de la table CSV.
+        seed: retourne le premier ID libre si la séquence n'existe pas encore.
+        block_size: nombre d'IDs réservés à chaque accès disque.
+        """
+        self.path = sequence_path(filepath)
+        self.seed = seed
+        self.block_size = max(1, block_size)
+        self._lock = threading.Lock()
+        self._next = 0
+        self._limit = 0
+
+    def next_id(self) -> int:
+        """Retourne le prochain ID disponible."""
+        seed = None
+        while True:
+            with self._lock:
+                if self._next < self._limit or self._reserve_block(seed):
+                    value = self._next
+                    self._next += 1
+                    return value
+            # Séquence vide: premier ID libre calculé hors de tout verrou de la
+            # séquence (seed() lit la table sous son verrou, qu'un autre thread
+            # ou processus peut détenir en attendant lui-même la séquence)
+            seed = self.seed()
+
+    def _reserve_block(self, seed: Optional[int]) -> bool:
+        """
+        Réserve un nouveau bloc d'IDs dans le fichier de séquence.
+        Retourne False si la séquence est vide et seed n'est pas encore connu.
+        """
+        with open(self.path, 'a+', encoding='utf-8') as f:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                content = f.read().strip()
+                if not content and seed is None:
+                    return False
+                start = max(int(content) if content else 0, seed or 0)
+                end = start + self.block_size
+
+                f.seek(0)
+                f.truncate()
+                f.write(str(end))
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+        self._next = start
+        self._limit = end
+        return True
@@ -0,0 +1,114 @@
+"""
+=============================================================================
+MIGRATION DES LIGNES DE COMMANDE (orders.products -> order_items)
+=============================================================================
+Les commandes enregistrent leurs articles dans la colonne 'products' sous
+forme de JSON. Depuis l'ajout de la table order_items, chaque commande
+écrit aussi une ligne par article (produit, prix, quantité, vendeur).
+
+Ce script crée les lignes order_items des commandes passées avant cet
+ajout, en décodant une dernière fois leur JSON. Les commandes qui ont déjà
+des lignes sont ignorées: la migration peut être relancée sans doublons.
+
+Le vendeur d'un article est celui du produit au moment de la migration.
+=============================================================================
+"""
+
+import json
+import sys
+
+from database import DatabaseManager
+
+# Commandes migrées par écriture (une transaction par lot)
+BATCH_SIZE = 500
+
+
+def explode_order(order: dict, products: dict, next_id) -> list:
+    """Construit les lignes order_items d'une commande à partir de son JSON."""
+    items = []
+    for entry in json.loads(order['products'] or '[]'):
+        product = products.get(str(entry.get('id')), {})
+        items.append({
+            'id': str(next_id()),
+            'order_id': order['id'],
+            'product_id': str(entry.get('id', '')),
+            'price': str(entry.get('price', '')),
+            'quantity': str(entry.get('quantity', '')),
+            'seller_id': product.get('seller_id', '')
+        })
+    return items
+
+
+def migrate(db: DatabaseManager) -> dict:
+    """
+    Crée les lignes order_items manquantes.
+    Retourne le nombre de commandes migrées, ignorées et illisibles.
+    """
+    storage = db.storage
+    migrated = {item['order_id'] for item in storage.all_rows('order_items')}
+    products = {product['id']: product for product in storage.all_rows('products')}
+
+    report = {'orders': 0, 'items': 0, 'skipped': 0, 'invalid': 0}
+    batch = []
+
+    def flush():
+        if batch:
+            storage.write_batch(puts={'order_items': batch})
+            batch.clear()
+
+    pending = 0
+    for order in db.iter_orders():
+        if order['id'] in migrated:
+            report['skipped'] += 1
+            continue
+        try:
+            items = explode_order(order, products, lambda: storage.next_id('order_items'))
+        except (ValueError, TypeError, AttributeError):
+            print(f"[MIGRATION] Commande #{order['id']}: colonne products illisible, ignorée")
+            report['invalid'] += 1
+            continue
+
+        batch.extend(items)
+        report['orders'] += 1
+        report['items'] += len(items)
+        pending += 1
+        if pending >= BATCH_SIZE:
+            flush()
+            pending = 0
+
+    flush()
+    return report
+
+
+def main():
+    """Point d'entrée principal."""
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Création des lignes order_items des commandes existantes',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples:
+  python migrate_order_items.py                    # Moteur par défaut (MARKETFLOW_STORAGE)
+  python migrate_order_items.py --storage sqlite   # Base SQLite
+        """
+    )
+
+    parser.add_argument('--storage', choices=['csv', 'sqlite'], default=None,
+                       help='Moteur de stockage (défaut: MARKETFLOW_STORAGE ou csv)')
+
+    args = parser.parse_args()
+
+    db = DatabaseManager(storage=args.storage)
+    db.initialize_database()
+
+    report = migrate(db)
+    print(f"[MIGRATION] {report['orders']} commande(s) migrée(s), "
+          f"{report['items']} ligne(s) créée(s), {report['skipped']} déjà migrée(s)")
+    if report['invalid']:
+        print(f"[MIGRATION] {report['invalid']} commande(s) illisible(s) ignorée(s)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
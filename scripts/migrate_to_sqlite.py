@@ -0,0 +1,101 @@
+"""
+=============================================================================
+MIGRATION CSV -> SQLITE
+=============================================================================
+Importe les tables CSV du dossier 'data' (CSV de base + journal d'écriture)
+dans la base SQLite utilisée par le moteur de stockage 'sqlite'.
+
+Sans --force, les lignes dont l'ID (ou l'email) existe déjà dans la base
+sont ignorées: la migration peut être relancée sans créer de doublons.
+Avec --force, les tables SQLite sont recréées à partir des CSV.
+
+Après la migration, lancer l'application avec MARKETFLOW_STORAGE=sqlite.
+=============================================================================
+"""
+
+import os
+import sys
+
+from storage import TABLES
+from sqlite_storage import SqliteStorage
+from write_log import read_rows
+
+
+def migrate(data_dir: str, db_path: str, force: bool = False) -> dict:
+    """
+    Copie chaque table CSV dans la base SQLite.
+    Retourne, par table, le nombre de lignes lues, importées et ignorées.
+    """
+    storage = SqliteStorage(db_path)
+    report = {}
+
+    for table in TABLES:
+        csv_path = os.path.join(data_dir, f'{table}.csv')
+        if not os.path.exists(csv_path):
+            print(f"[MIGRATION] {table}: aucun fichier CSV, table ignorée")
+            continue
+
+        rows = read_rows(csv_path)
+
+        with storage.transaction():
+            if force:
+                storage.drop_table(table)
+            storage.create_table(table)
+            imported = storage.insert_many(table, rows, ignore_conflicts=True)
+            # Les IDs suivants repartent du plus grand ID importé
+            storage.reset_sequence(table)
+
+        report[table] = {
+            'read': len(rows),
+            'imported': imported,
+            'skipped': len(rows) - imported
+        }
+        print(f"[MIGRATION] {table}: {imported}/{len(rows)} lignes importées")
+
+    storage.close()
+    return report
+
+
+def main():
+    """Point d'entrée principal."""
+    import argparse
+
+    data_dir = os.path.join(os.path.dirname(__file__), 'data')
+
+    parser = argparse.ArgumentParser(
+        description='Migration des données CSV MarketFlow vers SQLite',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Exemples:
+  python migrate_to_sqlite.py                   # Importe data/*.csv dans data/marketflow.db
+  python migrate_to_sqlite.py --force           # Recrée les tables SQLite
+  python migrate_to_sqlite.py --db /tmp/mf.db   # Base SQLite personnalisée
+        """
+    )
+
+    parser.add_argument('--data-dir', default=data_dir,
+                       help='Dossier contenant les fichiers CSV')
+    parser.add_argument('--db', default=None,
+                       help='Chemin de la base SQLite (défaut: MARKETFLOW_SQLITE_PATH '
+                            'ou data/marketflow.db)')
+    parser.add_argument('--force', '-f', action='store_true',
+                       help='Supprimer et recréer les tables existantes')
+
+    args = parser.parse_args()
+
+    db_path = args.db or os.environ.get('MARKETFLOW_SQLITE_PATH',
+                                        os.path.join(args.data_dir, 'marketflow.db'))
+
+    print(f"[MIGRATION] {args.data_dir} -> {db_path}")
+    report = migrate(args.data_dir, db_path, force=args.force)
+
+    skipped = sum(table['skipped'] for table in report.values())
+    if skipped:
+        print(f"[MIGRATION] {skipped} ligne(s) ignorée(s) (ID ou email déjà présent)")
+
+    print("[MIGRATION] Terminée. Lancez l'application avec MARKETFLOW_STORAGE=sqlite")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,247 @@
+"""
+=============================================================================
+INDEX DES POSITIONS DES LIGNES D'UNE TABLE CSV
+=============================================================================
+Lecture d'une ligne isolée d'un gros fichier CSV (ex: orders.csv, dont
+chaque ligne contient le détail JSON des produits commandés) sans charger
+ni parser la table entière.
+
+- Le fichier est projeté en mémoire (mmap) et parcouru une fois pour
+  relever la position (en octets) du début de chaque ligne.
+- L'index ID -> position est conservé sur disque dans un fichier voisin
+  (ex: orders.csv -> orders.idx), trié par ID, et rechargé tel quel tant
+  que le CSV n'a pas changé.
+- Si des lignes ont été ajoutées en fin de fichier, seule la fin est
+  parcourue; si le fichier a été remplacé (réécriture, compaction),
+  l'index est reconstruit.
+- Une lecture ne décode que les octets de la ligne demandée.
+
+Les champs entre guillemets peuvent contenir des retours à la ligne: une
+ligne CSV se termine au premier saut de ligne précédé d'un nombre pair de
+guillemets.
+=============================================================================
+"""
+
+import bisect
+import csv
+import io
+import json
+import mmap
+import os
+import threading
+import zlib
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+# Octets de fin de fichier contrôlés avant de n'indexer que les ajouts
+TAIL_CHECK_SIZE = 4096
+
+
+def index_path(filepath: str) -> str:
+    """Retourne le chemin de l'index de positions associé à une table CSV."""
+    return os.path.splitext(filepath)[0] + '.idx'
+
+
+def _record_end(data, start: int, size: int) -> int:
+    """Position qui suit la ligne CSV commençant à start (guillemets équilibrés)."""
+    quotes = 0
+    position = start
+    while position < size:
+        newline = data.find(b'\n', position, size)
+        end = size if newline < 0 else newline + 1
+        quotes += data[position:end].count(b'"')
+        position = end
+        if quotes % 2 == 0:
+            break
+    return position
+
+
+def _parse_record(raw: bytes) -> List[str]:
+    """Décode une ligne CSV brute en liste de valeurs."""
+    return next(csv.reader(io.StringIO(raw.decode('utf-8'), newline='')), [])
+
+
+def _tail_checksum(data, size: int) -> int:
+    """Somme de contrôle des derniers octets des size premiers octets du fichier."""
+    return zlib.crc32(data[max(0, size - TAIL_CHECK_SIZE):size])
+
+
+class OffsetIndex:
+    """
+    Index ID -> position des lignes d'un fichier CSV, lu par mmap.
+
+    Les IDs sont numériques (séquences de storage): l'index est stocké dans
+    deux tableaux parallèles triés (IDs, positions) parcourus par bisect.
+    """
+
+    def __init__(self, filepath: str):
+        """filepath: chemin de la table CSV indexée."""
+        self.filepath = filepath
+        self.path = index_path(filepath)
+        self._lock = threading.Lock()
+        self._ids = array('q')
+        self._offsets = array('q')
+        self._headers: List[str] = []
+        # (inode, taille, mtime_ns) du CSV couvert par l'index
+        self._identity: Optional[Tuple[int, int, int]] = None
+        self._tail = 0
+        self.builds = 0
+        self.extends = 0
+
+    # =========================================================================
+    # LECTURE
+    # =========================================================================
+
+    def get(self, row_id: str) -> Optional[Dict]:
+        """Retourne la ligne ayant cet ID (parsée depuis le fichier), ou None."""
+        try:
+            key = int(row_id)
+        except (TypeError, ValueError):
+            return None
+
+        with self._lock:
+            if not self._refresh():
+                return None
+            position = bisect.bisect_left(self._ids, key)
+            if position == len(self._ids) or self._ids[position] != key:
+                return None
+            offset = self._offsets[position]
+            headers = self._headers
+
+            with open(self.filepath, 'rb') as f:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    raw = data[offset:_record_end(data, offset, len(data))]
+
+        values = _parse_record(raw)
+        return {h: values[i] if i < len(values) else '' for i, h in enumerate(headers)}
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    # =========================================================================
+    # CONSTRUCTION ET MISE À JOUR
+    # =========================================================================
+
+    def _refresh(self) -> bool:
+        """Met l'index en accord avec le fichier; False si le fichier est absent ou vide."""
+        try:
+            stat = os.stat(self.filepath)
+        except FileNotFoundError:
+            self._reset()
+            return False
+        identity = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if identity == self._identity:
+            return True
+        if stat.st_size == 0:
+            self._reset()
+            return False
+
+        if self._identity is None:
+            self._load()
+        if self._identity == identity:
+            return True
+
+        with open(self.filepath, 'rb') as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                if self._is_append(identity, data):
+                    self._scan(data, self._identity[1])
+                    self.extends += 1
+                else:
+                    self._reset()
+                    self._scan(data, 0)
+                    self.builds += 1
+                self._tail = _tail_checksum(data, len(data))
+
+        self._identity = identity
+        self._save()
+        return True
+
+    def _reset(self):
+        self._ids = array('q')
+        self._offsets = array('q')
+        self._headers = []
+        self._identity = None
+        self._tail = 0
+
+    def _is_append(self, identity: Tuple[int, int, int], data) -> bool:
+        """Le fichier est-il l'ancien fichier prolongé par des lignes ajoutées ?"""
+        if self._identity is None or not self._headers:
+            return False
+        ino, size, _ = self._identity
+        # Même inode (les inodes libérés sont réutilisés: l'ancienne fin est
+        # aussi comparée), plus grand, et l'ancienne fin tombait en fin de ligne
+        return (identity[0] == ino and identity[1] > size
+                and data[size - 1:size] == b'\n' and _tail_checksum(data, size) == self._tail)
+
+    def _scan(self, data, start: int):
+        """Relève la position de chaque ligne à partir de start."""
+        size = len(data)
+        position = start
+        if position == 0:
+            end = _record_end(data, 0, size)
+            self._headers = _parse_record(data[0:end])
+            position = end
+
+        found: Dict[int, int] = {}
+        while position < size:
+            end = _record_end(data, position, size)
+            # L'ID est la première colonne, jamais entre guillemets
+            comma = data.find(b',', position, end)
+            try:
+                row_id = int(data[position:comma if comma >= 0 else end])
+            except ValueError:
+                row_id = None
+            if row_id is not None:
+                # En cas de doublon, la première ligne l'emporte (comme read_rows)
+                found.setdefault(row_id, position)
+            position = end
+
+        pairs = sorted(found.items())
+        if pairs and (not self._ids or pairs[0][0] > self._ids[-1]):
+            # Cas courant: des IDs croissants ajoutés en fin de fichier
+            self._ids.extend(row_id for row_id, _ in pairs)
+            self._offsets.extend(offset for _, offset in pairs)
+        elif pairs:
+            merged = dict(zip(self._ids, self._offsets))
+            for row_id, offset in pairs:
+                merged.setdefault(row_id, offset)
+            self._ids = array('q', sorted(merged))
+            self._offsets = array('q', (merged[row_id] for row_id in self._ids))
+
+    # =========================================================================
+    # PERSISTANCE
+    # =========================================================================
+
+    def _load(self):
+        """Recharge l'index enregistré (ignoré s'il est illisible)."""
+        try:
+            with open(self.path, 'rb') as f:
+                meta = json.loads(f.readline())
+                ids = array('q')
+                offsets = array('q')
+                ids.fromfile(f, meta['count'])
+                offsets.fromfile(f, meta['count'])
+        except (OSError, ValueError, KeyError, EOFError):
+            return
+        self._ids = ids
+        self._offsets = offsets
+        self._headers = meta['headers']
+        self._identity = tuple(meta['identity'])
+        self._tail = meta['tail']
+
+    def _save(self):
+        """Enregistre l'index (fichier temporaire puis renommage atomique)."""
+        meta = {'identity': list(self._identity), 'tail': self._tail,
+                'headers': self._headers, 'count': len(self._ids)}
+        tmp_path = f'{self.path}.{os.getpid()}-{threading.get_ident()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(json.dumps(meta).encode('utf-8') + b'\n')
+                self._ids.tofile(f)
+                self._offsets.tofile(f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"[DB] Index {self.path} non enregistré: {e}")
+
+    def stats(self) -> Dict:
+        return {'rows': len(self._ids), 'builds': self.builds, 'extends': self.extends}
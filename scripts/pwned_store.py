@@ -0,0 +1,162 @@
+"""
+=============================================================================
+CACHE ET BASE LOCALE DES MOTS DE PASSE COMPROMIS (HAVEIBEENPWNED)
+=============================================================================
+Accélère DatabaseManager.check_password_compromised(), qui interroge
+l'API range de HaveIBeenPwned (k-Anonymity: seuls les 5 premiers
+caractères du SHA-1 sont envoyés).
+
+- RangeCache: réponses de l'API mises en cache par préfixe, pendant une
+  durée limitée (TTL) et en nombre limité (les plus anciennes sont
+  évincées). Un même préfixe n'est demandé qu'une fois par période.
+- OfflineRangeStore: corpus téléchargé localement, interrogé sans réseau
+  par recherche dichotomique dans des fichiers triés, projetés en mémoire:
+    * un fichier unique trié par hash, lignes "SHA1:COUNT"
+      (pwned-passwords-sha1-ordered-by-hash),
+    * ou un dossier de fichiers de plages "<PREFIXE>.txt", lignes
+      "SUFFIXE:COUNT" (format de l'API range, ex: PwnedPasswordsDownloader).
+
+Configuration (variables d'environnement):
+- MARKETFLOW_PWNED_MODE: 'auto' (base locale si présente, sinon API),
+  'online' (API uniquement) ou 'offline' (base locale uniquement).
+- MARKETFLOW_PWNED_PATH: fichier ou dossier de la base locale
+  (défaut: data/pwned).
+- MARKETFLOW_PWNED_BLOOM: filtre de Bloom de la base locale, consulté en
+  premier (défaut: data/pwned.bloom, voir bloom_filter).
+- MARKETFLOW_PWNED_CACHE_TTL: durée de vie du cache en secondes (86400).
+- MARKETFLOW_PWNED_CACHE_SIZE: nombre maximal de préfixes en cache (4096).
+=============================================================================
+"""
+
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Longueur d'un hash SHA-1 hexadécimal et de son préfixe k-Anonymity
+SHA1_LENGTH = 40
+PREFIX_LENGTH = 5
+
+
+def parse_range(data: str) -> Dict[str, int]:
+    """Décode une réponse range ("SUFFIXE:COUNT" par ligne) en {suffixe: count}."""
+    counts = {}
+    for line in data.splitlines():
+        parts = line.split(':')
+        if len(parts) == 2:
+            try:
+                counts[parts[0].strip().upper()] = int(parts[1])
+            except ValueError:
+                continue
+    return counts
+
+
+class RangeCache:
+    """Cache LRU à durée de vie limitée des réponses range, par préfixe."""
+
+    def __init__(self, ttl: float = None, max_entries: int = None):
+        """Initialise un cache vide (paramètres par défaut: variables d'environnement)."""
+        self.ttl = ttl if ttl is not None else float(
+            os.environ.get('MARKETFLOW_PWNED_CACHE_TTL', '86400'))
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.environ.get('MARKETFLOW_PWNED_CACHE_SIZE', '4096'))
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, prefix: str) -> Optional[Dict[str, int]]:
+        """Retourne la plage en cache d'un préfixe, ou None (absente ou expirée)."""
+        with self._lock:
+            entry = self._entries.get(prefix)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[prefix]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(prefix)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, prefix: str, counts: Dict[str, int]):
+        """Met en cache la plage d'un préfixe."""
+        with self._lock:
+            self._entries[prefix] = (time.monotonic() + self.ttl, counts)
+            self._entries.move_to_end(prefix)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+
+def _search_sorted(data, key: bytes) -> Optional[bytes]:
+    """
+    Recherche dichotomique, dans un contenu trié ligne par ligne, de la
+    ligne qui commence par key (comparaison insensible à la casse).
+    """
+    size = len(data)
+    lo, hi = 0, size
+    while lo < hi:
+        mid = (lo + hi) // 2
+        start = data.rfind(b'\n', 0, mid) + 1
+        end = data.find(b'\n', start)
+        if end < 0:
+            end = size
+        if data[start:start + len(key)].upper() < key:
+            lo = end + 1
+        else:
+            hi = start
+
+    end = data.find(b'\n', lo)
+    line = data[lo:size if end < 0 else end].rstrip(b'\r')
+    if line[:len(key)].upper() == key and line[len(key):len(key) + 1] == b':':
+        return line
+    return None
+
+
+class OfflineRangeStore:
+    """Base locale de hashes compromis, triée, interrogée par dichotomie."""
+
+    def __init__(self, path: str):
+        """path: fichier trié par hash, ou dossier de fichiers de plages."""
+        self.path = path
+
+    @property
+    def available(self) -> bool:
+        return os.path.exists(self.path)
+
+    def _search_file(self, filepath: str, key: str) -> Optional[int]:
+        """Count de la ligne key dans un fichier trié (0 si absente)."""
+        try:
+            with open(filepath, 'rb') as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    return 0
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    line = _search_sorted(data, key.encode('ascii'))
+        except FileNotFoundError:
+            return None
+        if line is None:
+            return 0
+        try:
+            return int(line.split(b':', 1)[1])
+        except ValueError:
+            return 0
+
+    def count(self, sha1_hash: str) -> Optional[int]:
+        """
+        Nombre d'apparitions d'un hash SHA-1 dans les fuites (0 si absent),
+        ou None si la base locale ne couvre pas ce hash.
+        """
+        sha1_hash = sha1_hash.upper()
+        if os.path.isdir(self.path):
+            prefix, suffix = sha1_hash[:PREFIX_LENGTH], sha1_hash[PREFIX_LENGTH:]
+            for name in (f'{prefix}.txt', prefix):
+                found = self._search_file(os.path.join(self.path, name), suffix)
+                if found is not None:
+                    return found
+            return None
+        return self._search_file(self.path, sha1_hash)
@@ -0,0 +1,126 @@
+"""
+=============================================================================
+CACHE DES RÉPONSES DE L'API REST
+=============================================================================
+Corps JSON déjà sérialisés des routes GET les plus demandées (catalogue,
+catégories, statistiques), servis tels quels aux clients suivants.
+
+- Clé: route + paramètres de requête normalisés (triés) + rôle du client.
+- Chaque entrée retient la version des tables dont la réponse dépend
+  (DatabaseManager.data_version): dès qu'une écriture change cette
+  version, l'entrée est ignorée puis remplacée. Aucune invalidation
+  explicite n'est nécessaire, y compris pour les écritures d'autres
+  processus.
+- Taille bornée en octets: les entrées les moins récemment utilisées sont
+  évincées au-delà de max_bytes.
+- Variantes compressées (gzip, br) produites une seule fois par entrée, à
+  la première demande, et comptées dans sa taille.
+
+Configuration: MARKETFLOW_RESPONSE_CACHE_BYTES (défaut: 32 Mo, 0: désactivé).
+=============================================================================
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional
+
+# Coût fixe estimé d'une entrée (clé, objets Python), ajouté à son corps
+ENTRY_OVERHEAD = 256
+
+
+class CachedResponse:
+    """
+    Corps sérialisé d'une réponse, version des données qu'il reflète et
+    variantes compressées (encodage -> corps compressé).
+    """
+
+    __slots__ = ('version', 'body', 'mimetype', 'variants')
+
+    def __init__(self, version: str, body: bytes, mimetype: str):
+        self.version = version
+        self.body = body
+        self.mimetype = mimetype
+        self.variants: Dict[str, bytes] = {}
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(map(len, self.variants.values())) + ENTRY_OVERHEAD
+
+
+class ResponseCache:
+    """Cache LRU des réponses, borné en octets."""
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            os.environ.get('MARKETFLOW_RESPONSE_CACHE_BYTES', str(32 * 1024 * 1024)))
+        self._entries: 'OrderedDict[Hashable, CachedResponse]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable, version: str) -> Optional[CachedResponse]:
+        """Retourne l'entrée d'une clé si elle correspond à la version courante."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: Hashable, entry: CachedResponse):
+        """Enregistre (ou remplace) l'entrée d'une clé, puis évince au-delà de max_bytes."""
+        if entry.size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.size -= previous.size
+            self._entries[key] = entry
+            self.size += entry.size
+            self._evict()
+
+    def variant(self, key: Hashable, entry: CachedResponse, encoding: str,
+                compress: Callable[[bytes, str], bytes]) -> bytes:
+        """
+        Corps compressé d'une entrée, produit par compress(body, encoding) à
+        la première demande puis conservé avec l'entrée.
+        """
+        data = entry.variants.get(encoding)
+        if data is not None:
+            return data
+        # Compression hors verrou: deux requêtes simultanées peuvent la faire
+        # en double, une seule est conservée
+        data = compress(entry.body, encoding)
+        with self._lock:
+            if self._entries.get(key) is entry and encoding not in entry.variants:
+                entry.variants[encoding] = data
+                self.size += len(data)
+                self._evict()
+        return data
+
+    def _evict(self):
+        """Évince les entrées les moins récemment utilisées au-delà de max_bytes."""
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= evicted.size
+            self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'size_bytes': self.size,
+                    'max_bytes': self.max_bytes, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
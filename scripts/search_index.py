@@ -0,0 +1,188 @@
+"""
+=============================================================================
+INDEX DE RECHERCHE PLEIN TEXTE DES PRODUITS
+=============================================================================
+Index inversé en mémoire utilisé par DatabaseManager.search_products().
+
+Normalisation des mots (textes indexés et requêtes):
+- suppression des accents ("Écran" -> "ecran") et passage en minuscules,
+- découpage sur les caractères non alphanumériques,
+- racinisation légère: pluriels en -s / -x retirés ("écrans" -> "ecran").
+
+Recherche:
+- chaque mot de la requête doit être présent (ET logique),
+- un mot de la requête (3 lettres ou plus) correspond aussi aux termes
+  qui commencent par lui ("mac" trouve "macbook"), avec un poids réduit,
+- score = somme des poids des champs où le mot apparaît (nom > description).
+
+L'index est mis à jour ligne par ligne lors des écritures du DatabaseManager
+et reconstruit si la version de la table products a changé par ailleurs.
+=============================================================================
+"""
+
+import bisect
+import re
+import threading
+import unicodedata
+from typing import Dict, List, Optional
+
+# Poids de chaque champ indexé
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'description': 1.0,
+}
+
+# Poids relatif d'une correspondance par préfixe
+PREFIX_FACTOR = 0.5
+
+# Longueur minimale d'un mot pour la recherche par préfixe
+MIN_PREFIX_LENGTH = 3
+
+_WORD_RE = re.compile(r'[a-z0-9]+')
+
+
+def fold(text: str) -> str:
+    """Supprime les accents et passe le texte en minuscules."""
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def stem(word: str) -> str:
+    """Racinisation légère: retire la marque du pluriel des mots assez longs."""
+    if len(word) > 3 and word[-1] in 'sx' and word[-2] != word[-1]:
+        return word[:-1]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Découpe un texte en termes normalisés."""
+    return [stem(word) for word in _WORD_RE.findall(fold(text or ''))]
+
+
+class SearchIndex:
+    """
+    Index inversé terme -> {id produit: poids}.
+
+    version: version de la table products à laquelle correspond l'index
+    (None tant que l'index n'a pas été construit).
+    """
+
+    def __init__(self, fields: Dict[str, float] = None):
+        """Initialise un index vide."""
+        self.fields = fields or FIELD_WEIGHTS
+        self.version: Optional[int] = None
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._documents: Dict[str, Dict[str, float]] = {}
+        self._order: Dict[str, int] = {}
+        self._terms: Optional[List[str]] = []
+        self._lock = threading.RLock()
+
+    # =========================================================================
+    # CONSTRUCTION ET MISE À JOUR
+    # =========================================================================
+
+    def build(self, rows: List[Dict], version: int):
+        """Reconstruit l'index complet à partir des lignes de la table."""
+        with self._lock:
+            self._postings = {}
+            self._documents = {}
+            self._order = {}
+            self._terms = None
+            for row in rows:
+                self._add(row)
+            self.version = version
+
+    def _weights(self, row: Dict) -> Dict[str, float]:
+        """Poids de chaque terme d'une ligne (meilleur champ retenu)."""
+        weights: Dict[str, float] = {}
+        for field, weight in self.fields.items():
+            for term in tokenize(row.get(field, '')):
+                if weights.get(term, 0) < weight:
+                    weights[term] = weight
+        return weights
+
+    def _add(self, row: Dict):
+        doc_id = row['id']
+        weights = self._weights(row)
+        self._documents[doc_id] = weights
+        self._order.setdefault(doc_id, len(self._order))
+        for term, weight in weights.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                # Nouveau terme: la liste triée sera reconstruite à la demande
+                self._terms = None
+            postings[doc_id] = weight
+
+    def _remove(self, doc_id: str):
+        for term in self._documents.pop(doc_id, {}):
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self._postings[term]
+                    self._terms = None
+
+    def put(self, row: Dict):
+        """Indexe (ou réindexe) une ligne."""
+        with self._lock:
+            self._remove(row['id'])
+            self._add(row)
+
+    def remove(self, doc_id: str):
+        """Retire une ligne de l'index."""
+        with self._lock:
+            self._remove(doc_id)
+            self._order.pop(doc_id, None)
+
+    # =========================================================================
+    # RECHERCHE
+    # =========================================================================
+
+    def _sorted_terms(self) -> List[str]:
+        if self._terms is None:
+            self._terms = sorted(self._postings)
+        return self._terms
+
+    def _matches(self, token: str) -> Dict[str, float]:
+        """Score de chaque document pour un mot de la requête."""
+        scores = dict(self._postings.get(token, {}))
+        # Les mots trop courts ne sont recherchés qu'à l'identique
+        if len(token) < MIN_PREFIX_LENGTH:
+            return scores
+
+        terms = self._sorted_terms()
+        start = bisect.bisect_left(terms, token)
+        for position in range(start, len(terms)):
+            term = terms[position]
+            if not term.startswith(token):
+                break
+            if term == token:
+                continue
+            for doc_id, weight in self._postings[term].items():
+                weight *= PREFIX_FACTOR
+                if scores.get(doc_id, 0) < weight:
+                    scores[doc_id] = weight
+        return scores
+
+    def search(self, query: str) -> List[str]:
+        """Retourne les IDs correspondant à la requête, du plus pertinent au moins pertinent."""
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        with self._lock:
+            scores: Optional[Dict[str, float]] = None
+            # Les mots les plus rares d'abord pour réduire l'ensemble au plus vite
+            for token in sorted(tokens, key=lambda t: len(self._postings.get(t, ()))):
+                matches = self._matches(token)
+                if scores is None:
+                    scores = matches
+                else:
+                    scores = {doc_id: score + matches[doc_id]
+                              for doc_id, score in scores.items() if doc_id in matches}
+                if not scores:
+                    return []
+
+            order = self._order
+            return sorted(scores, key=lambda doc_id: (-scores[doc_id], order.get(doc_id, 0)))
@@ -0,0 +1,206 @@
+"""
+=============================================================================
+STOCKAGE DES SESSIONS DE L'API REST
+=============================================================================
+Sessions de l'API Flask (token Bearer -> utilisateur connecté).
+
+Une session ne contient que l'identité nécessaire aux contrôles d'accès
+(ID et rôle de l'utilisateur), pas l'utilisateur complet, et expire après
+une durée fixe depuis la connexion (TTL).
+
+- MemorySessionStore: en mémoire du processus, LRU borné (les sessions
+  les moins récemment utilisées sont évincées au-delà de max_entries).
+- SqliteSessionStore: base SQLite partagée (mode WAL) entre tous les
+  processus/workers de l'API. Les tokens y sont enregistrés hachés
+  (SHA-256): une copie du fichier ne permet pas de se connecter.
+
+Configuration (variables d'environnement):
+- MARKETFLOW_SESSION_STORE: 'memory' (défaut) ou 'sqlite'.
+- MARKETFLOW_SESSION_TTL: durée de vie d'une session en secondes (86400).
+- MARKETFLOW_SESSION_MAX: nombre maximal de sessions en mémoire (10000).
+- MARKETFLOW_SESSION_PATH: base SQLite des sessions (défaut: data/sessions.db).
+=============================================================================
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Champs de l'utilisateur conservés dans une session
+SESSION_FIELDS = ('id', 'role')
+
+# Écritures entre deux purges des sessions expirées (base SQLite)
+PURGE_INTERVAL = 256
+
+
+def session_data(user: Dict) -> Dict:
+    """Extrait de l'utilisateur les champs conservés en session."""
+    return {field: user.get(field, '') for field in SESSION_FIELDS}
+
+
+class SessionStore:
+    """Interface commune des stockages de sessions."""
+
+    name = 'abstract'
+
+    def __init__(self, ttl: float = None):
+        self.ttl = ttl if ttl is not None else float(
+            os.environ.get('MARKETFLOW_SESSION_TTL', '86400'))
+
+    def get(self, token: str) -> Optional[Dict]:
+        """Retourne la session d'un token, ou None (inconnue ou expirée)."""
+        raise NotImplementedError
+
+    def set(self, token: str, user: Dict):
+        """Ouvre une session pour un utilisateur."""
+        raise NotImplementedError
+
+    def delete(self, token: str):
+        """Ferme une session (sans effet si elle n'existe pas)."""
+        raise NotImplementedError
+
+    def purge(self) -> int:
+        """Supprime les sessions expirées; retourne leur nombre."""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        return {'store': self.name, 'ttl': self.ttl}
+
+
+class MemorySessionStore(SessionStore):
+    """Sessions en mémoire du processus, LRU borné avec durée de vie."""
+
+    name = 'memory'
+
+    def __init__(self, ttl: float = None, max_entries: int = None):
+        super().__init__(ttl)
+        self.max_entries = max_entries if max_entries is not None else int(
+            os.environ.get('MARKETFLOW_SESSION_MAX', '10000'))
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[1]
+
+    def set(self, token: str, user: Dict):
+        with self._lock:
+            self._entries[token] = (time.monotonic() + self.ttl, session_data(user))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, token: str):
+        with self._lock:
+            self._entries.pop(token, None)
+
+    def purge(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            expired = [token for token, entry in self._entries.items() if entry[0] < now]
+            for token in expired:
+                del self._entries[token]
+        return len(expired)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {**super().stats(), 'sessions': len(self._entries),
+                    'max_entries': self.max_entries}
+
+
+class SqliteSessionStore(SessionStore):
+    """Sessions partagées dans une base SQLite, une connexion par thread."""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path: str, ttl: float = None):
+        super().__init__(ttl)
+        self.db_path = db_path
+        self._local = threading.local()
+        self._writes = 0
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS sessions '
+                     '(token TEXT PRIMARY KEY, data TEXT NOT NULL, expires REAL NOT NULL)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires)')
+
+    def _conn(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (créée à la demande)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode('utf-8')).hexdigest()
+
+    def get(self, token: str) -> Optional[Dict]:
+        # Horloge murale: les échéances sont comparées entre processus
+        found = self._conn().execute(
+            'SELECT data FROM sessions WHERE token = ? AND expires > ?',
+            (self._key(token), time.time())
+        ).fetchone()
+        return json.loads(found[0]) if found else None
+
+    def set(self, token: str, user: Dict):
+        self._conn().execute(
+            'INSERT OR REPLACE INTO sessions (token, data, expires) VALUES (?, ?, ?)',
+            (self._key(token), json.dumps(session_data(user)), time.time() + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % PURGE_INTERVAL == 0:
+            self.purge()
+
+    def delete(self, token: str):
+        self._conn().execute('DELETE FROM sessions WHERE token = ?', (self._key(token),))
+
+    def purge(self) -> int:
+        cursor = self._conn().execute('DELETE FROM sessions WHERE expires <= ?', (time.time(),))
+        return cursor.rowcount
+
+    def stats(self) -> Dict:
+        count = self._conn().execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        return {**super().stats(), 'sessions': count, 'path': self.db_path}
+
+    def close(self):
+        """Ferme la connexion du thread courant."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_session_store(data_dir: str, store: str = None) -> SessionStore:
+    """
+    Instancie le stockage de sessions configuré.
+
+    store: 'memory' ou 'sqlite' (défaut: MARKETFLOW_SESSION_STORE, sinon 'memory').
+    """
+    store = store or os.environ.get('MARKETFLOW_SESSION_STORE', 'memory')
+
+    if store == 'sqlite':
+        db_path = os.environ.get('MARKETFLOW_SESSION_PATH',
+                                 os.path.join(data_dir, 'sessions.db'))
+        return SqliteSessionStore(db_path)
+
+    if store == 'memory':
+        return MemorySessionStore()
+
+    raise ValueError(f"Stockage de sessions inconnu: {store} (attendu: memory ou sqlite)")
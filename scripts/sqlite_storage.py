@@ -0,0 +1,359 @@
+"""
+=============================================================================
+MOTEUR DE STOCKAGE SQLITE
+=============================================================================
+Stockage des tables MarketFlow dans une base SQLite unique
+(par défaut data/marketflow.db).
+
+- Mode WAL: lecteurs concurrents pendant les écritures.
+- Index SQL correspondant aux index déclarés dans storage.INDEXES
+  (email unique, user_id, seller_id, catégorie en minuscules).
+- Requêtes paramétrées, mises en cache par sqlite3 (statements préparés).
+- Transactions réelles (BEGIN IMMEDIATE / COMMIT / ROLLBACK).
+- Versions des tables (une incrémentation par écriture) stockées dans la
+  base, donc visibles par tous les processus qui la partagent.
+
+Les valeurs sont retournées sous forme de chaînes, comme avec le moteur CSV.
+=============================================================================
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from storage import StorageEngine, TABLES, INDEXES
+
+
+def _lower(value):
+    """Passage en minuscules Unicode (le lower() de SQLite se limite à l'ASCII)."""
+    return value.lower() if isinstance(value, str) else value
+
+
+class SqliteStorage(StorageEngine):
+    """Stockage SQLite avec une connexion par thread."""
+
+    name = 'sqlite'
+
+    def __init__(self, db_path: str):
+        """Ouvre (ou crée) la base et ses tables techniques."""
+        self.db_path = db_path
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS _versions '
+                     '(name TEXT PRIMARY KEY, version INTEGER NOT NULL DEFAULT 0, modified REAL)')
+        # Bases créées avant l'ajout de la date de modification
+        if 'modified' not in {info[1] for info in conn.execute('PRAGMA table_info(_versions)')}:
+            conn.execute('ALTER TABLE _versions ADD COLUMN modified REAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS _sequences '
+                     '(name TEXT PRIMARY KEY, next_id INTEGER NOT NULL)')
+
+    # =========================================================================
+    # CONNEXIONS ET TRANSACTIONS
+    # =========================================================================
+
+    def _conn(self) -> sqlite3.Connection:
+        """Retourne la connexion du thread courant (créée à la demande)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: autocommit, les transactions sont explicites
+            conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None,
+                                   cached_statements=256)
+            conn.create_function('mf_lower', 1, _lower, deterministic=True)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('PRAGMA busy_timeout=10000')
+            self._local.conn = conn
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def transaction(self, *tables: str):
+        """
+        Transaction SQLite (BEGIN IMMEDIATE verrouille la base entière en
+        écriture: tables ignoré); les transactions imbriquées rejoignent l'englobante.
+        """
+        conn = self._conn()
+        if self._local.depth > 0:
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        conn.execute('BEGIN IMMEDIATE')
+        self._local.depth = 1
+        try:
+            yield
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        else:
+            conn.execute('COMMIT')
+        finally:
+            self._local.depth = 0
+
+    def close(self):
+        """Ferme la connexion du thread courant."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # =========================================================================
+    # TABLES
+    # =========================================================================
+
+    def table_exists(self, table: str) -> bool:
+        found = self._conn().execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,)
+        ).fetchone()
+        return found is not None
+
+    def create_table(self, table: str):
+        """Crée une table, ses index et son compteur de version."""
+        columns = ', '.join(f'"{c}" TEXT' for c in TABLES[table] if c != 'id')
+        with self.transaction():
+            conn = self._conn()
+            conn.execute(f'CREATE TABLE IF NOT EXISTS "{table}" (id INTEGER PRIMARY KEY, {columns})')
+            self._create_indexes(table)
+
+            conn.execute('INSERT OR IGNORE INTO _versions (name, version) VALUES (?, 0)', (table,))
+
+    def _create_indexes(self, table: str):
+        """Crée les index SQL déclarés dans storage.INDEXES."""
+        conn = self._conn()
+        for name, (column, lower, unique) in INDEXES.get(table, {}).items():
+            expression = f'mf_lower("{column}")' if lower else f'"{column}"'
+            kind = 'UNIQUE INDEX' if unique else 'INDEX'
+            conn.execute(f'CREATE {kind} IF NOT EXISTS "idx_{table}_{name}" '
+                         f'ON "{table}" ({expression})')
+
+    def upgrade_table(self, table: str):
+        """Ajoute les colonnes manquantes (ALTER TABLE ... ADD COLUMN)."""
+        with self.transaction():
+            conn = self._conn()
+            existing = {info[1] for info in conn.execute(f'PRAGMA table_info("{table}")')}
+            for column in TABLES[table]:
+                if column not in existing:
+                    conn.execute(f'ALTER TABLE "{table}" ADD COLUMN "{column}" TEXT')
+                    print(f"[DB] Table {table}: colonne {column} ajoutée")
+            # Index déclarés après la création de la table
+            self._create_indexes(table)
+
+    def drop_table(self, table: str):
+        """Supprime une table et sa séquence (utilisé par la migration)."""
+        with self.transaction():
+            conn = self._conn()
+            conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+            self.reset_sequence(table)
+
+    def reset_sequence(self, table: str):
+        """Oublie la séquence d'une table: le prochain ID repartira de max(id) + 1."""
+        self._conn().execute('DELETE FROM _sequences WHERE name = ?', (table,))
+
+    # =========================================================================
+    # LECTURE
+    # =========================================================================
+
+    @staticmethod
+    def _to_dict(table: str, values) -> Dict:
+        """Convertit un tuple SQLite en dictionnaire de chaînes."""
+        return {c: '' if v is None else str(v) for c, v in zip(TABLES[table], values)}
+
+    def _select(self, table: str, where: str = '', params=()) -> List[Dict]:
+        columns = ', '.join(f'"{c}"' for c in TABLES[table])
+        cursor = self._conn().execute(
+            f'SELECT {columns} FROM "{table}" {where} ORDER BY id', params
+        )
+        return [self._to_dict(table, values) for values in cursor]
+
+    def all_rows(self, table: str) -> List[Dict]:
+        return self._select(table)
+
+    def get(self, table: str, row_id: str) -> Optional[Dict]:
+        rows = self._select(table, 'WHERE id = ?', (row_id,))
+        return rows[0] if rows else None
+
+    def get_many(self, table: str, row_ids: List[str]) -> Dict[str, Dict]:
+        found = {}
+        ids = list(dict.fromkeys(str(row_id) for row_id in row_ids))
+        # Par lots pour rester sous la limite de paramètres de SQLite
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            placeholders = ', '.join('?' for _ in chunk)
+            for row in self._select(table, f'WHERE id IN ({placeholders})', chunk):
+                found[row['id']] = row
+        return found
+
+    def page(self, table: str, after_id: Optional[int], limit: int,
+             predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        """Parcours de la clé primaire à partir du curseur (WHERE id > ?)."""
+        return self._page_select(table, '', (), after_id, limit, predicate)
+
+    def lookup_page(self, table: str, index: str, key: str, after_id: Optional[int],
+                    limit: int, predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        """Parcours de l'index secondaire, par ID croissant à partir du curseur."""
+        column, lower, _ = INDEXES[table][index]
+        expression = f'mf_lower("{column}")' if lower else f'"{column}"'
+        return self._page_select(table, f'{expression} = ? AND', (key,), after_id, limit, predicate)
+
+    def _page_select(self, table: str, where: str, params: tuple, after_id: Optional[int],
+                     limit: int, predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        columns = ', '.join(f'"{c}"' for c in TABLES[table])
+        sql = f'SELECT {columns} FROM "{table}" WHERE {where} id > ? ORDER BY id'
+        if predicate is None:
+            sql += f' LIMIT {int(limit)}'
+        cursor = self._conn().execute(sql, (*params, -1 if after_id is None else after_id))
+
+        result = []
+        for values in cursor:
+            row = self._to_dict(table, values)
+            if predicate is None or predicate(row):
+                result.append(row)
+                if len(result) >= limit:
+                    break
+        cursor.close()
+        return result
+
+    def lookup(self, table: str, index: str, key: str) -> List[Dict]:
+        column, lower, _ = INDEXES[table][index]
+        expression = f'mf_lower("{column}")' if lower else f'"{column}"'
+        return self._select(table, f'WHERE {expression} = ?', (key,))
+
+    def version(self, table: str) -> int:
+        found = self._conn().execute(
+            'SELECT version FROM _versions WHERE name = ?', (table,)
+        ).fetchone()
+        return found[0] if found else 0
+
+    def version_tag(self, table: str) -> str:
+        """Version et date de modification (une base recréée repart de la version 0)."""
+        found = self._conn().execute(
+            'SELECT version, modified FROM _versions WHERE name = ?', (table,)
+        ).fetchone()
+        if not found:
+            return '0'
+        return f"{found[0]}.{int((found[1] or 0) * 1e6)}"
+
+    def modified(self, table: str) -> Optional[float]:
+        found = self._conn().execute(
+            'SELECT modified FROM _versions WHERE name = ?', (table,)
+        ).fetchone()
+        return found[0] if found else None
+
+    # =========================================================================
+    # ÉCRITURE
+    # =========================================================================
+
+    def next_id(self, table: str) -> int:
+        """Attribue un ID via la table _sequences (initialisée avec max(id) + 1)."""
+        with self.transaction():
+            conn = self._conn()
+            conn.execute(
+                f'INSERT OR IGNORE INTO _sequences (name, next_id) '
+                f'SELECT ?, COALESCE(MAX(id), 0) + 1 FROM "{table}"', (table,)
+            )
+            value = conn.execute(
+                'SELECT next_id FROM _sequences WHERE name = ?', (table,)
+            ).fetchone()[0]
+            conn.execute('UPDATE _sequences SET next_id = next_id + 1 WHERE name = ?', (table,))
+            return value
+
+    def _insert_sql(self, table: str, ignore_conflicts: bool = False) -> str:
+        columns = ', '.join(f'"{c}"' for c in TABLES[table])
+        placeholders = ', '.join('?' for _ in TABLES[table])
+        verb = 'INSERT OR IGNORE' if ignore_conflicts else 'INSERT'
+        return f'{verb} INTO "{table}" ({columns}) VALUES ({placeholders})'
+
+    @staticmethod
+    def _values(table: str, row: Dict) -> tuple:
+        return tuple('' if row.get(c) is None else str(row.get(c)) for c in TABLES[table])
+
+    def _bump_version(self, table: str):
+        """Incrémente la version d'une table (dans la transaction de l'écriture)."""
+        self._conn().execute('UPDATE _versions SET version = version + 1, modified = ? WHERE name = ?',
+                             (time.time(), table))
+
+    def insert(self, table: str, row: Dict):
+        with self.transaction():
+            self._conn().execute(self._insert_sql(table), self._values(table, row))
+            self._bump_version(table)
+
+    def insert_many(self, table: str, rows: List[Dict], ignore_conflicts: bool = False) -> int:
+        """Insertion en masse dans une transaction; retourne le nombre de lignes ajoutées."""
+        with self.transaction():
+            cursor = self._conn().executemany(
+                self._insert_sql(table, ignore_conflicts),
+                (self._values(table, row) for row in rows)
+            )
+            self._bump_version(table)
+            return cursor.rowcount
+
+    def update(self, table: str, row_id: str, changes: Dict) -> Optional[Dict]:
+        columns = [c for c in TABLES[table] if c in changes and c != 'id']
+        with self.transaction():
+            if columns:
+                assignments = ', '.join(f'"{c}" = ?' for c in columns)
+                params = [('' if changes[c] is None else str(changes[c])) for c in columns]
+                cursor = self._conn().execute(
+                    f'UPDATE "{table}" SET {assignments} WHERE id = ?', params + [row_id]
+                )
+                if cursor.rowcount == 0:
+                    return None
+                self._bump_version(table)
+            return self.get(table, row_id)
+
+    def delete(self, table: str, row_ids: List[str]) -> int:
+        if not row_ids:
+            return 0
+        placeholders = ', '.join('?' for _ in row_ids)
+        with self.transaction():
+            cursor = self._conn().execute(
+                f'DELETE FROM "{table}" WHERE id IN ({placeholders})', list(row_ids)
+            )
+            if cursor.rowcount:
+                self._bump_version(table)
+            return cursor.rowcount
+
+    def write_batch(self, puts: Dict[str, List[Dict]] = None,
+                    deletes: Dict[str, List[str]] = None,
+                    expect: Dict[str, Dict[str, Dict]] = None):
+        """
+        Écriture multi-tables dans une seule transaction (UPSERT par ID).
+        expect: valeurs attendues; ConflictError annule la transaction.
+        """
+        with self.transaction():
+            self.check_expected(expect)
+            conn = self._conn()
+            for table, rows in (puts or {}).items():
+                if not rows:
+                    continue
+                updates = ', '.join(f'"{c}" = excluded."{c}"' for c in TABLES[table] if c != 'id')
+                conn.executemany(
+                    f'{self._insert_sql(table)} ON CONFLICT(id) DO UPDATE SET {updates}',
+                    (self._values(table, row) for row in rows)
+                )
+                self._bump_version(table)
+            for table, row_ids in (deletes or {}).items():
+                if not row_ids:
+                    continue
+                placeholders = ', '.join('?' for _ in row_ids)
+                conn.execute(f'DELETE FROM "{table}" WHERE id IN ({placeholders})', list(row_ids))
+                self._bump_version(table)
+
+    # =========================================================================
+    # STATISTIQUES
+    # =========================================================================
+
+    def stats(self) -> Dict:
+        conn = self._conn()
+        tables = {}
+        for table in TABLES:
+            if self.table_exists(table):
+                count = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+                tables[table] = {'rows': count, 'version': self.version(table)}
+        return {'engine': self.name, 'path': self.db_path, 'tables': tables}
@@ -8,20 +8,30 @@ pour visualiser les données de l'application MarketFlow.
 Les graphiques sont générés en images PNG qui peuvent être affichées
 dans l'interface d'administration.
 
+Cache des graphiques: un graphique n'est rendu qu'une fois par version des
+données de sa table source. Le PNG est conservé en mémoire et sous
+static/charts (<graphique>-<clé>.png, partagé entre processus); la clé
+combine le nom du graphique, les options de rendu et la version des données.
+
 Auteur: MarketFlow Team
 Date: 2025
 =============================================================================
 """
 
 import os
-import csv
 import json
+import glob
+import hashlib
+import threading
 from datetime import datetime, timedelta
 from collections import defaultdict
+from functools import wraps
 from typing import List, Dict, Optional
 import io
 import base64
 
+from write_log import read_rows, log_path
+
 # Import des bibliothèques de visualisation
 try:
     import matplotlib
@@ -42,14 +52,61 @@ except ImportError:
     print("[STATS] seaborn non disponible - pip install seaborn")
 
 
+# =========================================================================
+# CACHE DES GRAPHIQUES
+# =========================================================================
+
+# Résolution des images PNG
+CHART_DPI = 150
+
+# Options de rendu, incluses dans la clé du cache ('render' est à
+# incrémenter quand le code de rendu d'un graphique change)
+CHART_OPTIONS = (('format', 'png'), ('dpi', CHART_DPI), ('render', 1))
+
+# Graphiques rendus par le processus: nom -> (clé, PNG)
+_chart_cache: Dict[str, tuple] = {}
+
+# Un seul rendu à la fois (pyplot n'est pas thread-safe)
+_chart_lock = threading.Lock()
+
+
+def cached_chart(table: str, filename: str):
+    """
+    Décorateur des méthodes generate_*_chart: le graphique n'est rendu
+    qu'une fois par version des données de sa table source (voir
+    StatisticsGenerator._cached_png).
+    """
+    name = os.path.splitext(filename)[0]
+
+    def decorator(render):
+        @wraps(render)
+        def generate(self, save_file: bool = True) -> str:
+            if not MATPLOTLIB_AVAILABLE:
+                return ""
+            png = self._cached_png(name, table, lambda: render(self, save_file=False))
+            if not png:
+                return ""
+            if save_file:
+                return self._write_chart(png, filename)
+            return "data:image/png;base64," + base64.b64encode(png).decode('ascii')
+        return generate
+    return decorator
+
+
 class StatisticsGenerator:
     """
     Classe pour générer des statistiques et visualisations
     à partir des données CSV de l'application.
     """
     
-    def __init__(self):
-        """Initialise le générateur de statistiques."""
+    def __init__(self, db=None):
+        """
+        Initialise le générateur de statistiques.
+        db: DatabaseManager optionnel; les données sont alors lues via son
+            moteur de stockage (CSV ou SQLite) plutôt que dans les fichiers CSV.
+        """
+        self.db = db
+
         # Répertoires
         self.data_dir = os.path.join(os.path.dirname(__file__), 'data')
         self.charts_dir = os.path.join(os.path.dirname(__file__), 'static', 'charts')
@@ -79,16 +136,85 @@ class StatisticsGenerator:
         os.makedirs(self.charts_dir, exist_ok=True)
     
     def _read_csv(self, filepath: str) -> List[Dict]:
-        """Lit un fichier CSV et retourne une liste de dictionnaires."""
-        if not os.path.exists(filepath):
-            return []
-        with open(filepath, 'r', newline='', encoding='utf-8') as f:
-            return list(csv.DictReader(f))
+        """
+        Lit un fichier CSV et retourne une liste de dictionnaires.
+        Le journal d'écriture éventuel (mode 'log') est fusionné.
+        Avec un DatabaseManager, la table est lue via son moteur de stockage.
+        """
+        if self.db is not None:
+            table = os.path.splitext(os.path.basename(filepath))[0]
+            return [row.copy() for row in self.db.storage.all_rows(table)]
+        return read_rows(filepath)
     
+    def _data_version(self, table: str) -> str:
+        """
+        Version des données d'une table: version du moteur de stockage, ou
+        signature (mtime, taille) du CSV et de son journal sans DatabaseManager.
+        """
+        if self.db is not None:
+            return self.db.data_version(table)
+        filepath = os.path.join(self.data_dir, f'{table}.csv')
+        signature = []
+        for path in (filepath, log_path(filepath)):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return repr(signature)
+
+    def _cached_png(self, name: str, table: str, render) -> bytes:
+        """
+        PNG d'un graphique pour la version courante des données: cache
+        mémoire, puis fichier sous static/charts, sinon rendu par render()
+        (qui retourne l'image en base64, ou "" faute de données).
+        """
+        version = self._data_version(table)
+        key = hashlib.blake2b(repr((name, CHART_OPTIONS, version)).encode('utf-8'),
+                              digest_size=8).hexdigest()
+
+        cached = _chart_cache.get(name)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        path = os.path.join(self.charts_dir, f"{name}-{key}.png")
+        with _chart_lock:
+            cached = _chart_cache.get(name)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            try:
+                # Rendu par un autre processus (fichier vide: pas de données)
+                with open(path, 'rb') as f:
+                    png = f.read()
+            except FileNotFoundError:
+                image = render()
+                png = base64.b64decode(image.split(',', 1)[1]) if image else b''
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(png)
+                os.replace(tmp_path, path)
+                # Les versions précédentes du graphique ne serviront plus
+                for stale in glob.glob(os.path.join(self.charts_dir, f"{name}-*.png")):
+                    if stale != path:
+                        try:
+                            os.remove(stale)
+                        except OSError:
+                            pass
+            _chart_cache[name] = (key, png)
+        return png
+
+    def _write_chart(self, png: bytes, filename: str) -> str:
+        """Enregistre un graphique déjà rendu et retourne le chemin."""
+        filepath = os.path.join(self.charts_dir, filename)
+        with open(filepath, 'wb') as f:
+            f.write(png)
+        print(f"[STATS] Graphique sauvegardé: {filepath}")
+        return filepath
+
     def _save_chart(self, fig, filename: str) -> str:
         """Sauvegarde un graphique et retourne le chemin."""
         filepath = os.path.join(self.charts_dir, filename)
-        fig.savefig(filepath, dpi=150, bbox_inches='tight', 
+        fig.savefig(filepath, dpi=CHART_DPI, bbox_inches='tight', 
                    facecolor='white', edgecolor='none')
         plt.close(fig)
         print(f"[STATS] Graphique sauvegardé: {filepath}")
@@ -97,7 +223,7 @@ class StatisticsGenerator:
     def _chart_to_base64(self, fig) -> str:
         """Convertit un graphique en base64 pour affichage web."""
         buf = io.BytesIO()
-        fig.savefig(buf, format='png', dpi=150, bbox_inches='tight',
+        fig.savefig(buf, format='png', dpi=CHART_DPI, bbox_inches='tight',
                    facecolor='white', edgecolor='none')
         buf.seek(0)
         img_base64 = base64.b64encode(buf.read()).decode('utf-8')
@@ -134,6 +260,7 @@ class StatisticsGenerator:
         
         return dict(stats)
     
+    @cached_chart('users', 'users_by_role.png')
     def generate_users_by_role_chart(self, save_file: bool = True) -> str:
         """Génère un graphique camembert de la répartition des utilisateurs par rôle."""
         if not MATPLOTLIB_AVAILABLE:
@@ -191,6 +318,7 @@ class StatisticsGenerator:
         else:
             return self._chart_to_base64(fig)
     
+    @cached_chart('users', 'registrations_evolution.png')
     def generate_registrations_chart(self, save_file: bool = True) -> str:
         """Génère un graphique d'évolution des inscriptions par mois."""
         if not MATPLOTLIB_AVAILABLE:
@@ -278,6 +406,7 @@ class StatisticsGenerator:
         
         return dict(stats)
     
+    @cached_chart('products', 'products_by_category.png')
     def generate_products_by_category_chart(self, save_file: bool = True) -> str:
         """Génère un graphique à barres des produits par catégorie."""
         if not MATPLOTLIB_AVAILABLE:
@@ -321,6 +450,7 @@ class StatisticsGenerator:
         else:
             return self._chart_to_base64(fig)
     
+    @cached_chart('products', 'price_distribution.png')
     def generate_price_distribution_chart(self, save_file: bool = True) -> str:
         """Génère un histogramme de la distribution des prix."""
         if not MATPLOTLIB_AVAILABLE:
@@ -357,6 +487,7 @@ class StatisticsGenerator:
         else:
             return self._chart_to_base64(fig)
     
+    @cached_chart('products', 'stock_status.png')
     def generate_stock_status_chart(self, save_file: bool = True) -> str:
         """Génère un graphique de l'état des stocks."""
         if not MATPLOTLIB_AVAILABLE:
@@ -470,6 +601,7 @@ class StatisticsGenerator:
         
         return dict(stats)
     
+    @cached_chart('orders', 'orders_by_status.png')
     def generate_orders_by_status_chart(self, save_file: bool = True) -> str:
         """Génère un graphique des commandes par statut."""
         if not MATPLOTLIB_AVAILABLE:
@@ -533,6 +665,7 @@ class StatisticsGenerator:
         else:
             return self._chart_to_base64(fig)
     
+    @cached_chart('orders', 'revenue_evolution.png')
     def generate_revenue_evolution_chart(self, save_file: bool = True) -> str:
         """Génère un graphique d'évolution du chiffre d'affaires."""
         if not MATPLOTLIB_AVAILABLE:
@@ -0,0 +1,229 @@
+"""
+=============================================================================
+MOTEURS DE STOCKAGE - ABSTRACTION
+=============================================================================
+Le DatabaseManager ne manipule plus directement les fichiers: il passe par
+un moteur de stockage exposant des opérations par table (lecture, recherche
+par ID ou par index, insertion, mise à jour, suppression, transactions).
+
+Moteurs disponibles:
+- 'csv'    : fichiers data/*.csv (cache mémoire, index, journal d'écriture)
+- 'sqlite' : base SQLite (index SQL, mode WAL, vraies transactions)
+
+Sélection: DatabaseManager(storage='sqlite') ou variable d'environnement
+MARKETFLOW_STORAGE. Migration des CSV existants: migrate_to_sqlite.py
+=============================================================================
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+
+# =========================================================================
+# SCHÉMA DES TABLES
+# =========================================================================
+
+# Colonnes de chaque table, dans l'ordre des fichiers CSV.
+# Les colonnes ajoutées après coup sont créées vides dans les tables
+# existantes à l'ouverture du moteur (voir upgrade_table).
+TABLES = {
+    'users': ['id', 'email', 'password_hash', 'salt', 'firstname',
+              'lastname', 'role', 'created_at', 'last_login'],
+    'products': ['id', 'name', 'description', 'price', 'stock',
+                 'category', 'image_url', 'seller_id', 'created_at', 'active',
+                 'version'],
+    'orders': ['id', 'user_id', 'products', 'total', 'status',
+               'shipping_address', 'created_at', 'updated_at'],
+    'cart': ['id', 'user_id', 'product_id', 'quantity', 'added_at',
+             'reserved_until'],
+    'order_items': ['id', 'order_id', 'product_id', 'price', 'quantity',
+                    'seller_id'],
+}
+
+# Index secondaires: nom -> (colonne, clé en minuscules, unique)
+INDEXES = {
+    'users': {'email': ('email', True, True)},
+    'products': {'seller_id': ('seller_id', False, False),
+                 'category': ('category', True, False)},
+    'orders': {'user_id': ('user_id', False, False)},
+    'cart': {'user_id': ('user_id', False, False),
+             'product_id': ('product_id', False, False)},
+    'order_items': {'order_id': ('order_id', False, False),
+                    'product_id': ('product_id', False, False),
+                    'seller_id': ('seller_id', False, False)},
+}
+
+
+class ConflictError(Exception):
+    """Écriture refusée: une ligne a changé depuis sa lecture (voir write_batch)."""
+
+
+class StorageEngine:
+    """
+    Interface commune des moteurs de stockage.
+
+    Les lignes sont des dictionnaires de chaînes (comme lues depuis un CSV).
+    Les lignes retournées peuvent être partagées avec un cache interne:
+    l'appelant doit les copier avant de les modifier ou de les exposer.
+    Les clés passées à lookup() pour un index en minuscules doivent déjà
+    être en minuscules.
+    """
+
+    name = 'base'
+
+    # Tables et colonnes
+    def table_exists(self, table: str) -> bool:
+        raise NotImplementedError
+
+    def create_table(self, table: str):
+        raise NotImplementedError
+
+    def upgrade_table(self, table: str):
+        """Ajoute à une table existante les colonnes manquantes du schéma."""
+        raise NotImplementedError
+
+    # Lecture
+    def all_rows(self, table: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def get(self, table: str, row_id: str) -> Optional[Dict]:
+        raise NotImplementedError
+
+    def get_many(self, table: str, row_ids: List[str]) -> Dict[str, Dict]:
+        """Lecture groupée: retourne {id: ligne} pour les IDs existants."""
+        found = {}
+        for row_id in row_ids:
+            row = self.get(table, row_id)
+            if row is not None:
+                found[str(row_id)] = row
+        return found
+
+    def lookup(self, table: str, index: str, key: str) -> List[Dict]:
+        raise NotImplementedError
+
+    def page(self, table: str, after_id: Optional[int], limit: int,
+             predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        """
+        Pagination par curseur: au plus limit lignes d'ID > after_id,
+        par ID croissant, filtrées par predicate.
+
+        Les IDs ne suivent pas exactement l'ordre des insertions (blocs
+        d'IDs par processus, ID attribué avant l'écriture): une ligne
+        insérée avec un ID inférieur au curseur d'un client n'apparaît pas
+        dans ses pages suivantes.
+        """
+        rows = sorted(self.all_rows(table), key=lambda row: int(row['id']))
+        selected = [row for row in rows
+                    if (after_id is None or int(row['id']) > after_id)
+                    and (predicate is None or predicate(row))]
+        return selected[:limit]
+
+    def lookup_page(self, table: str, index: str, key: str, after_id: Optional[int],
+                    limit: int, predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        """Pagination par curseur des lignes d'une clé d'index (voir page)."""
+        rows = sorted(self.lookup(table, index, key), key=lambda row: int(row['id']))
+        selected = [row for row in rows
+                    if (after_id is None or int(row['id']) > after_id)
+                    and (predicate is None or predicate(row))]
+        return selected[:limit]
+
+    def version(self, table: str) -> int:
+        """
+        Numéro de version de la table, incrémenté une fois par écriture
+        (insert, update, delete ou write_batch la concernant).
+        """
+        raise NotImplementedError
+
+    def version_tag(self, table: str) -> str:
+        """
+        Identifiant du contenu courant de la table, identique dans tous les
+        processus qui partagent les données (validateur HTTP ETag).
+        """
+        return str(self.version(table))
+
+    def modified(self, table: str) -> Optional[float]:
+        """Date (timestamp) de la dernière modification de la table, si connue."""
+        return None
+
+    # Écriture
+    def next_id(self, table: str) -> int:
+        raise NotImplementedError
+
+    def insert(self, table: str, row: Dict):
+        raise NotImplementedError
+
+    def update(self, table: str, row_id: str, changes: Dict) -> Optional[Dict]:
+        """Met à jour une ligne; retourne la ligne modifiée ou None si absente."""
+        raise NotImplementedError
+
+    def delete(self, table: str, row_ids: List[str]) -> int:
+        """Supprime des lignes par ID; retourne le nombre de lignes supprimées."""
+        raise NotImplementedError
+
+    def write_batch(self, puts: Dict[str, List[Dict]] = None,
+                    deletes: Dict[str, List[str]] = None,
+                    expect: Dict[str, Dict[str, Dict]] = None):
+        """
+        Écriture atomique sur plusieurs tables.
+        puts: {table: [lignes complètes]} insérées ou remplacées par ID.
+        deletes: {table: [IDs]} à supprimer.
+        expect: {table: {ID: {colonne: valeur}}} valeurs attendues (compare-and-swap);
+                si une ligne ne correspond plus, ConflictError est levée et rien
+                n'est écrit.
+        """
+        with self.transaction(*set(puts or {}) | set(deletes or {}) | set(expect or {})):
+            self.check_expected(expect)
+            for table, rows in (puts or {}).items():
+                for row in rows:
+                    if self.get(table, row['id']) is None:
+                        self.insert(table, row)
+                    else:
+                        self.update(table, row['id'], row)
+            for table, row_ids in (deletes or {}).items():
+                self.delete(table, row_ids)
+
+    def check_expected(self, expect: Dict[str, Dict[str, Dict]] = None):
+        """Vérifie les valeurs attendues de write_batch (sous verrou ou transaction)."""
+        for table, rows in (expect or {}).items():
+            for row_id, expected in rows.items():
+                row = self.get(table, row_id)
+                if row is None or any(row.get(column, '') != str(value)
+                                      for column, value in expected.items()):
+                    raise ConflictError(f"{table} #{row_id} modifié entre-temps")
+
+    @contextmanager
+    def transaction(self, *tables: str):
+        """
+        Regroupe plusieurs lectures et écritures sur les tables indiquées:
+        aucune autre écriture de ces tables ne peut s'intercaler.
+        """
+        yield
+
+    # Maintenance
+    def stats(self) -> Dict:
+        return {'engine': self.name}
+
+    def close(self):
+        pass
+
+
+def create_storage(data_dir: str, storage: str = None, write_mode: str = None) -> StorageEngine:
+    """
+    Instancie le moteur de stockage configuré.
+
+    storage: 'csv' ou 'sqlite' (défaut: MARKETFLOW_STORAGE, sinon 'csv').
+    """
+    storage = storage or os.environ.get('MARKETFLOW_STORAGE', 'csv')
+
+    if storage == 'sqlite':
+        from sqlite_storage import SqliteStorage
+        db_path = os.environ.get('MARKETFLOW_SQLITE_PATH',
+                                 os.path.join(data_dir, 'marketflow.db'))
+        return SqliteStorage(db_path)
+
+    if storage == 'csv':
+        from csv_storage import CsvStorage
+        return CsvStorage(data_dir, write_mode)
+
+    raise ValueError(f"Moteur de stockage inconnu: {storage} (attendu: csv ou sqlite)")
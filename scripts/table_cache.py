@@ -0,0 +1,465 @@
+"""
+=============================================================================
+CACHE DES TABLES CSV EN MÉMOIRE
+=============================================================================
+Ce module conserve en mémoire les lignes déjà parsées des fichiers CSV
+afin d'éviter de relire et reparser un fichier complet à chaque requête.
+
+Invalidation:
+- Signature du fichier (mtime en nanosecondes + taille) différente
+  => le fichier a été modifié par un autre processus, on le relit.
+- Écriture effectuée par le DatabaseManager lui-même
+  => le cache est mis à jour directement avec les nouvelles lignes.
+
+La signature couvre aussi le journal d'écriture de la table (write_log),
+et le chargement fusionne le CSV de base avec ce journal.
+
+Chaque table possède un numéro de version incrémenté à chaque changement
+de contenu, ainsi que des compteurs hits/misses consultables via stats().
+
+Index:
+- Index primaire id -> ligne, toujours présent, pour des accès en O(1).
+- Index secondaires déclarés via declare_index() (ex: email unique,
+  user_id, seller_id). Ils sont construits à la première recherche puis
+  maintenus à chaque ajout, remplacement ou suppression de ligne.
+- Index ordonné des IDs (numériques), utilisé pour la pagination par
+  curseur: construit à la demande, prolongé par les ajouts en fin.
+- IDs triés par clé d'index secondaire (ex: produits d'une catégorie),
+  pour paginer une clé sans trier ses lignes à chaque page.
+
+Les lignes sont conservées sous forme compacte (voir compact_row): objets
+à __slots__ en lecture seule, lus comme des dictionnaires.
+=============================================================================
+"""
+
+import bisect
+import os
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+from write_log import log_path, read_rows
+from compact_row import compact
+
+
+def normalize_row(row: Dict, headers: List[str]) -> Dict:
+    """Convertit une ligne telle qu'elle serait relue depuis le CSV."""
+    return {h: '' if row.get(h) is None else str(row.get(h)) for h in headers}
+
+
+class IndexSpec:
+    """Déclaration d'un index secondaire: fonction de clé et unicité."""
+
+    def __init__(self, key_func: Callable[[Dict], str], unique: bool = False):
+        self.key_func = key_func
+        self.unique = unique
+
+
+class CachedTable:
+    """Entrée du cache: lignes parsées d'un fichier, ses index et sa signature."""
+
+    def __init__(self, rows: List[Dict], signature: Optional[Tuple],
+                 version: int, index_specs: Dict[str, IndexSpec]):
+        self.signature = signature
+        self.version = version
+        self.by_id: Dict[str, Dict] = {}
+        rows = [compact(row) for row in rows]
+        for row in rows:
+            self.by_id.setdefault(row['id'], row)
+        self._rows: Optional[List[Dict]] = rows
+        self._index_specs = index_specs
+        self._indexes: Dict[str, Dict] = {}
+        self._ordered_ids: Optional[List[int]] = None
+        # IDs triés de chaque clé d'index paginée: (index, clé) -> IDs
+        self._key_ids: Dict[Tuple[str, str], List[int]] = {}
+
+    @property
+    def rows(self) -> List[Dict]:
+        """
+        Instantané des lignes dans l'ordre du fichier.
+        Reconstruit après un remplacement ou une suppression: les listes déjà
+        distribuées aux lecteurs ne sont modifiées que par ajout en fin.
+        """
+        if self._rows is None:
+            self._rows = list(self.by_id.values())
+        return self._rows
+
+    # =========================================================================
+    # INDEX SECONDAIRES
+    # =========================================================================
+
+    def _index(self, name: str) -> Dict:
+        """Retourne l'index demandé, en le construisant si nécessaire."""
+        index = self._indexes.get(name)
+        if index is None:
+            index = {}
+            self._indexes[name] = index
+            for key_name in [k for k in self._key_ids if k[0] == name]:
+                del self._key_ids[key_name]
+            for row in self.by_id.values():
+                self._index_add(name, index, row)
+        return index
+
+    def _index_add(self, name: str, index: Dict, row: Dict):
+        spec = self._index_specs[name]
+        key = spec.key_func(row)
+        if spec.unique:
+            index.setdefault(key, row)
+        else:
+            index.setdefault(key, {})[row['id']] = row
+            key_ids = self._key_ids.get((name, key))
+            if key_ids is not None:
+                row_id = int(row['id'])
+                position = bisect.bisect_left(key_ids, row_id)
+                if position == len(key_ids) or key_ids[position] != row_id:
+                    key_ids.insert(position, row_id)
+
+    def _index_remove(self, name: str, index: Dict, row: Dict):
+        spec = self._index_specs[name]
+        key = spec.key_func(row)
+        if spec.unique:
+            if index.get(key) is row:
+                del index[key]
+        else:
+            bucket = index.get(key)
+            if bucket is not None:
+                bucket.pop(row['id'], None)
+                if not bucket:
+                    del index[key]
+            key_ids = self._key_ids.get((name, key))
+            if key_ids is not None:
+                row_id = int(row['id'])
+                position = bisect.bisect_left(key_ids, row_id)
+                if position < len(key_ids) and key_ids[position] == row_id:
+                    del key_ids[position]
+
+    def lookup(self, name: str, key: str) -> List[Dict]:
+        """Retourne les lignes dont la clé d'index vaut key."""
+        found = self._index(name).get(key)
+        if found is None:
+            return []
+        if self._index_specs[name].unique:
+            return [found]
+        return list(found.values())
+
+    # =========================================================================
+    # INDEX ORDONNÉ DES IDS
+    # =========================================================================
+
+    def _id_order(self) -> List[int]:
+        """IDs triés numériquement (reconstruits après une suppression)."""
+        if self._ordered_ids is None:
+            self._ordered_ids = sorted(int(row_id) for row_id in self.by_id)
+        return self._ordered_ids
+
+    def page(self, after_id: Optional[int], limit: int,
+             predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        """
+        Retourne au plus limit lignes d'ID strictement supérieur à after_id,
+        par ID croissant, en ne retenant que celles qui vérifient predicate.
+        """
+        ordered = self._id_order()
+        start = 0 if after_id is None else bisect.bisect_right(ordered, after_id)
+        result = []
+        for position in range(start, len(ordered)):
+            row = self.by_id.get(str(ordered[position]))
+            if row is not None and (predicate is None or predicate(row)):
+                result.append(row)
+                if len(result) >= limit:
+                    break
+        return result
+
+    def lookup_page(self, name: str, key: str, after_id: Optional[int], limit: int,
+                    predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        """
+        Page des lignes d'une clé d'index non unique (voir page): les IDs de
+        la clé sont triés une fois, puis tenus à jour à chaque modification.
+        """
+        bucket = self._index(name).get(key)
+        if not bucket:
+            return []
+        key_ids = self._key_ids.get((name, key))
+        if key_ids is None:
+            key_ids = self._key_ids[(name, key)] = sorted(int(row_id) for row_id in bucket)
+        start = 0 if after_id is None else bisect.bisect_right(key_ids, after_id)
+        result = []
+        for position in range(start, len(key_ids)):
+            row = bucket.get(str(key_ids[position]))
+            if row is not None and (predicate is None or predicate(row)):
+                result.append(row)
+                if len(result) >= limit:
+                    break
+        return result
+
+    # =========================================================================
+    # MODIFICATIONS INCRÉMENTALES
+    # =========================================================================
+
+    def add(self, row: Dict):
+        """Ajoute une ligne et la référence dans tous les index construits."""
+        row = compact(row)
+        self.by_id[row['id']] = row
+        if self._rows is not None:
+            self._rows.append(row)
+        if self._ordered_ids is not None:
+            row_id = int(row['id'])
+            if self._ordered_ids and row_id <= self._ordered_ids[-1]:
+                self._ordered_ids = None
+            else:
+                self._ordered_ids.append(row_id)
+        for name, index in self._indexes.items():
+            self._index_add(name, index, row)
+
+    def replace(self, old: Dict, new: Dict):
+        """Remplace une ligne par sa nouvelle version, à la même position."""
+        new = compact(new)
+        self.by_id[old['id']] = new
+        self._rows = None
+        for name, index in self._indexes.items():
+            spec = self._index_specs[name]
+            key = spec.key_func(old)
+            if key != spec.key_func(new):
+                self._index_remove(name, index, old)
+                self._index_add(name, index, new)
+            elif spec.unique:
+                if index.get(key) is old:
+                    index[key] = new
+            else:
+                # Même clé: on conserve la position dans le groupe
+                index[key][old['id']] = new
+
+    def remove(self, row: Dict):
+        """Supprime une ligne de la table et de tous les index."""
+        if self.by_id.get(row['id']) is row:
+            del self.by_id[row['id']]
+        self._rows = None
+        self._ordered_ids = None
+        for name, index in self._indexes.items():
+            self._index_remove(name, index, row)
+
+
+class TableCache:
+    """
+    Cache des tables CSV, indexé par chemin de fichier.
+
+    Les lignes retournées par get_rows(), get_by_id() et lookup() sont
+    partagées avec le cache et en lecture seule: l'appelant les copie
+    (row.copy()) pour les modifier.
+    """
+
+    def __init__(self):
+        """Initialise un cache vide et ses compteurs."""
+        self._tables: Dict[str, CachedTable] = {}
+        self._index_specs: Dict[str, Dict[str, IndexSpec]] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    def declare_index(self, filepath: str, name: str,
+                      key_func: Callable[[Dict], str], unique: bool = False):
+        """Déclare un index secondaire sur une table."""
+        with self._lock:
+            self._index_specs.setdefault(filepath, {})[name] = IndexSpec(key_func, unique)
+            # Les entrées existantes reconstruiront cet index à la demande
+            entry = self._tables.get(filepath)
+            if entry is not None:
+                entry._indexes.pop(name, None)
+
+    # =========================================================================
+    # SIGNATURE DES FICHIERS
+    # =========================================================================
+
+    @staticmethod
+    def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+        """Retourne (mtime_ns, taille) d'un fichier, ou None s'il n'existe pas."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    @classmethod
+    def _signature(cls, filepath: str) -> Optional[Tuple]:
+        """Signature d'une table: CSV de base et journal d'écriture."""
+        base = cls._file_signature(filepath)
+        journal = cls._file_signature(log_path(filepath))
+        if base is None and journal is None:
+            return None
+        return (base, journal)
+
+    def _new_entry(self, filepath: str, rows: List[Dict],
+                   signature: Optional[Tuple]) -> CachedTable:
+        """Crée l'entrée d'une table en poursuivant sa numérotation de version."""
+        previous = self._tables.get(filepath)
+        version = previous.version + 1 if previous is not None else 1
+        entry = CachedTable(rows, signature, version, self._index_specs.get(filepath, {}))
+        self._tables[filepath] = entry
+        return entry
+
+    # =========================================================================
+    # LECTURE
+    # =========================================================================
+
+    def _entry(self, filepath: str) -> CachedTable:
+        """Retourne l'entrée à jour d'une table, en relisant le fichier si besoin."""
+        signature = self._signature(filepath)
+        entry = self._tables.get(filepath)
+
+        if entry is not None and entry.signature == signature:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        rows = [] if signature is None else read_rows(filepath)
+        return self._new_entry(filepath, rows, signature)
+
+    def get_rows(self, filepath: str) -> List[Dict]:
+        """Retourne les lignes d'une table, en relisant le fichier si besoin."""
+        with self._lock:
+            return self._entry(filepath).rows
+
+    def get_by_id(self, filepath: str, row_id: str) -> Optional[Dict]:
+        """Retourne la ligne (partagée) ayant cet ID, ou None."""
+        with self._lock:
+            return self._entry(filepath).by_id.get(row_id)
+
+    def get_many(self, filepath: str, row_ids: List[str]) -> Dict[str, Dict]:
+        """Retourne {id: ligne} (partagées) pour les IDs existants, en un seul accès."""
+        with self._lock:
+            by_id = self._entry(filepath).by_id
+            return {row_id: by_id[row_id] for row_id in row_ids if row_id in by_id}
+
+    def page(self, filepath: str, after_id: Optional[int], limit: int,
+             predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        """Retourne une page de lignes (partagées) par ID croissant."""
+        with self._lock:
+            return self._entry(filepath).page(after_id, limit, predicate)
+
+    def lookup(self, filepath: str, index: str, key: str) -> List[Dict]:
+        """Retourne les lignes (partagées) correspondant à une clé d'index."""
+        with self._lock:
+            return self._entry(filepath).lookup(index, key)
+
+    def lookup_page(self, filepath: str, index: str, key: str, after_id: Optional[int],
+                    limit: int, predicate: Callable[[Dict], bool] = None) -> List[Dict]:
+        """Retourne une page (lignes partagées) d'une clé d'index, par ID croissant."""
+        with self._lock:
+            return self._entry(filepath).lookup_page(index, key, after_id, limit, predicate)
+
+    def version(self, filepath: str) -> int:
+        """Retourne la version courante d'une table (chargée si besoin)."""
+        with self._lock:
+            return self._entry(filepath).version
+
+    def signature(self, filepath: str) -> Optional[Tuple]:
+        """Retourne la signature des fichiers d'une table (chargée si besoin)."""
+        with self._lock:
+            return self._entry(filepath).signature
+
+    # =========================================================================
+    # MISE À JOUR APRÈS ÉCRITURE
+    # =========================================================================
+
+    def is_fresh(self, filepath: str) -> bool:
+        """Indique si l'entrée en cache correspond encore au fichier disque."""
+        with self._lock:
+            entry = self._tables.get(filepath)
+            return entry is not None and entry.signature == self._signature(filepath)
+
+    def store(self, filepath: str, headers: List[str], rows: List[Dict]):
+        """Remplace le contenu en cache après une réécriture complète du fichier."""
+        with self._lock:
+            normalized = [normalize_row(row, headers) for row in rows]
+            self._new_entry(filepath, normalized, self._signature(filepath))
+
+    def _apply(self, filepath: str, was_fresh: bool, change: Callable[[CachedTable], None]):
+        """
+        Applique une modification incrémentale après une écriture disque.
+        Si le cache n'était pas à jour avant l'écriture, l'entrée est invalidée.
+        """
+        with self._lock:
+            entry = self._tables.get(filepath)
+            if entry is None or not was_fresh:
+                self.invalidate(filepath)
+                return
+            change(entry)
+            entry.signature = self._signature(filepath)
+            entry.version += 1
+
+    def append(self, filepath: str, row: Dict, was_fresh: bool):
+        """Ajoute une ligne en cache après un ajout en fin de fichier."""
+        normalized = normalize_row(row, list(row.keys()))
+        self._apply(filepath, was_fresh, lambda entry: entry.add(normalized))
+
+    def replace(self, filepath: str, headers: List[str], old: Dict, new: Dict, was_fresh: bool):
+        """Remplace une ligne en cache après sa réécriture sur disque."""
+        normalized = normalize_row(new, headers)
+        self._apply(filepath, was_fresh, lambda entry: entry.replace(old, normalized))
+
+    def remove(self, filepath: str, rows: List[Dict], was_fresh: bool):
+        """Retire des lignes du cache après leur suppression sur disque."""
+        def change(entry: CachedTable):
+            for row in rows:
+                entry.remove(row)
+        self._apply(filepath, was_fresh, change)
+
+    def apply_records(self, filepath: str, headers: List[str], records: List[Dict],
+                      was_fresh: bool):
+        """
+        Applique en cache des enregistrements put/del (voir write_log) après
+        leur écriture sur disque, en une seule nouvelle version de la table.
+        """
+        def change(entry: CachedTable):
+            for record in records:
+                if record['op'] == 'put':
+                    new = normalize_row(record['row'], headers)
+                    old = entry.by_id.get(new['id'])
+                    if old is None:
+                        entry.add(new)
+                    else:
+                        entry.replace(old, new)
+                else:
+                    old = entry.by_id.get(record['id'])
+                    if old is not None:
+                        entry.remove(old)
+        self._apply(filepath, was_fresh, change)
+
+    def touch(self, filepath: str):
+        """
+        Rafraîchit la signature d'une table dont le contenu logique n'a pas
+        changé (ex: compaction du journal dans le CSV de base).
+        """
+        with self._lock:
+            entry = self._tables.get(filepath)
+            if entry is not None:
+                entry.signature = self._signature(filepath)
+
+    def invalidate(self, filepath: str = None):
+        """Invalide une table (ou tout le cache si filepath est None)."""
+        with self._lock:
+            if filepath is None:
+                for entry in self._tables.values():
+                    entry.signature = ('invalid',)
+            elif filepath in self._tables:
+                self._tables[filepath].signature = ('invalid',)
+
+    # =========================================================================
+    # STATISTIQUES
+    # =========================================================================
+
+    def stats(self) -> Dict:
+        """Retourne les compteurs du cache et l'état de chaque table."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'tables': {
+                    os.path.basename(path): {
+                        'rows': len(entry.by_id),
+                        'version': entry.version,
+                        'indexes': sorted(entry._indexes.keys())
+                    }
+                    for path, entry in self._tables.items()
+                }
+            }
@@ -0,0 +1,167 @@
+"""
+=============================================================================
+VERROUS LECTEURS/ÉCRIVAIN DES TABLES CSV
+=============================================================================
+Coordination des accès concurrents aux tables CSV, entre threads d'un même
+processus et entre processus (plusieurs workers du serveur API).
+
+- RWLock: verrou lecteurs/écrivain en mémoire, réentrant, avec priorité aux
+  écrivains (un écrivain en attente bloque les nouveaux lecteurs).
+- TableLock: RWLock doublé d'un verrou fichier fcntl sur un fichier voisin
+  (ex: orders.csv -> orders.lock): partagé tant qu'au moins un thread du
+  processus lit, exclusif pendant une écriture.
+
+Lectures parallèles, écritures sérialisées: un lecteur ne voit jamais une
+écriture à moitié faite, et deux écrivains ne peuvent plus perdre leurs
+mises à jour respectives.
+
+Un thread qui détient le verrou en écriture peut le reprendre en lecture ou
+en écriture. Passer de la lecture à l'écriture est interdit (interblocage).
+=============================================================================
+"""
+
+import os
+import threading
+from contextlib import contextmanager
+
+# Verrous fichier inter-processus (indisponibles sous Windows)
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+
+def lock_path(filepath: str) -> str:
+    """Retourne le chemin du fichier de verrou associé à une table CSV."""
+    return os.path.splitext(filepath)[0] + '.lock'
+
+
+class RWLock:
+    """Verrou lecteurs/écrivain réentrant, avec priorité aux écrivains."""
+
+    def __init__(self):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = {}
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    def acquire_read(self) -> bool:
+        """Prend le verrou en lecture; retourne True si le thread le détenait déjà."""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me or me in self._readers:
+                self._readers[me] = self._readers.get(me, 0) + 1
+                return True
+            while self._writer is not None or self._writers_waiting:
+                self._cond.wait()
+            self._readers[me] = 1
+            return False
+
+    def release_read(self):
+        me = threading.get_ident()
+        with self._cond:
+            depth = self._readers[me] - 1
+            if depth:
+                self._readers[me] = depth
+            else:
+                del self._readers[me]
+                self._cond.notify_all()
+
+    def acquire_write(self) -> bool:
+        """Prend le verrou en écriture; retourne True si le thread le détenait déjà."""
+        me = threading.get_ident()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return True
+            if me in self._readers:
+                raise RuntimeError("Verrou détenu en lecture: passage en écriture impossible")
+
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+            return False
+
+    @property
+    def write_depth(self) -> int:
+        """Profondeur de réentrance de l'écrivain courant (0 si aucun)."""
+        return self._writer_depth
+
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if self._writer_depth == 0:
+                self._writer = None
+                self._cond.notify_all()
+
+
+class TableLock:
+    """
+    Verrou d'une table: RWLock entre threads + fcntl.flock entre processus.
+
+    with table_lock:            -> accès exclusif (écriture)
+    with table_lock.shared():   -> accès partagé (lecture)
+    """
+
+    def __init__(self, filepath: str):
+        """filepath: chemin de la table CSV protégée."""
+        self.path = lock_path(filepath)
+        self._rw = RWLock()
+        self._mutex = threading.Lock()
+        self._shared_count = 0
+        self._file = None
+
+    def _flock(self, operation: str):
+        """Applique une opération flock ('LOCK_SH', 'LOCK_EX', 'LOCK_UN')."""
+        if not FCNTL_AVAILABLE:
+            return
+        if self._file is None:
+            self._file = open(self.path, 'a+', encoding='utf-8')
+        fcntl.flock(self._file.fileno(), getattr(fcntl, operation))
+
+    @contextmanager
+    def shared(self):
+        """Accès en lecture, parallèle aux autres lecteurs."""
+        nested = self._rw.acquire_read()
+        try:
+            if not nested:
+                # Premier lecteur du processus: verrou fichier partagé
+                with self._mutex:
+                    self._shared_count += 1
+                    if self._shared_count == 1:
+                        self._flock('LOCK_SH')
+            try:
+                yield
+            finally:
+                if not nested:
+                    with self._mutex:
+                        self._shared_count -= 1
+                        if self._shared_count == 0:
+                            self._flock('LOCK_UN')
+        finally:
+            self._rw.release_read()
+
+    def __enter__(self):
+        """Accès exclusif (écriture), réentrant pour le thread détenteur."""
+        if not self._rw.acquire_write():
+            try:
+                # Aucun lecteur dans le processus: le verrou fichier est libre
+                self._flock('LOCK_EX')
+            except BaseException:
+                self._rw.release_write()
+                raise
+        return self
+
+    def __exit__(self, *exc):
+        # Verrou fichier relâché avant le verrou mémoire, jamais après
+        if self._rw.write_depth == 1:
+            self._flock('LOCK_UN')
+        self._rw.release_write()
+        return False
@@ -0,0 +1,34 @@
+"""
+Configuration commune des tests: modules de scripts/ importables et base
+de données isolée dans un répertoire temporaire.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def offline_environment(monkeypatch, tmp_path):
+    """Aucun appel réseau (HaveIBeenPwned) ni fichier partagé hors de tmp_path."""
+    monkeypatch.setenv('MARKETFLOW_PWNED_MODE', 'offline')
+    monkeypatch.setenv('MARKETFLOW_PWNED_PATH', str(tmp_path / 'absent-pwned'))
+    monkeypatch.setenv('MARKETFLOW_PWNED_BLOOM', str(tmp_path / 'absent.bloom'))
+    monkeypatch.delenv('MARKETFLOW_SQLITE_PATH', raising=False)
+
+
+@pytest.fixture
+def make_db(tmp_path):
+    """Fabrique de DatabaseManager initialisés dans tmp_path/data."""
+    from database import DatabaseManager
+
+    def make(storage: str = 'csv', write_mode: str = 'rewrite') -> DatabaseManager:
+        db = DatabaseManager(storage=storage, write_mode=write_mode,
+                             data_dir=str(tmp_path / 'data'))
+        db.initialize_database()
+        return db
+
+    return make
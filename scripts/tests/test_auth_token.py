@@ -0,0 +1,79 @@
+"""Tests des tokens signés (auth_token)."""
+
+import time
+
+import pytest
+
+from auth_token import DEV_SECRET_KEY, RevocationList, TokenSigner, token_key
+
+USER = {'id': 'USR0001', 'role': 'client'}
+
+
+@pytest.fixture
+def signer():
+    return TokenSigner(token_key('une-cle-secrete-de-test'))
+
+
+def test_issued_token_verifies(signer):
+    claims = signer.verify(signer.issue(USER))
+    assert claims['sub'] == 'USR0001'
+    assert claims['role'] == 'client'
+
+
+def test_tampered_token_refused(signer):
+    payload, _, signature = signer.issue(USER).partition('.')
+    forged = TokenSigner(token_key('une-autre-cle')).issue({'id': 'USR0001', 'role': 'admin'})
+    assert signer.verify(forged) is None
+    assert signer.verify(forged.partition('.')[0] + '.' + signature) is None
+    assert signer.verify(payload + '.' + signature[:-2] + 'AA') is None
+    assert signer.verify(payload + '.é') is None
+    assert signer.verify('pas-un-token') is None
+
+
+def test_expired_token_refused():
+    signer = TokenSigner(token_key('une-cle-secrete-de-test'), ttl=-1)
+    assert signer.verify(signer.issue(USER)) is None
+
+
+def test_revocation_shared_through_file(tmp_path):
+    path = str(tmp_path / 'revoked_tokens.txt')
+    key = token_key('une-cle-secrete-de-test')
+    worker_a = TokenSigner(key, revocations=RevocationList(path))
+    worker_b = TokenSigner(key, revocations=RevocationList(path))
+
+    token = worker_a.issue(USER)
+    assert worker_b.verify(token) is not None
+    assert worker_a.revoke(token)
+    assert worker_a.verify(token) is None
+    assert worker_b.verify(token) is None
+    # Un token révoqué ne l'est pas deux fois
+    assert not worker_b.revoke(token)
+
+
+def test_expired_revocations_compacted(tmp_path):
+    path = tmp_path / 'revoked_tokens.txt'
+    revocations = RevocationList(str(path))
+    revocations.revoke('ancien', time.time() - 10)
+    revocations.revoke('courant', time.time() + 3600)
+    assert path.read_text().split()[0] == 'courant'
+
+    other = RevocationList(str(path))
+    assert other.is_revoked('courant')
+    assert not other.is_revoked('ancien')
+
+
+def test_token_key_requires_secret():
+    for secret in (None, '', DEV_SECRET_KEY):
+        with pytest.raises(ValueError):
+            token_key(secret)
+    with pytest.raises(ValueError):
+        token_key('une-cle-secrete-de-test', DEV_SECRET_KEY)
+
+
+def test_token_key_separate_from_secret_key():
+    key = token_key('une-cle-secrete-de-test')
+    assert key != b'une-cle-secrete-de-test'
+    assert token_key(None, 'cle-des-tokens') == b'cle-des-tokens'
+    # Un token signé avec SECRET_KEY elle-même est refusé
+    forged = TokenSigner(b'une-cle-secrete-de-test').issue(USER)
+    assert TokenSigner(key).verify(forged) is None
@@ -0,0 +1,87 @@
+"""Tests des commandes concurrentes (DatabaseManager.create_order)."""
+
+import threading
+
+import pytest
+
+from database import OutOfStockError
+
+PASSWORD = 'Un-mot-de-passe-solide-42!'
+EXPIRED = '2000-01-01T00:00:00'
+
+ENGINES = [('csv', 'rewrite'), ('csv', 'log'), ('sqlite', None)]
+
+
+def make_clients(db, count):
+    return [db.create_user(f'client{n}@example.com', PASSWORD, 'Client', str(n))['id']
+            for n in range(count)]
+
+
+def expire_reservations(db, user_id):
+    for item in db.storage.lookup('cart', 'user_id', user_id):
+        db.storage.update('cart', item['id'], {'reserved_until': EXPIRED})
+
+
+@pytest.mark.parametrize('storage, write_mode', ENGINES)
+def test_concurrent_checkouts_never_oversell(make_db, storage, write_mode):
+    db = make_db(storage, write_mode)
+    buyers = make_clients(db, 16)
+    product_id = db.get_all_products()[0]['id']
+    db.update_product(product_id, stock='16')
+    for user_id in buyers:
+        assert db.add_to_cart(user_id, product_id, 1)
+        # Réservations expirées: chaque panier est servi dans la limite du stock
+        expire_reservations(db, user_id)
+    db.update_product(product_id, stock='5')
+
+    orders, refused = [], []
+    start = threading.Barrier(len(buyers))
+
+    def buy(user_id):
+        start.wait()
+        try:
+            orders.append(db.create_order(user_id, '1 rue du Test'))
+        except OutOfStockError:
+            refused.append(user_id)
+
+    threads = [threading.Thread(target=buy, args=(user_id,)) for user_id in buyers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(orders) == 5 and len(refused) == 11
+    assert db.get_product_by_id(product_id)['stock'] == '0'
+    assert len({order['id'] for order in orders}) == 5
+
+
+@pytest.mark.parametrize('storage, write_mode', ENGINES)
+def test_checkout_keeps_reservation_made_during_checkout(make_db, storage, write_mode):
+    db = make_db(storage, write_mode)
+    buyer, other = make_clients(db, 2)
+    product_id = db.get_all_products()[0]['id']
+    db.update_product(product_id, stock='5')
+    assert db.add_to_cart(buyer, product_id, 1)
+    expire_reservations(db, buyer)
+
+    # Réservation du stock entier par un autre client pendant la commande
+    reserved = []
+    reserve = threading.Thread(target=lambda: reserved.append(db.add_to_cart(other, product_id, 5)))
+    available_stock = db._available_stock
+
+    def racing_available_stock(product, user_id):
+        available = available_stock(product, user_id)
+        if user_id == buyer and reserve.ident is None:
+            # Sans verrou du panier, la réservation passe avant l'écriture de la commande
+            reserve.start()
+            reserve.join(timeout=0.3)
+        return available
+
+    db._available_stock = racing_available_stock
+    assert db.create_order(buyer, '1 rue du Test')
+    reserve.join()
+
+    # Le stock restant (4) ne couvre plus la réservation: elle est refusée
+    assert reserved == [False]
+    assert db.get_product_by_id(product_id)['stock'] == '4'
+    assert not db.storage.lookup('cart', 'user_id', other)
@@ -0,0 +1,47 @@
+"""Tests des lignes compactes (compact_row)."""
+
+import pytest
+
+from compact_row import compact, _number
+
+
+@pytest.mark.parametrize('value', ['²', '١٢', '0012', '1.50', ' 3', 'abc', ''])
+def test_number_keeps_non_canonical_text(value):
+    assert _number(value) == value
+
+
+@pytest.mark.parametrize('value, expected', [('12', 12), ('0', 0), ('19.99', 19.99)])
+def test_number_converts_ascii_numbers(value, expected):
+    assert _number(value) == expected
+
+
+def test_compact_row_round_trips_unicode_digits():
+    row = compact({'id': '1', 'stock': '²', 'price': '١٢'})
+    assert row['stock'] == '²'
+    assert row['price'] == '١٢'
+    assert row.copy() == {'id': '1', 'stock': '²', 'price': '١٢'}
+
+
+@pytest.mark.parametrize('stock', ['²', '١٢'])
+def test_catalogue_readable_after_unicode_stock(make_db, stock):
+    db = make_db()
+    product_id = db.get_all_products()[0]['id']
+    db.update_product(product_id, stock=stock)
+
+    reloaded = make_db()
+    products = {p['id']: p for p in reloaded.get_all_products()}
+    assert products[product_id]['stock'] == stock
+
+
+def test_compact_row_reads_like_a_dict():
+    source = {'id': '7', 'role': 'seller', 'price': '0012', 'stock': '3', 'total': '4.5'}
+    row = compact(source)
+    assert dict(row) == source
+    assert row.copy() == source
+    assert list(row) == list(source)
+    assert row.get('missing', 'x') == 'x'
+    assert 'role' in row and 'missing' not in row
+    with pytest.raises(KeyError):
+        row['missing']
+    assert compact({'id': '1'}).copy() == {'id': '1'}
+    assert compact({}).copy() == {}
@@ -0,0 +1,104 @@
+"""Tests du stockage CSV (csv_storage): cache, index des positions, journaux."""
+
+import glob
+import json
+import os
+import threading
+
+import pytest
+
+from database import DatabaseManager
+from write_log import TransactionJournal
+
+PASSWORD = 'Un-mot-de-passe-solide-42!'
+
+
+@pytest.fixture
+def shop(make_db):
+    """Base initialisée avec un client et un produit en stock."""
+    db = make_db()
+    user = db.create_user('client@example.com', PASSWORD, 'Jean', 'Client')
+    product = db.get_all_products()[0]
+    db.update_product(product['id'], stock='100')
+    return db, user['id'], product['id']
+
+
+def checkout(db, user_id, product_id):
+    assert db.add_to_cart(user_id, product_id, 1)
+    return db.create_order(user_id, '1 rue du Test')
+
+
+def test_repeated_checkouts_keep_orders_cached(shop):
+    db, user_id, product_id = shop
+    checkout(db, user_id, product_id)
+
+    # Nouveau processus: commandes existantes, séquence d'IDs déjà persistée
+    db = DatabaseManager(storage='csv', write_mode='rewrite', data_dir=db.data_dir)
+    checkout(db, user_id, product_id)
+    misses = db.storage.stats()['misses']
+    for _ in range(4):
+        checkout(db, user_id, product_id)
+
+    stats = db.storage.stats()
+    assert stats['misses'] == misses
+    assert stats['offset_indexes']['orders.csv']['builds'] == 0
+    assert len(db.get_orders_by_user(user_id)) == 6
+
+
+def open_db(data_dir):
+    return DatabaseManager(storage='csv', write_mode='rewrite', data_dir=data_dir)
+
+
+def test_committed_journal_replayed_on_start(shop):
+    db, user_id, product_id = shop
+    journal = TransactionJournal(os.path.join(db.data_dir, 'transaction-1-1.journal'))
+    product = dict(db.get_product_by_id(product_id), stock='42')
+    order = {'id': '900', 'user_id': user_id, 'status': 'pending'}
+    journal.write({'products': [{'op': 'put', 'row': product}],
+                   'orders': [{'op': 'put', 'row': order}]})
+
+    db = open_db(db.data_dir)
+    assert db.get_product_by_id(product_id)['stock'] == '42'
+    assert db.get_order_by_id('900')['user_id'] == user_id
+    assert not os.path.exists(journal.path)
+
+
+def test_uncommitted_journal_discarded(shop):
+    db, user_id, product_id = shop
+    path = os.path.join(db.data_dir, 'transaction-1-1.journal')
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'op': 'put', 'table': 'products',
+                            'row': dict(db.get_product_by_id(product_id), stock='42')}) + '\n')
+
+    db = open_db(db.data_dir)
+    assert db.get_product_by_id(product_id)['stock'] == '100'
+    assert not glob.glob(os.path.join(db.data_dir, 'transaction*'))
+
+
+def test_recovery_waits_for_live_writer(shop):
+    db, user_id, product_id = shop
+    tmp_path = os.path.join(db.data_dir, 'transaction-1-1.journal.tmp')
+    writing, release = threading.Event(), threading.Event()
+
+    def writer():
+        # Transaction en cours: verrou pris, journal pas encore renommé
+        with db.storage.transaction('products'):
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write('{"op": "put"')
+            writing.set()
+            release.wait(5)
+            os.remove(tmp_path)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    writing.wait(5)
+    opened = []
+    starter = threading.Thread(target=lambda: opened.append(open_db(db.data_dir)))
+    starter.start()
+    starter.join(0.3)
+    assert os.path.exists(tmp_path) and not opened
+
+    release.set()
+    thread.join()
+    starter.join()
+    assert opened
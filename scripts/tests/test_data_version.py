@@ -0,0 +1,55 @@
+"""Tests des versions de données servant de validateurs HTTP (data_version)."""
+
+import pytest
+
+from database import DatabaseManager
+from response_cache import CachedResponse, ResponseCache
+
+ENGINES = [('csv', 'rewrite'), ('csv', 'log'), ('sqlite', None)]
+
+
+@pytest.mark.parametrize('storage, write_mode', ENGINES)
+def test_data_version_shared_between_processes(make_db, storage, write_mode):
+    db = make_db(storage, write_mode)
+    other = DatabaseManager(storage=storage, write_mode=write_mode, data_dir=db.data_dir)
+    before = db.data_version('products')
+    assert other.data_version('products') == before
+    assert db.data_version('products') == before
+
+    product_id = db.get_all_products()[0]['id']
+    db.update_product(product_id, stock='3')
+    after = db.data_version('products')
+    assert after != before
+    assert other.data_version('products') == after
+
+
+@pytest.mark.parametrize('storage, write_mode', ENGINES)
+def test_data_version_ignores_other_tables(make_db, storage, write_mode):
+    db = make_db(storage, write_mode)
+    before = db.data_version('products')
+    db.create_user('client@example.com', 'Un-mot-de-passe-solide-42!', 'Jean', 'Client')
+    assert db.data_version('products') == before
+
+
+def test_response_cache_serves_current_version_only():
+    cache = ResponseCache(max_bytes=4096)
+    key = ('/api/products', (), 'anonymous')
+    cache.put(key, CachedResponse('v1', b'[1]', 'application/json'))
+
+    assert cache.get(key, 'v1').body == b'[1]'
+    assert cache.get(key, 'v2') is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (1, 1)
+
+
+def test_response_cache_bounded_in_bytes():
+    cache = ResponseCache(max_bytes=1000)
+    for n in range(4):
+        cache.put(n, CachedResponse('v', b'x' * 300, 'application/json'))
+    stats = cache.stats()
+    assert stats['size_bytes'] <= 1000
+    assert cache.get(0, 'v') is None and cache.get(3, 'v') is not None
+
+    entry = cache.get(3, 'v')
+    assert cache.variant(3, entry, 'gzip', lambda body, encoding: b'z' * 10) == b'z' * 10
+    assert cache.variant(3, entry, 'gzip', lambda body, encoding: b'other') == b'z' * 10
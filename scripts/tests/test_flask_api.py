@@ -0,0 +1,58 @@
+"""Tests des réponses conditionnelles de l'API Flask (ETag, 304)."""
+
+import sys
+
+import pytest
+
+pytest.importorskip('flask')
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """Module flask_api importé sur une base isolée dans tmp_path."""
+    monkeypatch.setenv('MARKETFLOW_DATA_DIR', str(tmp_path / 'data'))
+    monkeypatch.delenv('MARKETFLOW_AUTH_TOKENS', raising=False)
+    sys.modules.pop('flask_api', None)
+    import flask_api
+    yield flask_api
+    sys.modules.pop('flask_api', None)
+
+
+@pytest.mark.parametrize('path', ['/api/products', '/api/categories'])
+def test_unchanged_version_returns_304(api, path):
+    client = api.app.test_client()
+    first = client.get(path)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+
+    again = client.get(path, headers={'If-None-Match': etag})
+    assert again.status_code == 304
+    assert again.headers['ETag'] == etag
+    assert not again.get_data()
+
+
+def test_write_changes_etag(api):
+    client = api.app.test_client()
+    etag = client.get('/api/products').headers['ETag']
+    product_id = api.db.get_all_products()[0]['id']
+    api.db.update_product(product_id, stock='3')
+
+    changed = client.get('/api/products', headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+
+def test_single_product_etag_follows_product_version(api):
+    client = api.app.test_client()
+    first, second = [p['id'] for p in api.db.get_all_products()[:2]]
+    etag = client.get(f'/api/products/{first}').headers['ETag']
+
+    # Un autre produit modifié: la fiche reste valide
+    api.db.update_product(second, stock='3')
+    assert client.get(f'/api/products/{first}',
+                      headers={'If-None-Match': etag}).status_code == 304
+
+    api.db.update_product(first, stock='3')
+    assert client.get(f'/api/products/{first}',
+                      headers={'If-None-Match': etag}).status_code == 200
@@ -0,0 +1,49 @@
+"""Tests des séquences d'IDs persistantes (id_sequence)."""
+
+import threading
+import time
+
+from database import DatabaseManager
+
+
+def test_first_seed_does_not_deadlock_with_table_writer(make_db):
+    db = make_db()
+    # Deux workers: verrous fichier distincts, comme deux processus
+    other = DatabaseManager(storage='csv', write_mode='rewrite', data_dir=db.data_dir)
+    ids = []
+    in_transaction, done = threading.Event(), threading.Event()
+
+    def writer():
+        with db.storage.transaction('orders'):
+            in_transaction.set()
+            # Laisse l'autre worker initialiser la séquence (lecture de la table)
+            time.sleep(0.2)
+            ids.append(db.storage.next_id('orders'))
+        done.set()
+
+    seeder = threading.Thread(target=lambda: ids.append(other.storage.next_id('orders')),
+                              daemon=True)
+    writing = threading.Thread(target=writer, daemon=True)
+    writing.start()
+    in_transaction.wait(5)
+    seeder.start()
+
+    assert done.wait(5), "interblocage entre la séquence et le verrou de la table"
+    seeder.join(5)
+    assert len(ids) == 2 and len(set(ids)) == 2
+
+
+def test_sequence_starts_after_existing_rows(make_db):
+    db = make_db()
+    existing = max(int(row['id']) for row in db.storage.all_rows('products'))
+    first = db.storage.next_id('products')
+    assert first > existing
+    assert db.storage.next_id('products') == first + 1
+
+
+def test_block_size_one_keeps_allocation_order_across_workers(make_db, monkeypatch):
+    monkeypatch.setenv('MARKETFLOW_ID_BLOCK_SIZE', '1')
+    db = make_db()
+    other = DatabaseManager(storage='csv', write_mode='rewrite', data_dir=db.data_dir)
+    ids = [worker.storage.next_id('orders') for worker in (db, other, db, other, other, db)]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
@@ -0,0 +1,70 @@
+"""Tests de la pagination par curseur des index secondaires."""
+
+import pytest
+
+from table_cache import TableCache
+
+ENGINES = [('csv', 'rewrite'), ('csv', 'log'), ('sqlite', None)]
+
+
+def walk(fetch, limit):
+    """Parcourt toutes les pages; retourne les IDs dans l'ordre reçu."""
+    ids, cursor = [], None
+    while True:
+        page = fetch(cursor, limit)
+        ids.extend(int(item['id']) for item in page['items'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('storage, write_mode', ENGINES)
+def test_category_pages_follow_index_changes(make_db, storage, write_mode):
+    db = make_db(storage, write_mode)
+    created = [db.create_product(f'Livre {n}', '', '9.99', '3', 'Livres', '', '2')['id']
+               for n in range(7)]
+    fetch = lambda cursor, limit: db.get_products_page(cursor, limit, category='livres')
+    assert walk(fetch, 3) == sorted(map(int, created))
+
+    # Désactivé, sorti de la catégorie, puis un autre produit y entre
+    other = db.create_product('Jeu', '', '19.99', '3', 'Jeux', '', '2')['id']
+    db.update_product(created[1], active='false')
+    db.update_product(created[4], category='Jeux')
+    db.update_product(other, category='Livres')
+    expected = sorted(int(i) for i in created + [other] if i not in (created[1], created[4]))
+    assert walk(fetch, 2) == expected
+
+
+@pytest.mark.parametrize('storage, write_mode', ENGINES)
+def test_user_order_pages(make_db, storage, write_mode):
+    db = make_db(storage, write_mode)
+    user = db.create_user('client@example.com', 'Un-mot-de-passe-solide-42!', 'Jean', 'Client')
+    product_id = db.get_all_products()[0]['id']
+    db.update_product(product_id, stock='50')
+    orders = []
+    for _ in range(5):
+        assert db.add_to_cart(user['id'], product_id, 1)
+        orders.append(int(db.create_order(user['id'], '1 rue du Test')['id']))
+
+    fetch = lambda cursor, limit: db.get_orders_page(cursor, limit, user_id=user['id'])
+    assert walk(fetch, 2) == orders
+    assert db.get_orders_page(None, 10, user_id='inconnu')['items'] == []
+
+
+def test_key_ids_kept_sorted_on_out_of_order_insert(tmp_path):
+    path = str(tmp_path / 'orders.csv')
+    (tmp_path / 'orders.csv').write_text('id,user_id\n5,a\n2,a\n9,b\n', encoding='utf-8')
+    cache = TableCache()
+    cache.declare_index(path, 'user_id', lambda row: row['user_id'])
+
+    assert [r['id'] for r in cache.lookup_page(path, 'user_id', 'a', None, 10)] == ['2', '5']
+    cache.append(path, {'id': '3', 'user_id': 'a'}, was_fresh=True)
+    cache.append(path, {'id': '7', 'user_id': 'b'}, was_fresh=True)
+    assert [r['id'] for r in cache.lookup_page(path, 'user_id', 'a', None, 10)] == ['2', '3', '5']
+    assert [r['id'] for r in cache.lookup_page(path, 'user_id', 'a', 2, 1)] == ['3']
+
+    row = cache.get_by_id(path, '5')
+    cache.replace(path, ['id', 'user_id'], row, {'id': '5', 'user_id': 'b'}, was_fresh=True)
+    assert [r['id'] for r in cache.lookup_page(path, 'user_id', 'a', None, 10)] == ['2', '3']
+    assert [r['id'] for r in cache.lookup_page(path, 'user_id', 'b', None, 10)] == ['5', '7', '9']
+    assert cache.lookup_page(path, 'user_id', 'c', None, 10) == []
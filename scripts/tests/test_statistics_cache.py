@@ -0,0 +1,62 @@
+"""Tests du cache des graphiques (StatisticsGenerator._cached_png)."""
+
+import base64
+import glob
+import os
+
+import pytest
+
+import statistics as stats_module
+from statistics import StatisticsGenerator
+
+
+@pytest.fixture
+def generator(make_db, tmp_path, monkeypatch):
+    monkeypatch.setattr(stats_module, '_chart_cache', {})
+    generator = StatisticsGenerator(make_db())
+    generator.charts_dir = str(tmp_path / 'charts')
+    os.makedirs(generator.charts_dir)
+    return generator
+
+
+def counting_render(calls):
+    def render():
+        calls.append(1)
+        return 'data:image/png;base64,' + base64.b64encode(b'PNG%d' % len(calls)).decode()
+    return render
+
+
+def test_chart_rendered_once_per_data_version(generator):
+    calls = []
+    render = counting_render(calls)
+    assert generator._cached_png('stock_status', 'products', render) == b'PNG1'
+    assert generator._cached_png('stock_status', 'products', render) == b'PNG1'
+    assert len(calls) == 1
+
+    product_id = generator.db.get_all_products()[0]['id']
+    generator.db.update_product(product_id, stock='3')
+    assert generator._cached_png('stock_status', 'products', render) == b'PNG2'
+    assert len(calls) == 2
+
+    # Seule la version courante reste sur disque
+    files = glob.glob(os.path.join(generator.charts_dir, 'stock_status-*.png'))
+    assert len(files) == 1
+
+
+def test_chart_shared_through_disk(generator, monkeypatch):
+    calls = []
+    generator._cached_png('orders_by_status', 'orders', counting_render(calls))
+
+    # Nouveau processus: cache mémoire vide, fichier PNG réutilisé
+    monkeypatch.setattr(stats_module, '_chart_cache', {})
+    assert generator._cached_png('orders_by_status', 'orders', counting_render(calls)) == b'PNG1'
+    assert len(calls) == 1
+
+
+def test_chart_ignores_writes_to_other_tables(generator):
+    calls = []
+    generator._cached_png('orders_by_status', 'orders', counting_render(calls))
+    product_id = generator.db.get_all_products()[0]['id']
+    generator.db.update_product(product_id, stock='4')
+    generator._cached_png('orders_by_status', 'orders', counting_render(calls))
+    assert len(calls) == 1
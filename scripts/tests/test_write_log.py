@@ -0,0 +1,137 @@
+"""Tests du mode d'écriture 'log' (write_log): rejeu après un arrêt brutal."""
+
+import glob
+import multiprocessing
+import os
+import threading
+
+import pytest
+
+from database import DatabaseManager
+from write_log import log_path
+
+
+@pytest.fixture
+def logged_db(make_db, monkeypatch):
+    """Base en mode 'log', sans compaction automatique."""
+    monkeypatch.setenv('MARKETFLOW_LOG_COMPACT_THRESHOLD', '100000')
+    return make_db('csv', 'log')
+
+
+def reopen(db, write_mode):
+    """Nouveau processus sur les mêmes fichiers (le précédent s'est arrêté)."""
+    return DatabaseManager(storage='csv', write_mode=write_mode, data_dir=db.data_dir)
+
+
+@pytest.mark.parametrize('write_mode', ['log', 'rewrite'])
+def test_uncompacted_log_replayed_by_new_process(logged_db, write_mode):
+    db = logged_db
+    products = db.get_all_products()
+    created = db.create_product('Lampe', 'Lampe de bureau', '24.90', '8', 'Maison', '', '2')
+    db.update_product(products[0]['id'], stock='17')
+    db.delete_product(products[1]['id'])
+    products_csv = db.storage.paths['products']
+    assert os.path.getsize(log_path(products_csv)) > 0
+
+    reopened = reopen(db, write_mode)
+    assert reopened.get_product_by_id(created['id'])['name'] == 'Lampe'
+    assert reopened.get_product_by_id(products[0]['id'])['stock'] == '17'
+    assert reopened.get_product_by_id(products[1]['id'])['active'] == 'false'
+
+
+def test_torn_log_line_ignored(logged_db):
+    db = logged_db
+    product_id = db.get_all_products()[0]['id']
+    db.update_product(product_id, stock='17')
+    # Arrêt brutal au milieu de l'écriture d'un enregistrement
+    with open(log_path(db.storage.paths['products']), 'a', encoding='utf-8') as f:
+        f.write('{"op": "put", "row": {"id": "%s", "stock": "99' % product_id)
+
+    reopened = reopen(db, 'log')
+    assert reopened.get_product_by_id(product_id)['stock'] == '17'
+    assert len(reopened.get_all_products()) == len(db.get_all_products())
+
+
+def test_compaction_keeps_logged_rows(logged_db):
+    db = logged_db
+    product_id = db.get_all_products()[0]['id']
+    db.update_product(product_id, stock='17')
+    db.compact_logs()
+
+    products_csv = db.storage.paths['products']
+    assert not os.path.exists(log_path(products_csv)) or os.path.getsize(log_path(products_csv)) == 0
+    assert reopen(db, 'rewrite').get_product_by_id(product_id)['stock'] == '17'
+
+
+def fill_log(db, product_ids, rounds):
+    for n in range(rounds):
+        for product_id in product_ids:
+            db.update_product(product_id, stock=str(n))
+
+
+def test_concurrent_compactions(logged_db):
+    db = logged_db
+    product_ids = [p['id'] for p in db.get_all_products()]
+    fill_log(db, product_ids, 5)
+
+    # Plusieurs workers (un moteur chacun) compactent en même temps
+    workers = [reopen(db, 'log') for _ in range(4)]
+    start = threading.Barrier(len(workers))
+    errors = []
+
+    def compact(worker):
+        start.wait()
+        try:
+            worker.compact_logs()
+        except OSError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=compact, args=(worker,)) for worker in workers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert not glob.glob(os.path.join(db.data_dir, '*.tmp'))
+    products = {p['id']: p for p in reopen(db, 'rewrite').get_all_products()}
+    assert all(products[product_id]['stock'] == '4' for product_id in product_ids)
+
+
+def test_compact_logs_waits_for_background_compaction(logged_db):
+    db = logged_db
+    product_ids = [p['id'] for p in db.get_all_products()]
+    fill_log(db, product_ids, 3)
+    products_csv = db.storage.paths['products']
+    table_log = db.storage._write_log(products_csv)
+
+    table_log.compact_in_background(lambda: list(db.storage.cache.get_rows(products_csv)),
+                                    db.storage.cache)
+    db.update_product(product_ids[0], stock='99')
+    db.compact_logs()
+
+    assert table_log.pending == 0
+    assert not glob.glob(os.path.join(db.data_dir, '*.tmp'))
+    assert reopen(db, 'rewrite').get_product_by_id(product_ids[0])['stock'] == '99'
+
+
+def _compact_in_process(data_dir):
+    DatabaseManager(storage='csv', write_mode='log', data_dir=data_dir).compact_logs()
+
+
+def test_compactions_across_processes(logged_db):
+    db = logged_db
+    product_ids = [p['id'] for p in db.get_all_products()]
+    fill_log(db, product_ids, 5)
+
+    context = multiprocessing.get_context('spawn')
+    processes = [context.Process(target=_compact_in_process, args=(db.data_dir,))
+                 for _ in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+
+    assert [process.exitcode for process in processes] == [0] * 4
+    products = {p['id']: p for p in reopen(db, 'rewrite').get_all_products()}
+    assert all(products[product_id]['stock'] == '4' for product_id in product_ids)
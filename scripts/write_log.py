@@ -0,0 +1,321 @@
+"""
+=============================================================================
+JOURNAL D'ÉCRITURE EN AJOUT SEUL (LOG-STRUCTURED)
+=============================================================================
+En mode 'log', les modifications d'une table ne réécrivent plus le fichier
+CSV complet: chaque mutation est ajoutée comme enregistrement delta dans un
+fichier journal voisin (ex: orders.csv -> orders.log), au format JSON lines.
+
+Enregistrements:
+- {"op": "put", "row": {...}}  insertion ou remplacement d'une ligne (par id)
+- {"op": "del", "id": "..."}   suppression d'une ligne
+
+La lecture fusionne le CSV de base et le journal (read_rows). Le journal
+est périodiquement compacté dans le CSV de base, en arrière-plan.
+La relecture du journal est idempotente: relire des enregistrements déjà
+intégrés à la base produit le même état final.
+
+Le même format sert au journal de transaction (TransactionJournal), qui
+rend atomique une écriture portant sur plusieurs tables.
+=============================================================================
+"""
+
+import csv
+import json
+import os
+import threading
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+
+def log_path(filepath: str) -> str:
+    """Retourne le chemin du journal associé à une table CSV."""
+    return os.path.splitext(filepath)[0] + '.log'
+
+
+def apply_records(rows: List[Dict], records: Iterable[Dict]) -> List[Dict]:
+    """Applique des enregistrements put/del à une liste de lignes."""
+    by_id = {}
+    for row in rows:
+        by_id.setdefault(row['id'], row)
+
+    for record in records:
+        if record.get('op') == 'put':
+            row = record['row']
+            by_id[row['id']] = row
+        elif record.get('op') == 'del':
+            by_id.pop(record['id'], None)
+
+    return list(by_id.values())
+
+
+def _parse(lines: Iterable[str]) -> Iterator[Dict]:
+    """Décode les lignes JSON d'un journal."""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Dernière ligne tronquée (arrêt brutal pendant l'écriture)
+            continue
+
+
+def _replay(rows: List[Dict], lines: Iterable[str]) -> List[Dict]:
+    """Applique les lignes du journal à une liste de lignes."""
+    return apply_records(rows, _parse(lines))
+
+
+def find_record(filepath: str, row_id: str) -> Optional[Dict]:
+    """
+    Dernier enregistrement du journal d'une table concernant un ID, ou None.
+    Seules les lignes qui mentionnent l'ID sont décodées.
+    """
+    journal = log_path(filepath)
+    if not os.path.exists(journal):
+        return None
+
+    marker = json.dumps({'id': str(row_id)})[1:-1]
+    found = None
+    with open(journal, 'r', encoding='utf-8') as f:
+        for record in _parse(line for line in f if marker in line):
+            if record.get('op') == 'put' and record['row'].get('id') == str(row_id):
+                found = record
+            elif record.get('op') == 'del' and record.get('id') == str(row_id):
+                found = record
+    return found
+
+
+def read_rows(filepath: str) -> List[Dict]:
+    """Lit une table: CSV de base fusionné avec son journal éventuel."""
+    rows = []
+    if os.path.exists(filepath):
+        with open(filepath, 'r', newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+
+    journal = log_path(filepath)
+    if not os.path.exists(journal):
+        return rows
+
+    with open(journal, 'r', encoding='utf-8') as f:
+        return _replay(rows, f)
+
+
+class WriteLog:
+    """
+    Journal d'écriture d'une table.
+    Les ajouts et la compaction sont sérialisés par un verrou par table.
+    """
+
+    def __init__(self, filepath: str, lock=None):
+        """
+        Initialise le journal et compte les enregistrements déjà présents.
+        lock: verrou réentrant de la table (TableLock), RLock par défaut.
+        """
+        self.filepath = filepath
+        self.path = log_path(filepath)
+        self.lock = lock if lock is not None else threading.RLock()
+        self.pending = 0
+        self._compacting = False
+        # Une seule compaction à la fois dans le processus (arrière-plan ou compact_logs)
+        self._compaction = threading.Lock()
+
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self.pending = sum(1 for line in f if line.strip())
+
+    # =========================================================================
+    # ÉCRITURE
+    # =========================================================================
+
+    def append(self, records: List[Dict]):
+        """Ajoute des enregistrements en fin de journal."""
+        if not records:
+            return
+        data = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r in records)
+        with self.lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(data)
+                f.flush()
+            self.pending += len(records)
+
+    def put(self, rows: List[Dict]):
+        """Journalise l'insertion ou le remplacement de lignes."""
+        self.append([{'op': 'put', 'row': row} for row in rows])
+
+    def delete(self, row_ids: List[str]):
+        """Journalise la suppression de lignes."""
+        self.append([{'op': 'del', 'id': row_id} for row_id in row_ids])
+
+    def discard(self):
+        """Supprime le journal (après une réécriture complète de la base)."""
+        with self.lock:
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self.pending = 0
+
+    # =========================================================================
+    # COMPACTION
+    # =========================================================================
+
+    def _headers(self) -> List[str]:
+        """Lit les en-têtes du CSV de base (la base est créée à l'initialisation)."""
+        with open(self.filepath, 'r', newline='', encoding='utf-8') as f:
+            return next(csv.reader(f))
+
+    def _identity(self) -> tuple:
+        """
+        Identité du CSV de base (inode, mtime) et du journal (inode), pour
+        détecter leur remplacement. Les ajouts au journal ne la modifient pas.
+        """
+        base = os.stat(self.filepath)
+        journal = os.stat(self.path).st_ino if os.path.exists(self.path) else None
+        return (base.st_ino, base.st_mtime_ns, journal)
+
+    def compact(self, snapshot: Callable[[], List[Dict]], cache=None):
+        """
+        Intègre le journal dans le CSV de base.
+
+        snapshot() doit retourner l'état courant fusionné de la table.
+        Seul le préfixe du journal couvert par l'instantané est retiré: les
+        enregistrements ajoutés pendant l'écriture de la base sont conservés.
+        Si un TableCache est fourni et qu'il était à jour, sa signature est
+        rafraîchie pour éviter un rechargement inutile de la table.
+
+        Attend la fin d'une compaction en cours dans le processus. Entre
+        processus, fichiers temporaires propres à chaque compacteur: le
+        premier qui termine remplace la base, les autres abandonnent.
+        """
+        with self._compaction:
+            self._compact(snapshot, cache)
+
+    def _compact(self, snapshot: Callable[[], List[Dict]], cache=None):
+        with self.lock:
+            # Journal déjà intégré (compaction précédente ou d'un autre processus)
+            if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+                self.pending = 0
+                return
+            headers = self._headers()
+            rows = snapshot()
+            offset = os.path.getsize(self.path)
+            files = self._identity()
+
+        # Écriture de la nouvelle base hors verrou (opération la plus longue)
+        suffix = f'{os.getpid()}-{threading.get_ident()}.tmp'
+        tmp_base = f'{self.filepath}.{suffix}'
+        try:
+            with open(tmp_base, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=headers)
+                writer.writeheader()
+                writer.writerows(rows)
+                f.flush()
+                os.fsync(f.fileno())
+
+            with self.lock:
+                # Base ou journal remplacés entre-temps (réécriture, compaction
+                # d'un autre processus): l'instantané est périmé, on abandonne
+                if self._identity() != files:
+                    return
+
+                tail = ''
+                if os.path.exists(self.path):
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        f.seek(offset)
+                        tail = f.read()
+
+                was_fresh = cache is not None and cache.is_fresh(self.filepath)
+                os.replace(tmp_base, self.filepath)
+
+                if tail.strip():
+                    tmp_log = f'{self.path}.{suffix}'
+                    with open(tmp_log, 'w', encoding='utf-8') as f:
+                        f.write(tail)
+                    os.replace(tmp_log, self.path)
+                elif os.path.exists(self.path):
+                    os.remove(self.path)
+
+                self.pending = sum(1 for line in tail.splitlines() if line.strip())
+                if was_fresh:
+                    cache.touch(self.filepath)
+        finally:
+            # Instantané abandonné (ou écriture interrompue)
+            if os.path.exists(tmp_base):
+                os.remove(tmp_base)
+
+    def compact_in_background(self, snapshot: Callable[[], List[Dict]], cache=None):
+        """Lance une compaction dans un thread, sauf si une est déjà en cours."""
+        with self.lock:
+            if self._compacting:
+                return
+            self._compacting = True
+
+        def run():
+            try:
+                self.compact(snapshot, cache)
+            except OSError as e:
+                print(f"[DB] Erreur lors de la compaction de {self.filepath}: {e}")
+            finally:
+                with self.lock:
+                    self._compacting = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+
+# =========================================================================
+# JOURNAL DE TRANSACTION MULTI-TABLES
+# =========================================================================
+
+class TransactionJournal:
+    """
+    Journal de rejeu (redo log) d'une écriture sur plusieurs tables.
+
+    Protocole:
+    1. write(): les enregistrements de toutes les tables sont écrits puis
+       synchronisés sur disque, suivis d'un marqueur de validation.
+    2. Chaque table est ensuite écrite normalement.
+    3. clear(): le journal est supprimé.
+
+    Après un arrêt brutal, pending() retourne les enregistrements d'une
+    transaction validée mais peut-être partiellement appliquée: les rejouer
+    est sans risque (enregistrements idempotents). Un journal sans marqueur
+    de validation est ignoré: aucune table n'a encore été modifiée.
+    """
+
+    COMMIT = {'op': 'commit'}
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def write(self, records: Dict[str, List[Dict]]):
+        """Écrit et synchronise les enregistrements {table: [enregistrements]}."""
+        lines = [json.dumps(dict(record, table=table), ensure_ascii=False) + '\n'
+                 for table, table_records in records.items() for record in table_records]
+        lines.append(json.dumps(self.COMMIT) + '\n')
+
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(''.join(lines))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def pending(self) -> Optional[Dict[str, List[Dict]]]:
+        """Retourne la transaction validée restée dans le journal, ou None."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            records = list(_parse(f))
+        if not records or records[-1] != self.COMMIT:
+            return None
+
+        by_table: Dict[str, List[Dict]] = {}
+        for record in records[:-1]:
+            table = record.pop('table')
+            by_table.setdefault(table, []).append(record)
+        return by_table
+
+    def clear(self):
+        """Supprime le journal une fois toutes les tables écrites."""
+        for path in (self.path, self.path + '.tmp'):
+            if os.path.exists(path):
+                os.remove(path)